@@ -1,9 +1,51 @@
-from crewai import Agent, LLM
-from langchain_openai import ChatOpenAI
 import os
+from functools import lru_cache
 
 os.environ["OPENAI_API_KEY"] = "sk-1234567890abcdef1234567890abcdef"
-llm = ChatOpenAI(model="ollama/gemma2:9b", base_url="http://localhost:11434/v1")
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache():
+    """
+    Identical prompts (same task, inputs and tool outputs) are answered from the response cache.
+    Set LLM_CACHE=0 to always query the model.
+
+    Returns:
+        Optional[LLMResponseCache]: The cache shared by every agent, None when disabled
+    """
+    from lib.llm_cache import LLMResponseCache, llm_cache_enabled
+
+    return LLMResponseCache() if llm_cache_enabled() else None
+
+
+def llm_model_name() -> str:
+    return os.getenv("LLM_MODEL", "ollama/gemma2:9b")
+
+
+def make_llm(agent: str, llm_cache: bool = True):
+    """
+    Create the LLM of one agent. All agents share the response cache; separate
+    instances let latency and token usage be reported per agent.
+
+    Args:
+        agent (str): Name of the agent, used as metrics label
+        llm_cache (bool): Whether the LLM may answer from the response cache
+
+    Returns:
+        CachedLLM: LLM for the agent
+    """
+    from lib.llm_cache import CachedLLM
+
+    return CachedLLM(
+        model=llm_model_name(),
+        base_url=os.getenv(
+            "LLM_BASE_URL", os.getenv("OLLAMA_URL", "http://localhost:11434")
+        ),
+        temperature=0.7,
+        cache=get_llm_cache() if llm_cache else None,
+        agent=agent,
+    )
+
 
 # ----- Groq LLM -----
 # groq_api_key = os.getenv("GROQ_API_KEY")
@@ -13,30 +55,27 @@ llm = ChatOpenAI(model="ollama/gemma2:9b", base_url="http://localhost:11434/v1")
 #     model="groq/llama3-8b-8192",
 # )
 
-# Define agents
-text_ingestion_specialist = Agent(
+# Agent definitions; the Agent objects are only built when first needed (see get_agents)
+text_ingestion_specialist_config = dict(
     role="Senior Text Ingestion Specialist and Data Pipeline Analyst",
     goal="Efficiently gather, prepare, and standardize all incoming raw text data {raw_input} to ensure consistent formatting, encoding, and metadata. Ensure each document's structure is adapted for downstream processes, including classification.",
     backstory="""As the data pipeline's first line of defense, you handle raw, diverse data sources from structured files to unformatted text documents. Your expertise is in transforming this data into well-organized, high-quality formats that enable reliable classification. You are meticulous about encoding, metadata, and document structure, and you assign unique IDs to facilitate document tracking. Your structured approach lays a solid foundation for subsequent tasks, directly impacting classification quality.""",
-    llm=llm,
     memory=True,
 )
 
-text_preprocessing_specialist = Agent(
+text_preprocessing_specialist_config = dict(
     role="Advanced Text Preprocessing Specialist and Data Quality Analyst",
     goal=""""Clean, normalize, and structure text data, preparing it for precise classification. Remove noise, irrelevant information, and inconsistencies, while preserving essential details for categorization. Your work ensures the data is standardized and optimized for model accuracy.""",
     backstory="""Starting as a general data-cleaning expert, you've become a specialist in preprocessing text for classification pipelines. You excel at identifying and removing non-essential information, handling spelling errors, and managing nested structures or complex formatting. Through meticulous attention to detail, you ensure that each document is in the best shape for classification, directly impacting downstream processes. Your work reduces errors and improves system accuracy by delivering consistently prepared data.""",
-    llm=llm,
     memory=True,
 )
 
-text_classification_specialist = Agent(
+text_classification_specialist_config = dict(
     role="Expert Text Classification Specialist and Contextual Analyst",
     goal="Classify and assign appropriate categories to each document based on {hierarchy}. Draw on both text content and document structure to categorize with high precision. Reference similar documents in ChromaDB to support decision-making and ensure that documents are consistently categorized across the dataset.",
     backstory="""With expertise in text classification and a solid understanding of hierarchical structures, you specialize in discerning subtle nuances within text. You make accurate decisions about category labels even in complex or ambiguous contexts, whether the hierarchy is simple or multi-layered. Using ChromaDB, you retrieve references to similar documents, ensuring accuracy and consistency in classifications. Built for both speed and reliability, you confidently process large datasets while maintaining the highest standards.""",
-    # tools=[ChromaDBTool],  # Attach ChromaDB for similarity search
+    # Similar documents are searched with the similar_documents tool of the classification tasks
     memory=True,
-    llm=llm,
     response_format="""
         {
             "classifications": [
@@ -47,28 +86,11 @@ text_classification_specialist = Agent(
     """,
 )
 
-confidence_scoring_agent = Agent(
-    role="Confidence Scoring and Quality Assurance Specialist",
-    goal="Evaluate classification confidence levels by analyzing document-label alignment and context. Flag classifications with low confidence scores for human review, enabling closer inspection of potential misclassifications.",
-    backstory="""You were developed as a quality control specialist focused on improving the reliability of the classification pipeline. Using an advanced scoring algorithm, you assess classification decisions based on how well a document's content aligns with its assigned category. By flagging documents with low confidence scores, you facilitate human oversight where automation falls short. Your work ensures that only high-confidence classifications proceed unreviewed, optimizing system accuracy and allowing human reviewers to focus on complex cases.""",
-    memory=True,
-    llm=llm,
-    response_format="""
-        {
-            "classifications": [
-                {"label": "<label_name>", "confidence_score": "<confidence_value>", "validation_notes": "<notes>"}
-            ],
-            "improvement_feedback": "<feedback>"
-        }
-    """,
-)
-
-human_in_the_loop = Agent(
+human_in_the_loop_config = dict(
     role="Expert Human Review Analyst",
     goal="Review and validate classifications, check for classifications flagged for low confidence or ambiguity. Apply expert judgment to finalize labels and provide detailed feedback to improve future automation.",
     backstory="""You bring a human touch to the classification pipeline, especially in ambiguous cases where algorithms alone may not suffice. Known for your sharp analytical skills and expertise in classification, you make final adjustments and corrections as necessary. Your annotations and feedback on each reviewed document help enhance the scoring and classification systems over time. Your role is essential for maintaining high accuracy, as you bridge the gap between automated processes and nuanced human judgment.""",
     memory=True,
-    llm=llm,
     response_format="""
         {
             "classifications": [
@@ -78,3 +100,38 @@ human_in_the_loop = Agent(
         }
     """,
 )
+
+AGENT_CONFIGS = {
+    "text_ingestion_specialist": text_ingestion_specialist_config,
+    "text_preprocessing_specialist": text_preprocessing_specialist_config,
+    "text_classification_specialist": text_classification_specialist_config,
+    "human_in_the_loop": human_in_the_loop_config,
+}
+
+
+@lru_cache(maxsize=None)
+def get_agents(llm_cache: bool = True):
+    """
+    Build every agent once per process. crewai is only imported here, so importing
+    this module stays cheap for processes that never run a crew.
+
+    Args:
+        llm_cache (bool): Whether the agents may answer from the response cache; False
+            builds a separate set of agents that always query the model
+
+    Returns:
+        Dict[str, Agent]: Agents keyed by name
+    """
+    from crewai import Agent
+
+    return {
+        name: Agent(**config, llm=make_llm(name, llm_cache))
+        for name, config in AGENT_CONFIGS.items()
+    }
+
+
+def __getattr__(name):
+    # Keeps `from agents import text_ingestion_specialist` working
+    if name in AGENT_CONFIGS:
+        return get_agents()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
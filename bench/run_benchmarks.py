@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Offline benchmark suite. Run from the repository root:
+
+    python -m bench.run_benchmarks                      # run and compare with bench/baseline.json
+    python -m bench.run_benchmarks --save-baseline      # record the baseline on this machine
+    python -m bench.run_benchmarks --only pdf,hierarchy # skip scenarios needing chromadb/crewai
+
+Synthetic PDFs are generated in a temporary directory and a local stub server stands in
+for the embedding and chat endpoints, so no model server is needed. Each scenario reports
+throughput and p50/p95 latency; a scenario regresses when its p50 or p95 exceeds the
+baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+BASELINE_PATH = "bench/baseline.json"
+RESULTS_PATH = "bench/results.json"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(operation: Callable[[], object], repeat: int, warmup: int = 1) -> Dict:
+    """
+    Time repeated runs of an operation.
+
+    Args:
+        operation (Callable): Work to time
+        repeat (int): Number of timed runs
+        warmup (int): Number of untimed runs first
+
+    Returns:
+        Dict: "runs", "throughput" (runs per second), "mean", "p50" and "p95" in seconds
+    """
+    for _ in range(warmup):
+        operation()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run_start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - run_start)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "runs": repeat,
+        "throughput": round(repeat / elapsed, 4),
+        "mean": round(statistics.mean(latencies), 6),
+        "p50": round(percentile(latencies, 0.50), 6),
+        "p95": round(percentile(latencies, 0.95), 6),
+    }
+
+
+def pdf_scenarios(corpus: List[str], repeat: int) -> Dict[str, Dict]:
+    from lib.pdf_reader import PdfReader
+    from lib.page_selection import SAMPLE_PAGES, select_passages
+
+    reader = PdfReader()
+    results = {}
+    for path in corpus:
+        pages = reader.page_count(path)
+        results[f"pdf.read_upto_page_10.{pages}p"] = measure(
+            lambda: reader.read_upto_page(path, 10), repeat
+        )
+        results[f"pdf.select_passages.{pages}p"] = measure(
+            lambda: select_passages(reader.sample_pages(path, SAMPLE_PAGES)), repeat
+        )
+        if pages > 10:
+            results[f"pdf.read_all_pages.{pages}p"] = measure(
+                lambda: reader.read_all_pages(path), max(1, repeat // 5)
+            )
+    return results
+
+
+def hierarchy_scenarios(repeat: int) -> Dict[str, Dict]:
+    from lib.parse_xml import get_categories, get_category_tree
+
+    return {
+        "hierarchy.get_categories": measure(
+            lambda: get_categories("./TOS/english_tos.xml"), repeat
+        ),
+        "hierarchy.get_category_tree": measure(
+            lambda: get_category_tree("./TOS/english_tos.xml"), repeat
+        ),
+    }
+
+
+def tool_scenarios(corpus: List[str], repeat: int) -> Dict[str, Dict]:
+    from lib.pdf_reader import PdfReader
+    from tools.chromadb_vectorizer import (
+        categories_vectorizer,
+        category_similarity,
+        document_vectorizer,
+    )
+
+    text = "\n".join(page or "" for page in PdfReader().read_upto_page(corpus[-1], 10))
+    return {
+        # The first (warmup) call builds the persistent index, timed calls reuse it
+        "tools.categories_vectorizer": measure(lambda: categories_vectorizer.run(), repeat),
+        "tools.document_vectorizer": measure(lambda: document_vectorizer.run(text), repeat),
+        "tools.category_similarity": measure(lambda: category_similarity.run(text), repeat),
+    }
+
+
+def crew_scenarios(corpus: List[str], repeat: int, modes: List[str]) -> Dict[str, Dict]:
+    import main
+
+    path = corpus[min(1, len(corpus) - 1)]
+    return {
+        # Every repeat runs the crew instead of answering from the result store
+        f"crew.kickoff.{mode}": measure(lambda: main.run(path, mode=mode, reuse=False), repeat, warmup=0)
+        for mode in modes
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """
+    List the scenarios slower than the baseline by more than `threshold`.
+
+    Args:
+        results (Dict[str, Dict]): Current measurements
+        baseline (Dict[str, Dict]): Stored measurements
+        threshold (float): Allowed relative slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        List[str]: One message per regression
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for statistic in ("p50", "p95"):
+            if current[statistic] > reference[statistic] * (1 + threshold):
+                regressions.append(
+                    f"{name} {statistic}: {current[statistic]:.4f}s vs baseline "
+                    f"{reference[statistic]:.4f}s (+{current[statistic] / reference[statistic] - 1:.0%})"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--only", default="pdf,hierarchy,tools,crew", help="Comma-separated scenario groups")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per scenario")
+    parser.add_argument("--pages", default="1,10,50,200", help="Page counts of the synthetic PDFs")
+    parser.add_argument("--modes", default="fast,full", help="Pipeline modes for the crew scenario")
+    parser.add_argument("--embedding-latency", type=float, default=0.02, help="Stub embedding latency, seconds")
+    parser.add_argument("--chat-latency", type=float, default=0.2, help="Stub chat completion latency, seconds")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    args = parser.parse_args()
+
+    groups = set(args.only.split(","))
+    workdir = tempfile.mkdtemp(prefix="crewai-classifier-bench-")
+
+    from lib.stub_server import start_stub_server
+
+    server = start_stub_server(
+        latency=args.embedding_latency, chat_latency=args.chat_latency
+    )
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    # Must be set before the project modules are imported
+    os.environ["OLLAMA_URL"] = url
+    os.environ["LLM_MODEL"] = "openai/stub"
+    os.environ["LLM_BASE_URL"] = f"{url}/v1"
+    os.environ["LLM_CACHE"] = "0"
+    os.environ["CHROMA_PATH"] = os.path.join(workdir, "chroma_db")
+    os.environ["EMBEDDING_STORE_PATH"] = os.path.join(workdir, "embeddings")
+    os.environ["RESULT_STORE_PATH"] = os.path.join(workdir, "results.sqlite")
+    os.environ["REVIEW_QUEUE_PATH"] = os.path.join(workdir, "review_queue.sqlite")
+
+    from bench.synthetic_pdfs import generate_corpus
+
+    corpus = generate_corpus(
+        os.path.join(workdir, "pdfs"), [int(count) for count in args.pages.split(",")]
+    )
+
+    results = {}
+    if "pdf" in groups:
+        results.update(pdf_scenarios(corpus, args.repeat))
+    if "hierarchy" in groups:
+        results.update(hierarchy_scenarios(args.repeat))
+    if "tools" in groups:
+        results.update(tool_scenarios(corpus, args.repeat))
+    if "crew" in groups:
+        results.update(
+            crew_scenarios(corpus, max(1, args.repeat // 5), args.modes.split(","))
+        )
+
+    server.shutdown()
+
+    for name, result in sorted(results.items()):
+        print(
+            f"{name:45s} {result['throughput']:10.2f}/s  "
+            f"p50 {result['p50'] * 1000:9.2f} ms  p95 {result['p95'] * 1000:9.2f} ms"
+        )
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file), args.threshold)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
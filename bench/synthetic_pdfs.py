@@ -0,0 +1,104 @@
+import os
+import random
+from typing import List, Sequence
+
+from lib.parse_xml import get_categories
+
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: Sequence[str], line_length: int = 90):
+    """
+    Write a minimal text-only PDF, one Helvetica text block per page.
+
+    Args:
+        path (str): Destination file
+        pages (Sequence[str]): Text of each page
+        line_length (int): Characters per line before wrapping
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    for text in pages:
+        words, lines, line = text.split(), [], ""
+        for word in words:
+            if line and len(line) + len(word) + 1 > line_length:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}".strip()
+        if line:
+            lines.append(line)
+
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(
+            f"({escape_pdf_text(line)}) Tj T*" for line in lines[:60]
+        ) + " ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    output = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n"
+
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+
+    with open(path, "w", encoding="latin-1", errors="replace") as file:
+        file.write(output)
+
+
+def generate_corpus(
+    directory: str,
+    page_counts: Sequence[int] = (1, 10, 50, 200),
+    words_per_page: int = 400,
+    seed: int = 0,
+    xml_file_path: str = "./TOS/english_tos.xml",
+) -> List[str]:
+    """
+    Generate PDFs whose text is drawn from one category's vocabulary plus filler, so
+    classification has a signal to find.
+
+    Args:
+        directory (str): Where to write the PDFs
+        page_counts (Sequence[int]): Number of pages of each generated PDF
+        words_per_page (int): Words written on each page
+        seed (int): Random seed, the same seed generates the same corpus
+        xml_file_path (str): Hierarchy providing the vocabulary
+
+    Returns:
+        List[str]: Paths of the generated PDFs
+    """
+    rng = random.Random(seed)
+    categories = get_categories(xml_file_path)
+    codes = sorted(categories)
+    filler = "report annual council decision meeting data table figure section summary".split()
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for number, page_count in enumerate(page_counts):
+        topic = categories[rng.choice(codes)].replace(">", " ").split()
+        pages = [
+            " ".join(
+                rng.choice(topic) if rng.random() < 0.3 else rng.choice(filler)
+                for _ in range(words_per_page)
+            )
+            for _ in range(page_count)
+        ]
+        path = os.path.join(directory, f"synthetic_{number:03d}_{page_count}p.pdf")
+        write_pdf(path, pages)
+        paths.append(path)
+    return paths
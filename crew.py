@@ -1,39 +1,72 @@
 import os
-from crewai import Crew, Process
 import datetime
-from tasks import (
-    ingest_documents,
-    preprocess_text,
-    classify_documents,
-    score_confidence,
-    human_review,
-)
+from functools import lru_cache
 
 # Set OpenAI API key -> necessary for OpenAI agents when using Ollama
 os.environ["OPENAI_API_KEY"] = "sk-1234567890abcdef1234567890abcdef"
 
-# Set the current date and time for logging
-timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-
-# Create and configure the crew
-classifier_crew = Crew(
-    agents=[
-        ingest_documents.agent,
-        preprocess_text.agent,
-        classify_documents.agent,
-        score_confidence.agent,
-        human_review.agent,
+# Tasks run by each pipeline mode, in order.
+# "fast" does ingestion and preprocessing in Python before kickoff, leaving one
+# LLM-backed task. It expects a {document} input prepared by
+# lib.text_normalization.prepare_document. In both modes confidence scores are
+# calibrated in code once classification ends (lib.calibration).
+PIPELINE_MODES = {
+    "full": [
+        "ingest_documents",
+        "preprocess_text",
+        "classify_documents",
     ],
-    tasks=[
-        ingest_documents,
-        preprocess_text,
-        classify_documents,
-        score_confidence,
-        human_review,
+    "fast": [
+        "classify_documents_fast",
     ],
-    process=Process.sequential,
-    output_log_file=f"logs/crew_output.log-{timestamp}",
-    share_crew=False,
-    verbose=True,
-    # embedder={"provider": "ollama", "config": {"model": "nomic-embed-text:latest"}},
-)
+}
+
+# Review is not part of the pipelines: flagged results are queued (lib.review_queue)
+# and reviewed separately by this crew, so classification never waits on it.
+REVIEW_TASKS = ["human_review"]
+
+
+@lru_cache(maxsize=None)
+def get_crew(mode: str = "full", llm_cache: bool = True):
+    """
+    Build the crew of a pipeline mode once per process. crewai, the agents and the
+    tasks are only imported and constructed on the first call.
+
+    Args:
+        mode (str): Pipeline mode, "full" or "fast", or "review" for the review crew
+        llm_cache (bool): Whether the agents may answer from the response cache (see
+            LLM_CACHE); training passes False so each iteration queries the model
+
+    Returns:
+        Crew: The configured crew
+    """
+    from crewai import Crew, Process
+    from tasks import get_tasks
+
+    names = REVIEW_TASKS if mode == "review" else PIPELINE_MODES[mode]
+    tasks = [get_tasks(llm_cache)[name] for name in names]
+
+    # Set the current date and time for logging
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    # Create and configure the crew
+    return Crew(
+        agents=[task.agent for task in tasks],
+        tasks=tasks,
+        process=Process.sequential,
+        output_log_file=f"logs/crew_output.log-{timestamp}",
+        share_crew=False,
+        verbose=True,
+        # embedder={"provider": "ollama", "config": {"model": "nomic-embed-text:latest"}},
+    )
+
+
+def __getattr__(name):
+    # Keeps `from crew import classifier_crew` working
+    if name == "classifier_crew":
+        return get_crew("full")
+    if name == "fast_classifier_crew":
+        return get_crew("fast")
+    if name == "review_crew":
+        return get_crew("review")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
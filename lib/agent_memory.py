@@ -0,0 +1,283 @@
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from lib.metrics import metrics, resident_bytes
+
+# Entries and text size kept across all documents, and the idle seconds after which a
+# document's memory is dropped
+AGENT_MEMORY_MAX_ENTRIES = 512
+AGENT_MEMORY_MAX_BYTES = 16 * 1024 * 1024
+AGENT_MEMORY_MAX_AGE = 3600.0
+
+
+def agent_memory_enabled() -> bool:
+    """
+    Whether the agents of a kickoff share a memory. Set AGENT_MEMORY=0 to run without.
+
+    Returns:
+        bool: False when the AGENT_MEMORY environment variable is "0", "false" or "off"
+    """
+    return os.getenv("AGENT_MEMORY", "1").lower() not in ("0", "false", "off")
+
+
+def _words(text: str) -> Counter:
+    return Counter(re.findall(r"\w+", text.lower()))
+
+
+class MemoryPolicy:
+    """
+    Bounded in-process store of agent memories, scoped per document.
+
+    Each scope holds what the agents said while working on one document. Searches
+    only see their own scope, so prompts never pick up another document's context.
+    The store holds at most `max_entries` entries and `max_bytes` of text: when full,
+    the oldest entries of the least recently used scope are evicted first. Scopes
+    idle for more than `max_age` seconds are dropped whole.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = AGENT_MEMORY_MAX_ENTRIES,
+        max_bytes: int = AGENT_MEMORY_MAX_BYTES,
+        max_age: float = AGENT_MEMORY_MAX_AGE,
+    ):
+        """
+        Args:
+            max_entries (int): Entries kept across all scopes
+            max_bytes (int): UTF-8 size of the texts kept across all scopes
+            max_age (float): Seconds a scope is kept after its last use
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # scope -> {"entries": [...], "used": monotonic time}, least recently used first
+        self._scopes: "OrderedDict[str, Dict]" = OrderedDict()
+        self._entries = 0
+        self._bytes = 0
+        self._evictions = Counter()
+        self._lock = threading.Lock()
+
+    def _touch(self, scope: str) -> Dict:
+        state = self._scopes.get(scope)
+        if state is None:
+            state = self._scopes[scope] = {"entries": [], "used": 0.0}
+        state["used"] = time.monotonic()
+        self._scopes.move_to_end(scope)
+        return state
+
+    def _drop(self, scope: str, reason: str):
+        entries = self._scopes.pop(scope)["entries"]
+        self._entries -= len(entries)
+        self._bytes -= sum(entry["bytes"] for entry in entries)
+        if entries:
+            self._evict_count(reason, len(entries))
+
+    def _evict_count(self, reason: str, count: int):
+        self._evictions[reason] += count
+        metrics.inc("agent_memory_evictions_total", count, reason=reason)
+
+    def _enforce(self):
+        expired = time.monotonic() - self.max_age
+        while self._scopes:
+            scope, state = next(iter(self._scopes.items()))
+            if state["used"] >= expired:
+                break
+            self._drop(scope, "age")
+
+        while self._entries > self.max_entries or self._bytes > self.max_bytes:
+            scope, state = next(iter(self._scopes.items()))
+            if not state["entries"]:
+                self._scopes.pop(scope)
+                continue
+            entry = state["entries"].pop(0)
+            self._entries -= 1
+            self._bytes -= entry["bytes"]
+            self._evict_count("size", 1)
+
+    def save(self, scope: str, text: str, metadata: Optional[Dict] = None):
+        """
+        Remember what an agent produced for a document.
+
+        Args:
+            scope (str): Scope of the document
+            text (str): Output to remember
+            metadata (Optional[Dict]): E.g. the agent and task it came from
+        """
+        entry = {
+            "text": text,
+            "metadata": dict(metadata or {}),
+            "words": _words(text),
+            "bytes": len(text.encode("utf-8")),
+        }
+        with self._lock:
+            self._touch(scope)["entries"].append(entry)
+            self._entries += 1
+            self._bytes += entry["bytes"]
+            self._enforce()
+
+    def search(self, scope: str, query: str, limit: int = 3) -> List[Dict]:
+        """
+        Find the memories of a document closest to a query.
+
+        Every entry of a scope is about the same document, so entries are only ranked,
+        by the cosine similarity of their words with the query, not filtered.
+
+        Args:
+            scope (str): Scope of the document
+            query (str): Text to compare with, e.g. a task description
+            limit (int): Maximum number of memories
+
+        Returns:
+            List[Dict]: {"context", "metadata", "score"}, best first
+        """
+        query_words = _words(query)
+        query_norm = math.sqrt(sum(count * count for count in query_words.values())) or 1.0
+        with self._lock:
+            self._enforce()
+            if scope not in self._scopes:
+                return []
+            entries = list(self._touch(scope)["entries"])
+
+        results = []
+        for entry in entries:
+            norm = math.sqrt(sum(count * count for count in entry["words"].values())) or 1.0
+            overlap = sum(count * entry["words"][word] for word, count in query_words.items())
+            results.append(
+                {
+                    "context": entry["text"],
+                    "metadata": entry["metadata"],
+                    "score": round(overlap / (norm * query_norm), 4),
+                }
+            )
+        results.sort(key=lambda result: -result["score"])
+        return results[:limit]
+
+    def release(self, scope: str):
+        """
+        Forget a document, e.g. once its run ended and nothing will recall it.
+        """
+        with self._lock:
+            if scope in self._scopes:
+                self._drop(scope, "release")
+
+    def scope_size(self, scope: str) -> int:
+        with self._lock:
+            state = self._scopes.get(scope)
+            return len(state["entries"]) if state else 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._enforce()
+            return {
+                "scopes": len(self._scopes),
+                "entries": self._entries,
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evicted": dict(self._evictions),
+            }
+
+
+class ScopedMemory:
+    """
+    A document's view of the policy, in the shape crewai expects of a crew's short-term memory.
+    """
+
+    def __init__(self, policy: MemoryPolicy, scope: str):
+        self.policy = policy
+        self.scope = scope
+
+    def save(self, value, metadata: Optional[Dict] = None, agent: Optional[str] = None):
+        metadata = dict(metadata or {})
+        if agent:
+            metadata["agent"] = agent
+        self.policy.save(self.scope, str(value), metadata)
+
+    def search(self, query: str, limit: int = 3, score_threshold: float = 0.35) -> List[Dict]:
+        # score_threshold is meant for embedding similarities; see MemoryPolicy.search
+        return self.policy.search(self.scope, query, limit)
+
+    def reset(self):
+        self.policy.release(self.scope)
+
+    def __len__(self) -> int:
+        return self.policy.scope_size(self.scope)
+
+    def __bool__(self) -> bool:
+        # crewai skips saving to a falsy memory; an empty scope must still accept entries
+        return True
+
+
+class DisabledMemory:
+    """
+    Stand-in for crewai's long-term and entity memories.
+
+    crewai only evaluates each finished task, an extra LLM call, when both are set,
+    and keeps their contents across documents; being falsy turns both off.
+    """
+
+    def save(self, *args, **kwargs):
+        pass
+
+    def search(self, *args, **kwargs) -> List[Dict]:
+        return []
+
+    def reset(self):
+        pass
+
+    def __bool__(self) -> bool:
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_memory_policy() -> MemoryPolicy:
+    return MemoryPolicy(
+        max_entries=int(os.getenv("AGENT_MEMORY_MAX_ENTRIES", AGENT_MEMORY_MAX_ENTRIES)),
+        max_bytes=int(os.getenv("AGENT_MEMORY_MAX_BYTES", AGENT_MEMORY_MAX_BYTES)),
+        max_age=float(os.getenv("AGENT_MEMORY_MAX_AGE", AGENT_MEMORY_MAX_AGE)),
+    )
+
+
+@contextmanager
+def scoped_memory(crew, scope: Optional[str] = None):
+    """
+    Give a private crew copy a memory scoped to one document for the duration of a run.
+
+    Without a scope the memory is private to the run and released when it ends. A
+    named scope, e.g. the document's result store key, is kept under the policy's
+    caps so a later run on the same document, such as its review, recalls it.
+
+    Args:
+        crew (Crew): Private copy of a crew, about to be kicked off
+        scope (Optional[str]): Scope of the document
+
+    Yields:
+        Optional[ScopedMemory]: The memory, None when AGENT_MEMORY is off
+    """
+    if not agent_memory_enabled():
+        yield None
+        return
+
+    policy = get_memory_policy()
+    memory = ScopedMemory(policy, scope or f"run-{uuid.uuid4().hex}")
+    crew.memory = True
+    crew._short_term_memory = memory
+    crew._long_term_memory = DisabledMemory()
+    crew._entity_memory = DisabledMemory()
+    try:
+        yield memory
+    finally:
+        if scope is None:
+            memory.reset()
+        stats = policy.stats()
+        metrics.observe("agent_memory_entries", stats["entries"])
+        metrics.observe("agent_memory_bytes", stats["bytes"])
+        metrics.observe("process_resident_bytes", resident_bytes())
@@ -0,0 +1,211 @@
+import json
+import os
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from lib.metrics import metrics
+
+CALIBRATION_PATH = "./cache/calibration.json"
+
+
+@dataclass(frozen=True)
+class Calibration:
+    """
+    Parameters turning cosine similarities into label probabilities, and the flagging rules.
+
+    A label's probability is the logistic function of `slope * similarity + intercept`
+    (Platt scaling). The defaults map a similarity of 0.6 to a probability of 0.5; fit
+    them on reviewed documents with `fit_calibration`.
+    """
+
+    slope: float = 12.0
+    intercept: float = -7.2
+    # Sharpness of the softmax over a document's labels, used for the entropy
+    temperature: float = 0.05
+    # A label is flagged when it is closer than min_gap to the next one...
+    min_gap: float = 0.1
+    # ...or when its probability is below min_confidence
+    min_confidence: float = 0.6
+
+    def save(self, path: str = CALIBRATION_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(asdict(self), file, indent=2)
+
+    @classmethod
+    def load(cls, path: str = CALIBRATION_PATH) -> "Calibration":
+        """
+        Read fitted parameters, falling back to the defaults when none were saved.
+        """
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r") as file:
+            return cls(**json.load(file))
+
+
+def sigmoid(values: np.ndarray) -> np.ndarray:
+    # exp overflows float64 beyond ~709; the sigmoid is already 0 or 1 well before that
+    return 1 / (1 + np.exp(-np.clip(values, -500, 500)))
+
+
+def calibrate(scores, calibration: Calibration = Calibration()) -> Dict[str, np.ndarray]:
+    """
+    Compute calibrated probabilities, margins, entropy and review flags for a batch of documents.
+
+    Args:
+        scores: (n_documents, n_labels) cosine similarities between each document and its
+            labels, or one row for a single document
+        calibration (Calibration): Parameters and flagging rules
+
+    Returns:
+        Dict[str, np.ndarray]:
+            "probabilities" (n, k): calibrated probability of each label, in the input order
+            "order" (n, k): label indexes from most to least probable
+            "margins" (n, k-1): probability gap between each ranked label and the next
+            "entropy" (n,): normalized entropy of the softmax over labels, 1 is uniform
+            "small_gap" (n, k-1), "low_confidence" (n, k): rule violations
+            "flagged" (n,): whether the document needs review
+    """
+    scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+    n_labels = scores.shape[1]
+
+    probabilities = sigmoid(calibration.slope * scores + calibration.intercept)
+    order = np.argsort(-probabilities, axis=1, kind="stable")
+    ranked = np.take_along_axis(probabilities, order, axis=1)
+    margins = ranked[:, :-1] - ranked[:, 1:]
+
+    logits = scores / calibration.temperature
+    shares = np.exp(logits - logits.max(axis=1, keepdims=True))
+    shares /= shares.sum(axis=1, keepdims=True)
+    entropy = -(shares * np.log(np.clip(shares, 1e-12, None))).sum(axis=1)
+    if n_labels > 1:
+        entropy /= np.log(n_labels)
+
+    small_gap = margins < calibration.min_gap
+    low_confidence = probabilities < calibration.min_confidence
+    flagged = small_gap.any(axis=1) | low_confidence.any(axis=1)
+
+    return {
+        "probabilities": probabilities,
+        "order": order,
+        "margins": margins,
+        "entropy": entropy,
+        "small_gap": small_gap,
+        "low_confidence": low_confidence,
+        "flagged": flagged,
+    }
+
+
+def fit_calibration(
+    scores: Sequence[float],
+    correct: Sequence[bool],
+    calibration: Calibration = Calibration(),
+    iterations: int = 50,
+) -> Calibration:
+    """
+    Fit the Platt parameters to labels whose correctness is known, e.g. reviewed results.
+
+    Args:
+        scores (Sequence[float]): Cosine similarity of each label
+        correct (Sequence[bool]): Whether each label was kept by the reviewer
+        calibration (Calibration): Starting point; flagging rules are kept
+        iterations (int): Newton steps of the logistic regression
+
+    Returns:
+        Calibration: Parameters with the fitted slope and intercept
+    """
+    x = np.column_stack([np.asarray(scores, dtype=np.float64), np.ones(len(scores))])
+    y = np.asarray(correct, dtype=np.float64)
+    weights = np.array([calibration.slope, calibration.intercept])
+
+    for _ in range(iterations):
+        p = sigmoid(x @ weights)
+        gradient = x.T @ (p - y)
+        # Small ridge term keeps the Hessian invertible when the classes are separable
+        hessian = x.T @ (x * (p * (1 - p))[:, None]) + 1e-6 * np.eye(2)
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.abs(step).max() < 1e-8:
+            break
+
+    return replace(calibration, slope=float(weights[0]), intercept=float(weights[1]))
+
+
+def flag_reasons(report: Dict[str, np.ndarray], row: int, codes: List[str]) -> List[str]:
+    """
+    Describe the rules a document violates, for the review stage.
+
+    Args:
+        report (Dict[str, np.ndarray]): Output of `calibrate`
+        row (int): Index of the document in the batch
+        codes (List[str]): Label codes of the document, in the input order
+
+    Returns:
+        List[str]: One sentence per violation, empty when the document is not flagged
+    """
+    order = report["order"][row]
+    reasons = [
+        f"gap between {codes[order[rank]]} and {codes[order[rank + 1]]} is {report['margins'][row, rank]:.3f}"
+        for rank in np.flatnonzero(report["small_gap"][row])
+    ]
+    reasons += [
+        f"confidence of {codes[index]} is {report['probabilities'][row, index]:.3f}"
+        for index in np.flatnonzero(report["low_confidence"][row])
+    ]
+    return reasons
+
+
+class ConfidenceCalibrator:
+    """
+    crewai task callback replacing the LLM confidence-scoring stage.
+
+    After the classification task, the chosen labels are scored against the document
+    vector, their confidence scores replaced by calibrated probabilities (best first)
+    and a "confidence" section with entropy, margins and flags added for the review
+    stage. Expects the output to have been normalized by OutputValidator.
+    """
+
+    def __init__(self, vector, engine, calibration: Optional[Calibration] = None):
+        """
+        Args:
+            vector: Pooled embedding of the document
+            engine (SimilarityEngine): Engine holding the category embeddings
+            calibration (Optional[Calibration]): Parameters, loaded from CALIBRATION_PATH by default
+        """
+        self.vector = vector
+        self.engine = engine
+        self.calibration = calibration or Calibration.load()
+        self.report = None
+
+    def __call__(self, task_output):
+        if getattr(task_output, "name", None) != "Document Classification":
+            return
+        result = getattr(task_output, "json_dict", None)
+        if not result or not result.get("validated_classifications"):
+            return
+
+        classifications = result["validated_classifications"]
+        codes = [classification["label"] for classification in classifications]
+        similarities = self.engine.subset_scores(self.vector, codes)
+        report = calibrate(similarities, self.calibration)
+
+        ranked = []
+        for index in report["order"][0]:
+            classification = dict(classifications[index])
+            classification["similarity"] = round(float(similarities[index]), 4)
+            classification["confidence_score"] = round(float(report["probabilities"][0, index]), 4)
+            ranked.append(classification)
+
+        flagged = bool(report["flagged"][0])
+        result["validated_classifications"] = ranked
+        result["confidence"] = {
+            "entropy": round(float(report["entropy"][0]), 4),
+            "margins": [round(float(margin), 4) for margin in report["margins"][0]],
+            "flagged": flagged,
+            "flags": flag_reasons(report, 0, codes),
+        }
+        task_output.raw = json.dumps(result, ensure_ascii=False)
+        self.report = result["confidence"]
+        metrics.inc("calibration_total", flagged=str(flagged).lower())
@@ -0,0 +1,119 @@
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from lib.metrics import metrics
+
+STOPWORDS = {
+    "and", "the", "for", "with", "from", "that", "this", "are", "was", "were", "has",
+    "have", "not", "but", "its", "their", "other", "into", "than", "which", "related",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase a text and split it into content words.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: Words of at least three letters, stopwords removed
+    """
+    return [
+        word
+        for word in re.findall(r"[^\W\d_]{3,}", text.lower())
+        if word not in STOPWORDS
+    ]
+
+
+def lexical_scores(text: str, categories: Dict[str, str]) -> Dict[str, float]:
+    """
+    Score categories by the IDF-weighted overlap between the document and each category path.
+
+    Words of the leaf name count twice as much as words inherited from parent groups,
+    and scores are normalized by the number of words in the category.
+
+    Args:
+        text (str): Document text
+        categories (Dict[str, str]): Category codes mapped to their hierarchical paths
+
+    Returns:
+        Dict[str, float]: Score of every category with at least one matching word
+    """
+    document = Counter(tokenize(text))
+
+    category_words = {}
+    for code, path in categories.items():
+        *parents, leaf = path.split(" > ")
+        weights = Counter(tokenize(" ".join(parents)))
+        for word in tokenize(leaf):
+            weights[word] += 2
+        category_words[code] = weights
+
+    frequency = Counter(word for weights in category_words.values() for word in weights)
+    idf = {
+        word: math.log(1 + len(categories) / count) for word, count in frequency.items()
+    }
+
+    scores = {}
+    for code, weights in category_words.items():
+        score = sum(
+            weight * idf[word] * math.log1p(document[word])
+            for word, weight in weights.items()
+            if word in document
+        )
+        if score > 0:
+            scores[code] = score / math.sqrt(sum(weights.values()))
+    return scores
+
+
+def retrieve_candidates(
+    text: str,
+    categories: Dict[str, str],
+    n: int = 25,
+    rank: Optional[Callable[[str, int], List[Dict]]] = None,
+) -> Dict[str, str]:
+    """
+    Pick the n categories most relevant to a document, to inject instead of the full hierarchy.
+
+    Embedding similarity is used when `rank` is given and succeeds; lexical overlap is
+    the fallback, e.g. when the embedding server is unavailable.
+
+    Args:
+        text (str): Document text
+        categories (Dict[str, str]): Category codes mapped to their hierarchical paths
+        n (int): Number of candidate categories to keep
+        rank (Optional[Callable]): Returns the k best {"code", ...} entries for a text
+
+    Returns:
+        Dict[str, str]: The candidate categories, most relevant first
+    """
+    if rank is not None:
+        try:
+            return {
+                entry["code"]: categories[entry["code"]]
+                for entry in rank(text, n)
+                if entry["code"] in categories
+            }
+        except Exception:
+            # Counted rather than printed; the lexical candidates below are still usable
+            metrics.inc("candidate_embedding_failures_total")
+
+    scores = lexical_scores(text, categories)
+    best = sorted(scores, key=scores.get, reverse=True)[:n]
+    return {code: categories[code] for code in best}
+
+
+def format_hierarchy(categories: Dict[str, str]) -> str:
+    """
+    Render categories as one "code: path" line each, for prompt injection.
+
+    Args:
+        categories (Dict[str, str]): Category codes mapped to their hierarchical paths
+
+    Returns:
+        str: One line per category
+    """
+    return "\n".join(f"{code}: {path}" for code, path in categories.items())
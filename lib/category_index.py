@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List
+
+from filelock import FileLock
+
+from lib.metrics import metrics
+
+# Location of the persistent ChromaDB store shared by every run and process
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+CATEGORY_COLLECTION_PREFIX = "categories-"
+CATEGORY_NODE_COLLECTION_PREFIX = "category-nodes-"
+
+
+def hierarchy_fingerprint(categories: Dict[str, str], model_name: str) -> str:
+    """
+    Compute a stable hash of the parsed hierarchy and the embedding model.
+
+    Args:
+        categories (Dict[str, str]): Category codes mapped to their hierarchical paths
+        model_name (str): Name of the embedding model used to vectorize the categories
+
+    Returns:
+        str: Hex digest identifying this exact hierarchy/model combination
+    """
+    payload = json.dumps(
+        {"model": model_name, "categories": sorted(categories.items())},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def category_collection_name(
+    fingerprint: str, prefix: str = CATEGORY_COLLECTION_PREFIX
+) -> str:
+    """
+    Build the ChromaDB collection name for a hierarchy fingerprint.
+
+    Args:
+        fingerprint (str): Value returned by hierarchy_fingerprint
+        prefix (str): Prefix identifying the kind of index
+
+    Returns:
+        str: Collection name (ChromaDB limits names to 63 characters)
+    """
+    return f"{prefix}{fingerprint[:32]}"
+
+
+def get_category_collection(
+    client,
+    categories: Dict[str, str],
+    embed: Callable[[List[str]], List[List[float]]],
+    model_name: str,
+    batch_size: int = 64,
+    prefix: str = CATEGORY_COLLECTION_PREFIX,
+):
+    """
+    Return the persistent collection holding the category embeddings, building it if needed.
+
+    The collection is keyed by the hierarchy fingerprint, so it is reused across runs and
+    processes and only rebuilt when the XML or the embedding model changes. Interrupted
+    builds resume where they stopped because only missing ids are embedded. Collections
+    with the same prefix left behind by older hierarchies or models are dropped.
+
+    Args:
+        client: ChromaDB client (normally a chromadb.PersistentClient)
+        categories (Dict[str, str]): Category codes mapped to their hierarchical paths
+        embed (Callable): Function turning a list of texts into a list of embeddings
+        model_name (str): Embedding model behind embed, with its endpoint when vectors
+            from different servers must not be mixed
+        batch_size (int): Number of categories sent to the embedding model per call
+        prefix (str): Collection name prefix, separating leaf and node indexes
+
+    Returns:
+        chromadb.Collection: Collection with one embedding per category code
+    """
+    fingerprint = hierarchy_fingerprint(categories, model_name)
+    name = category_collection_name(fingerprint, prefix)
+
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+
+    # Serialize builds so concurrent processes do not embed the same hierarchy twice
+    with FileLock(os.path.join(CHROMA_PATH, f"{prefix.strip('-')}.lock")):
+        collection = client.get_or_create_collection(
+            name,
+            metadata={
+                "fingerprint": fingerprint,
+                "model": model_name,
+                "hnsw:space": "cosine",
+            },
+        )
+
+        if collection.count() == len(categories):
+            metrics.inc("cache_requests_total", cache=prefix.strip("-"), result="hit")
+        else:
+            metrics.inc("cache_requests_total", cache=prefix.strip("-"), result="miss")
+            existing = set(collection.get(include=[])["ids"])
+            missing = [code for code in categories if code not in existing]
+
+            for start in range(0, len(missing), batch_size):
+                codes = missing[start : start + batch_size]
+                descriptions = [categories[code] for code in codes]
+                collection.upsert(
+                    ids=codes,
+                    documents=descriptions,
+                    embeddings=embed(descriptions),
+                )
+
+        # Drop indexes built for previous hierarchies or embedding models
+        for stale in client.list_collections():
+            stale_name = getattr(stale, "name", stale)
+            if stale_name.startswith(prefix) and stale_name != name:
+                client.delete_collection(stale_name)
+
+    return collection
@@ -0,0 +1,345 @@
+import os
+import shutil
+import threading
+from functools import lru_cache
+from typing import Dict, List
+
+from filelock import FileLock
+
+from lib.parse_xml import get_categories, get_category_tree
+from lib.category_index import (
+    CHROMA_PATH,
+    CATEGORY_COLLECTION_PREFIX,
+    CATEGORY_NODE_COLLECTION_PREFIX,
+    category_collection_name,
+    get_category_collection,
+    hierarchy_fingerprint,
+)
+from lib.similarity import SimilarityEngine
+from lib.chunking import content_id, chunk_pages, embed_in_batches, pool_embeddings
+from lib.embedding_client import EmbeddingClient
+from lib.hierarchical_classifier import HierarchicalClassifier
+from lib.neighbours import NeighbourIndex
+from lib.metrics import metrics
+from lib.embedding_store import EMBEDDING_STORE_PATH, EmbeddingStore
+
+vectorizer_model = "nomic-embed-text:latest"
+# Storage type of the memory-mapped category and document embeddings, "float16" or "int8"
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float16")
+# Pooled document vectors kept before the oldest are compacted away
+DOCUMENT_STORE_MAX_ROWS = int(os.getenv("DOCUMENT_STORE_MAX_ROWS", 100_000))
+
+# Similarity engine over the current category index, loaded on first use
+_similarity_engine = None
+_similarity_engine_collection = None
+_hierarchical_classifier = None
+_hierarchical_classifier_collection = None
+# Service and batch worker threads load the engines concurrently
+_engine_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    Open the persistent ChromaDB client once per process. chromadb is only imported here.
+
+    Returns:
+        chromadb.PersistentClient: Client of the store at CHROMA_PATH
+    """
+    from chromadb import PersistentClient
+
+    return PersistentClient(path=CHROMA_PATH)
+
+
+@lru_cache(maxsize=None)
+def get_document_collection():
+    """
+    Returns:
+        chromadb.Collection: Collection holding the document chunk embeddings
+    """
+    return get_client().get_or_create_collection("document_embeddings")
+
+
+def embedding_url() -> str:
+    return os.getenv("OLLAMA_URL", "http://localhost:11434")
+
+
+def embedding_space() -> str:
+    """
+    Identify the vectors of the current embedding model and endpoint. Memory-mapped
+    stores are named after it, so vectors from another server, such as the benchmark's
+    stub, are never read into or mixed with the real ones.
+
+    Returns:
+        str: The embedding model and the URL serving it
+    """
+    return f"{vectorizer_model}@{embedding_url()}"
+
+
+@lru_cache(maxsize=None)
+def get_embedding_client() -> EmbeddingClient:
+    """
+    Shared embedding client; concurrent callers are merged into batched requests.
+
+    Returns:
+        EmbeddingClient: Client of the Ollama server at OLLAMA_URL
+    """
+    return EmbeddingClient(model_name=vectorizer_model, url=embedding_url())
+
+
+@lru_cache(maxsize=None)
+def get_neighbour_index() -> NeighbourIndex:
+    """
+    Returns:
+        NeighbourIndex: HNSW archive of classified documents for the current embedding model
+    """
+    return NeighbourIndex.open(get_client(), vectorizer_model)
+
+
+def get_category_index():
+    """
+    Return the persistent category index, building it only when the XML, model or
+    endpoint changed.
+
+    Returns:
+        chromadb.Collection: Collection with one embedding per leaf category
+    """
+    return get_category_collection(
+        get_client(),
+        get_categories("./TOS/english_tos.xml"),
+        get_embedding_client(),
+        embedding_space(),
+    )
+
+
+def load_category_engine(
+    categories: Dict[str, str], prefix: str = CATEGORY_COLLECTION_PREFIX
+) -> SimilarityEngine:
+    """
+    Open the memory-mapped embeddings of a hierarchy, exporting them from its ChromaDB
+    index the first time. Later calls, in this or any other process, only map the files.
+
+    Args:
+        categories (Dict[str, str]): Category codes mapped to their paths
+        prefix (str): Collection name prefix, separating leaf and node indexes
+
+    Returns:
+        SimilarityEngine: Engine scoring against the shared float16/int8 rows
+    """
+    name = category_collection_name(hierarchy_fingerprint(categories, embedding_space()), prefix)
+    directory = os.path.join(EMBEDDING_STORE_PATH, name)
+
+    if not EmbeddingStore.exists(directory):
+        os.makedirs(EMBEDDING_STORE_PATH, exist_ok=True)
+        with FileLock(os.path.join(EMBEDDING_STORE_PATH, f"{prefix}build.lock")):
+            if not EmbeddingStore.exists(directory):
+                collection = get_category_collection(
+                    get_client(), categories, get_embedding_client(), embedding_space(), prefix=prefix
+                )
+                data = collection.get(include=["embeddings"])
+                EmbeddingStore.build(directory, data["ids"], data["embeddings"], EMBEDDING_DTYPE)
+
+                # Stores of older hierarchies, models or endpoints are no longer used
+                for entry in os.listdir(EMBEDDING_STORE_PATH):
+                    path = os.path.join(EMBEDDING_STORE_PATH, entry)
+                    if entry.startswith(prefix) and entry != name and os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+
+    return SimilarityEngine.from_store(EmbeddingStore(directory), categories)
+
+
+def get_similarity_engine() -> SimilarityEngine:
+    """
+    Return the similarity engine for the current hierarchy, building the index if needed.
+
+    Returns:
+        SimilarityEngine: Engine holding every category embedding as one matrix
+    """
+    global _similarity_engine, _similarity_engine_collection
+
+    categories = get_categories("./TOS/english_tos.xml")
+    name = hierarchy_fingerprint(categories, embedding_space())
+
+    with _engine_lock:
+        # Reload only when the hierarchy, model or endpoint changed
+        if _similarity_engine_collection != name:
+            _similarity_engine = load_category_engine(categories)
+            _similarity_engine_collection = name
+        return _similarity_engine
+
+
+def rank_categories(texts: List[str], k: int = 5) -> List[List[Dict]]:
+    """
+    Score documents against every category and return the exact top-k per document.
+
+    Args:
+        texts (List[str]): Document texts to classify
+        k (int): Number of categories to return per document
+
+    Returns:
+        List[List[Dict]]: Per document, a ranked list of {"code", "label", "score"}
+    """
+    engine = get_similarity_engine()
+    return engine.top_k(document_vectors(texts), k=k)
+
+
+def get_hierarchical_classifier() -> HierarchicalClassifier:
+    """
+    Return the beam-search classifier over every node of the hierarchy, building its index if needed.
+
+    Returns:
+        HierarchicalClassifier: Classifier holding an embedding for each itemgroup
+    """
+    global _hierarchical_classifier, _hierarchical_classifier_collection
+
+    tree = get_category_tree("./TOS/english_tos.xml")
+    nodes = {code: node["path"] for code, node in tree.items()}
+    name = hierarchy_fingerprint(nodes, embedding_space())
+
+    with _engine_lock:
+        if _hierarchical_classifier_collection != name:
+            _hierarchical_classifier = HierarchicalClassifier(
+                tree, load_category_engine(nodes, CATEGORY_NODE_COLLECTION_PREFIX)
+            )
+            _hierarchical_classifier_collection = name
+        return _hierarchical_classifier
+
+
+def classify_hierarchical(
+    texts: List[str], k: int = 5, beam_width: int = 5
+) -> List[Dict]:
+    """
+    Classify documents by descending the hierarchy with a beam search.
+
+    Args:
+        texts (List[str]): Document texts to classify
+        k (int): Number of leaf categories to return per document
+        beam_width (int): Number of internal nodes expanded at each level
+
+    Returns:
+        List[Dict]: Per document, the ranked leaves with the path taken and the number of nodes compared
+    """
+    classifier = get_hierarchical_classifier()
+    return classifier.classify_batch(
+        document_vectors(texts), k=k, beam_width=beam_width
+    )
+
+
+def vectorize_document(
+    pages: List[str],
+    document_id: str = None,
+    window: int = 256,
+    overlap: int = 32,
+    batch_size: int = 32,
+    store: bool = True,
+) -> Dict:
+    """
+    Chunk a document, embed the chunks in batches and store them in ChromaDB.
+
+    Chunks are stored under short content-hash ids with document and page metadata.
+    The document's earlier chunks are deleted first, so re-vectorizing it with another
+    window or edited text replaces them instead of leaving stale chunks behind.
+
+    Args:
+        pages (List[str]): Text of each page of the document
+        document_id (str): Id of the document, defaults to a hash of its text
+        window (int): Number of words per chunk
+        overlap (int): Number of words shared by consecutive chunks
+        batch_size (int): Number of chunks per embedding request
+        store (bool): Whether to store the chunks in ChromaDB; scoring only needs the
+            pooled vector
+
+    Returns:
+        Dict: "document_id", number of "chunks" and the pooled document "vector"
+    """
+    document_id = document_id or content_id(*[page or "" for page in pages])
+    chunks = chunk_pages(pages, window=window, overlap=overlap)
+    if not chunks:
+        raise ValueError(f"Document {document_id} contains no text to vectorize")
+
+    texts = [chunk["text"] for chunk in chunks]
+    embeddings = embed_in_batches(texts, get_embedding_client(), batch_size=batch_size)
+
+    if store:
+        collection = get_document_collection()
+        collection.delete(where={"document_id": document_id})
+        collection.upsert(
+            ids=[content_id(document_id, str(chunk["index"]), chunk["text"]) for chunk in chunks],
+            documents=texts,
+            embeddings=embeddings,
+            metadatas=[
+                {
+                    "document_id": document_id,
+                    "chunk": chunk["index"],
+                    "page_start": chunk["page_start"],
+                    "page_end": chunk["page_end"],
+                }
+                for chunk in chunks
+            ],
+        )
+
+    return {
+        "document_id": document_id,
+        "chunks": len(chunks),
+        "vector": pool_embeddings(embeddings, [len(text) for text in texts]),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_document_store() -> EmbeddingStore:
+    """
+    Returns:
+        EmbeddingStore: Pooled document vectors of the current embedding space, keyed by content id,
+        keeping the DOCUMENT_STORE_MAX_ROWS most recently embedded documents
+    """
+    return EmbeddingStore(
+        os.path.join(EMBEDDING_STORE_PATH, f"documents-{content_id(embedding_space())}"),
+        dtype=EMBEDDING_DTYPE,
+        max_rows=DOCUMENT_STORE_MAX_ROWS,
+    )
+
+
+def document_vectors(texts: List[str]) -> List:
+    """
+    Compute the pooled vector of each document, embedding long texts chunk by chunk.
+    Vectors are kept in the document store, so a text is only embedded once.
+
+    Args:
+        texts (List[str]): Document texts
+
+    Returns:
+        List: One pooled vector per document
+    """
+    store = get_document_store()
+    vectors = []
+    for text in texts:
+        document_id = content_id(text)
+        vector = store.get(document_id)
+        metrics.inc("cache_requests_total", cache="document_vectors", result="miss" if vector is None else "hit")
+        if vector is None:
+            vector = vectorize_document([text], document_id, store=False)["vector"]
+            store.add([document_id], [vector])
+        vectors.append(vector)
+    return vectors
+
+
+def similar_document_labels(texts: List[str], k: int = 10) -> List[List[Dict]]:
+    """
+    Vote for the labels of each document with its nearest already classified documents.
+
+    Args:
+        texts (List[str]): Document texts
+        k (int): Number of neighbours consulted per document
+
+    Returns:
+        List[List[Dict]]: Per document, {"code", "label", "votes", "neighbours"} best first
+    """
+    categories = get_categories("./TOS/english_tos.xml")
+    index = get_neighbour_index()
+    return [
+        [
+            {**vote, "label": categories.get(vote["code"], "")}
+            for vote in index.vote(vector, k=k)
+        ]
+        for vector in document_vectors(texts)
+    ]
@@ -0,0 +1,109 @@
+import hashlib
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+
+def content_id(*parts: str, length: int = 16) -> str:
+    """
+    Build a short, stable id from the hash of some content.
+
+    Args:
+        parts (str): Strings identifying the content
+        length (int): Number of hex characters to keep
+
+    Returns:
+        str: Truncated SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:length]
+
+
+def chunk_pages(
+    pages: Sequence[str], window: int = 256, overlap: int = 32
+) -> List[Dict]:
+    """
+    Split page texts into overlapping windows of words that may span page boundaries.
+
+    Args:
+        pages (Sequence[str]): Text of each page (None pages are treated as empty)
+        window (int): Number of words per chunk
+        overlap (int): Number of words shared by consecutive chunks
+
+    Returns:
+        List[Dict]: Chunks with their "text", "index", "page_start" and "page_end" (0-based)
+    """
+    if overlap >= window:
+        raise ValueError("overlap must be smaller than window")
+
+    words = []
+    word_pages = []
+    for page_number, page in enumerate(pages):
+        page_words = (page or "").split()
+        words.extend(page_words)
+        word_pages.extend([page_number] * len(page_words))
+
+    chunks = []
+    stride = window - overlap
+    for start in range(0, max(len(words) - overlap, 1), stride):
+        end = min(start + window, len(words))
+        if start >= end:
+            break
+        chunks.append(
+            {
+                "text": " ".join(words[start:end]),
+                "index": len(chunks),
+                "page_start": word_pages[start],
+                "page_end": word_pages[end - 1],
+            }
+        )
+    return chunks
+
+
+def embed_in_batches(
+    texts: Sequence[str],
+    embed: Callable[[List[str]], List[List[float]]],
+    batch_size: int = 32,
+) -> List[List[float]]:
+    """
+    Embed texts with one embedding request per batch instead of one per text.
+
+    Args:
+        texts (Sequence[str]): Texts to embed
+        embed (Callable): Function turning a list of texts into a list of embeddings
+        batch_size (int): Number of texts per request
+
+    Returns:
+        List[List[float]]: One embedding per text, in order
+    """
+    embeddings = []
+    for start in range(0, len(texts), batch_size):
+        embeddings.extend(embed(list(texts[start : start + batch_size])))
+    return embeddings
+
+
+def pool_embeddings(
+    embeddings: Sequence[Sequence[float]], weights: Sequence[float]
+) -> np.ndarray:
+    """
+    Combine chunk embeddings into one document vector.
+
+    Each chunk is L2-normalized and weighted (typically by its length), so long chunks
+    count more and no single chunk dominates through its norm.
+
+    Args:
+        embeddings (Sequence[Sequence[float]]): Chunk embeddings
+        weights (Sequence[float]): One weight per chunk
+
+    Returns:
+        np.ndarray: Unit-length document vector
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    pooled = np.asarray(weights, dtype=np.float32) @ (matrix / norms)
+    norm = np.linalg.norm(pooled)
+    return pooled / norm if norm else pooled
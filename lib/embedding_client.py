@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+
+from lib.metrics import metrics
+
+
+class EmbeddingError(Exception):
+    pass
+
+
+class EmbeddingClient:
+    """
+    Embedding client for the Ollama /api/embed endpoint with micro-batching.
+
+    Every request, whether made from a thread through __call__ or from any event loop
+    through aembed, is queued on one background event loop. Requests arriving within
+    `max_delay` seconds of each other are merged into a single HTTP call of at most
+    `max_batch_size` texts, sent over a pooled keep-alive connection, and retried with
+    exponential backoff on transport errors, 429 and 5xx responses.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        url: str = "http://localhost:11434",
+        max_batch_size: int = 64,
+        max_delay: float = 0.01,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_connections: int = 8,
+    ):
+        """
+        Args:
+            model_name (str): Embedding model served by Ollama
+            url (str): Base URL of the Ollama server
+            max_batch_size (int): Maximum number of texts per HTTP request
+            max_delay (float): Seconds to wait for more requests before sending a batch
+            timeout (float): Timeout of each HTTP request, in seconds
+            max_retries (int): Number of retries after a failed request
+            backoff (float): Delay before the first retry, doubled on each retry
+            max_connections (int): Size of the keep-alive connection pool
+        """
+        self.model_name = model_name
+        self.url = url.rstrip("/")
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """
+        Start the background event loop and batcher on first use.
+        """
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._queue = asyncio.Queue()
+                    self._http = httpx.AsyncClient(
+                        timeout=self.timeout,
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections,
+                        ),
+                    )
+                    loop.create_task(self._batcher())
+                    started.set()
+                    loop.run_forever()
+                    loop.close()
+
+                self._thread = threading.Thread(target=run, name="embedding-client", daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+        return self._loop
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, blocking until the batch containing them is answered.
+
+        Args:
+            texts (List[str]): Texts to embed (a single string is accepted too)
+
+        Returns:
+            List[List[float]]: One embedding per text
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._submit(texts), loop).result()
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts from any event loop.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per text
+        """
+        loop = self._ensure_started()
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self._submit(list(texts)), loop)
+        )
+
+    async def _submit(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _batcher(self):
+        """
+        Merge queued requests into batches and send them.
+        """
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+
+            while size < self.max_batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(request)
+                size += len(request[0])
+
+            asyncio.get_running_loop().create_task(self._dispatch(pending))
+
+    async def _dispatch(self, pending: List[Tuple[List[str], asyncio.Future]]):
+        """
+        Embed a merged batch and hand each caller its own slice of the results.
+        """
+        texts = [text for request_texts, _ in pending for text in request_texts]
+        metrics.observe("embedding_batch_texts", len(texts), requests=len(pending))
+        try:
+            embeddings = []
+            for start in range(0, len(texts), self.max_batch_size):
+                embeddings.extend(
+                    await self._post(texts[start : start + self.max_batch_size])
+                )
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for request_texts, future in pending:
+            if not future.done():
+                future.set_result(embeddings[offset : offset + len(request_texts)])
+            offset += len(request_texts)
+
+    async def _post(self, texts: List[str]) -> List[List[float]]:
+        """
+        Send one embedding request, retrying transient failures.
+        """
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                start = time.perf_counter()
+                response = await self._http.post(
+                    f"{self.url}/api/embed",
+                    json={"model": self.model_name, "input": texts},
+                )
+                metrics.observe(
+                    "embedding_request_seconds",
+                    time.perf_counter() - start,
+                    status=response.status_code,
+                )
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    embeddings = response.json()["embeddings"]
+                    if len(embeddings) != len(texts):
+                        raise EmbeddingError(
+                            f"Expected {len(texts)} embeddings, got {len(embeddings)}"
+                        )
+                    return embeddings
+                error = EmbeddingError(
+                    f"Embedding server returned {response.status_code}: {response.text[:200]}"
+                )
+            except httpx.TransportError as e:
+                error = EmbeddingError(f"An error occurred while contacting the embedding server: {e}")
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+
+        raise error
+
+    async def _shutdown(self):
+        # Cancel the batcher and in-flight batches before the loop stops, so no task
+        # is destroyed while pending
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._http.aclose()
+
+    def close(self):
+        """
+        Cancel pending requests, close pooled connections and stop the background event loop.
+        """
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+            self._thread = None
@@ -0,0 +1,274 @@
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from filelock import FileLock
+
+from lib.metrics import metrics
+
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "./cache/embeddings")
+STORE_FORMAT_VERSION = 1
+DTYPES = ("float16", "int8")
+# Share of max_rows kept by a compaction, so the next one is max_rows / 4 adds away
+COMPACT_KEEP = 0.75
+
+
+def quantize(vectors: np.ndarray, dtype: str):
+    """
+    L2-normalize vectors and convert them to the storage type.
+
+    int8 rows are scaled so their largest component maps to 127; the per-row scale is
+    needed to restore them.
+
+    Args:
+        vectors (np.ndarray): (n, dim) float vectors
+        dtype (str): "float16" or "int8"
+
+    Returns:
+        tuple: The quantized (n, dim) array and the float32 scale of each row (None for float16)
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class EmbeddingStore:
+    """
+    Append-only store of unit-length embeddings in memory-mapped files.
+
+    A directory holds `meta.json` (dimensions and storage type), `vectors.bin` (one row
+    per embedding, float16 or int8), `scales.bin` (float32 per row, int8 only) and
+    `ids.txt` (one id per line, the line number is the row). Files are mapped
+    read-only, so every process on the node shares the same pages and opening a store
+    costs nothing beyond reading the ids. Adding an id again appends a new row that
+    replaces the old one in the index.
+
+    With max_rows set, a store whose files grow past max_rows rows is compacted: the
+    replaced rows are dropped and only the most recently added embeddings are kept.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dimensions: Optional[int] = None,
+        dtype: str = "float16",
+        max_rows: Optional[int] = None,
+    ):
+        """
+        Args:
+            directory (str): Directory of the store, created on first use
+            dimensions (Optional[int]): Size of the vectors, taken from the first add when unknown
+            dtype (str): Storage type of new stores, "float16" or "int8"
+            max_rows (Optional[int]): Rows after which the store is compacted, None to grow without limit
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}, got {dtype!r}")
+
+        self.directory = directory
+        self.dimensions = dimensions
+        self.dtype = dtype
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._ids_inode = None
+        self._reset()
+        self.refresh()
+
+    def _reset(self):
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.vectors = np.zeros((0, self.dimensions or 0), dtype=self.dtype)
+        self.scales = None
+        self._ids_offset = 0
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, "meta.json"))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def refresh(self):
+        """
+        Pick up rows appended since the last refresh, by this or another process.
+        """
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        # Callers hold self._lock: concurrent refreshes would read the same ids twice
+        try:
+            file = open(self._path("ids.txt"), "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+
+        with file:
+            inode = os.fstat(file.fileno()).st_ino
+            if inode != self._ids_inode:
+                # Created or compacted, possibly by another process, since the last refresh
+                self._load_meta()
+                self._reset()
+                self._ids_inode = inode
+            file.seek(self._ids_offset)
+            data = file.read()
+        # Only complete lines: a concurrent writer may be halfway through one
+        complete = data[: data.rfind("\n") + 1]
+        self._ids_offset += len(complete.encode("utf-8"))
+        for line in complete.splitlines():
+            self.index[line] = len(self.ids)
+            self.ids.append(line)
+
+        rows = len(self.ids)
+        if rows == 0 or rows == len(self.vectors):
+            # Nothing appended; keep the current mapping
+            return
+        self.vectors = np.memmap(
+            self._path("vectors.bin"), dtype=self.dtype, mode="r", shape=(rows, self.dimensions)
+        )
+        if self.dtype == "int8":
+            self.scales = np.memmap(self._path("scales.bin"), dtype=np.float32, mode="r", shape=(rows,))
+
+    def _load_meta(self):
+        with open(self._path("meta.json"), "r") as file:
+            meta = json.load(file)
+        if meta.get("version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store version in {self.directory}")
+        self.dimensions = meta["dimensions"]
+        self.dtype = meta["dtype"]
+
+    def _write_meta(self, directory: str):
+        with open(os.path.join(directory, "meta.json"), "w") as file:
+            json.dump(
+                {"version": STORE_FORMAT_VERSION, "dimensions": self.dimensions, "dtype": self.dtype},
+                file,
+            )
+
+    def add(self, ids: Sequence[str], vectors):
+        """
+        Append embeddings, normalized and quantized to the store's type.
+
+        Args:
+            ids (Sequence[str]): Id of each embedding (no newlines)
+            vectors: (n, dim) embeddings
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        if len(ids) == 0:
+            return
+
+        with self._lock, FileLock(self.directory.rstrip("/\\") + ".lock"):
+            os.makedirs(self.directory, exist_ok=True)
+            if self.exists(self.directory):
+                # Another process may have created the store with its own dimensions and type
+                self._load_meta()
+            else:
+                self.dimensions = self.dimensions or vectors.shape[1]
+                self._write_meta(self.directory)
+            if vectors.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions} dimensions, got {vectors.shape[1]}")
+
+            quantized, scales = quantize(vectors, self.dtype)
+            # Vectors are written before their ids, so readers never see an id without its row
+            with open(self._path("vectors.bin"), "ab") as file:
+                file.write(quantized.tobytes())
+            if scales is not None:
+                with open(self._path("scales.bin"), "ab") as file:
+                    file.write(scales.tobytes())
+            with open(self._path("ids.txt"), "a", encoding="utf-8") as file:
+                file.write("".join(f"{id_}\n" for id_ in ids))
+
+            self._refresh()
+            if self.max_rows is not None and len(self.ids) > self.max_rows:
+                self._compact(max(1, int(self.max_rows * COMPACT_KEEP)))
+
+    def _compact(self, keep: int):
+        """
+        Rewrite the store with the latest row of its `keep` most recently added ids.
+        Must be called with the store's lock and file lock held.
+        """
+        rows = sorted(self.index.values())[-keep:]
+        base = self.directory.rstrip("/\\")
+        staging = f"{base}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        self._write_meta(staging)
+        with open(os.path.join(staging, "vectors.bin"), "wb") as file:
+            file.write(np.ascontiguousarray(self.vectors[rows]).tobytes())
+        if self.scales is not None:
+            with open(os.path.join(staging, "scales.bin"), "wb") as file:
+                file.write(np.ascontiguousarray(self.scales[rows]).tobytes())
+        with open(os.path.join(staging, "ids.txt"), "w", encoding="utf-8") as file:
+            file.write("".join(f"{self.ids[row]}\n" for row in rows))
+
+        # Renames keep every path either old or complete; mapped pages of the old files
+        # stay valid for readers until they refresh
+        retired = f"{base}.old-{os.getpid()}"
+        os.replace(self.directory, retired)
+        os.replace(staging, self.directory)
+        shutil.rmtree(retired, ignore_errors=True)
+        metrics.inc("embedding_store_compactions_total")
+        metrics.observe("embedding_store_rows", len(rows))
+        self._refresh()
+
+    def get(self, id_: str) -> Optional[np.ndarray]:
+        """
+        Args:
+            id_ (str): Id of the embedding
+
+        Returns:
+            Optional[np.ndarray]: The dequantized float32 vector, None when unknown
+        """
+        with self._lock:
+            row = self.index.get(id_)
+            if row is None:
+                self._refresh()
+                row = self.index.get(id_)
+                if row is None:
+                    return None
+            vector = np.asarray(self.vectors[row], dtype=np.float32)
+            if self.scales is not None:
+                vector = vector * self.scales[row]
+        return vector
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def build(
+        cls, directory: str, ids: Sequence[str], vectors, dtype: str = "float16"
+    ) -> "EmbeddingStore":
+        """
+        Write a complete store at once, replacing any store in the directory.
+        Written to a temporary directory first, so readers never see a partial store.
+
+        Args:
+            directory (str): Directory of the store
+            ids (Sequence[str]): Id of each embedding
+            vectors: (n, dim) embeddings
+            dtype (str): "float16" or "int8"
+
+        Returns:
+            EmbeddingStore: The opened store
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        staging = f"{directory.rstrip('/')}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        cls(staging, vectors.shape[1], dtype).add(ids, vectors)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+        try:
+            os.remove(staging + ".lock")
+        except OSError:
+            pass
+        return cls(directory)
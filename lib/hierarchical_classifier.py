@@ -0,0 +1,96 @@
+from typing import Dict, List
+
+import numpy as np
+
+from lib.similarity import SimilarityEngine
+
+
+class HierarchicalClassifier:
+    """
+    Beam search down the category tree instead of scoring every leaf.
+
+    At each level only the children of the best `beam_width` internal nodes are scored,
+    so a document is compared against a few dozen nodes rather than the full leaf set.
+    """
+
+    def __init__(self, tree: Dict[str, Dict], engine: SimilarityEngine):
+        """
+        Args:
+            tree (Dict[str, Dict]): Hierarchy nodes as returned by lib.parse_xml.get_category_tree
+            engine (SimilarityEngine): Engine holding an embedding for every node of the tree
+        """
+        self.tree = tree
+        self.engine = engine
+        self.roots = [code for code, node in tree.items() if node["parent"] is None]
+
+    def classify(self, vector, k: int = 5, beam_width: int = 5) -> Dict:
+        """
+        Descend the hierarchy and return the best leaves together with the path taken.
+
+        Args:
+            vector: Document vector
+            k (int): Number of leaf categories to return
+            beam_width (int): Number of internal nodes expanded at each level
+
+        Returns:
+            Dict: "classifications", a ranked list of {"code", "label", "score", "path"} where
+            path lists the scored ancestors from the top level down, and "nodes_compared",
+            the number of nodes the document was scored against.
+        """
+        frontier = list(self.roots)
+        paths = {code: [] for code in frontier}
+        leaves = []
+        nodes_compared = 0
+
+        while frontier:
+            scores = self.engine.subset_scores(vector, frontier)
+            nodes_compared += len(frontier)
+
+            internal = []
+            for code, score in zip(frontier, scores.tolist()):
+                step = paths[code] + [{"code": code, "score": round(score, 4)}]
+                if self.tree[code]["children"]:
+                    internal.append((score, code, step))
+                else:
+                    # Leaves are already scored, so they all stay candidates
+                    leaves.append((score, code, step))
+
+            # Only the best internal nodes are expanded to the next level
+            internal.sort(key=lambda item: item[0], reverse=True)
+            frontier = []
+            for _, code, step in internal[:beam_width]:
+                for child in self.tree[code]["children"]:
+                    paths[child] = step
+                    frontier.append(child)
+
+        leaves.sort(key=lambda item: item[0], reverse=True)
+        classifications = [
+            {
+                "code": code,
+                "label": self.tree[code]["path"],
+                "score": round(score, 4),
+                "path": step[:-1],
+            }
+            for score, code, step in leaves[:k]
+        ]
+
+        return {"classifications": classifications, "nodes_compared": nodes_compared}
+
+    def classify_batch(
+        self, vectors, k: int = 5, beam_width: int = 5
+    ) -> List[Dict]:
+        """
+        Run classify for each row of a (n_documents, dim) array.
+
+        Args:
+            vectors: Document vectors
+            k (int): Number of leaf categories to return per document
+            beam_width (int): Number of internal nodes expanded at each level
+
+        Returns:
+            List[Dict]: One classify result per document
+        """
+        return [
+            self.classify(vector, k=k, beam_width=beam_width)
+            for vector in np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        ]
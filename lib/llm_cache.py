@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from crewai import LLM
+from litellm import token_counter
+
+from lib.metrics import metrics
+
+LLM_CACHE_PATH = "./cache/llm_cache.sqlite"
+
+
+def llm_cache_enabled() -> bool:
+    """
+    Whether LLM responses may be served from cache. Set LLM_CACHE=0 for non-deterministic runs.
+
+    Returns:
+        bool: False when the LLM_CACHE environment variable is "0", "false" or "off"
+    """
+    return os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "off")
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of LLM responses: an in-memory LRU in front of a persistent SQLite store.
+
+    Entries expire after `ttl` seconds in both tiers. The memory tier holds at most
+    `max_entries` responses; the disk tier evicts least recently used responses once
+    their total size exceeds `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_PATH,
+        max_entries: int = 1024,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float = 7 * 24 * 3600,
+    ):
+        """
+        Args:
+            path (str): Location of the SQLite database
+            max_entries (int): Maximum number of responses kept in memory
+            max_bytes (int): Maximum total size of responses kept on disk
+            ttl (float): Seconds after which a response is no longer served
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        """
+        Build the cache key of a request.
+
+        The messages contain the rendered task prompt and every tool output the agent
+        has seen so far, so a different tool result produces a different key.
+
+        Args:
+            model (str): Model name
+            messages (List[Dict[str, str]]): Chat messages sent to the model
+            params (Dict[str, Any]): Sampling parameters affecting the response
+
+        Returns:
+            str: SHA-256 hex digest of the request
+        """
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look a response up, memory tier first.
+
+        Args:
+            key (str): Value returned by key()
+
+        Returns:
+            Optional[str]: Cached response, or None on a miss or expired entry
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created = entry
+                if now - created < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return response
+                del self._memory[key]
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT response, created FROM responses WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits["disk"] += 1
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def set(self, key: str, response: str):
+        """
+        Store a response in both tiers.
+
+        Args:
+            key (str): Value returned by key()
+            response (str): Response of the model
+        """
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, response, now)
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, response, len(response), now, now),
+            )
+            self._evict(connection, now)
+
+    def _remember(self, key: str, response: str, created: float):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, connection: sqlite3.Connection, now: float):
+        """
+        Drop expired responses, then the least recently used until the store fits in max_bytes.
+        """
+        connection.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        expired = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM responses ORDER BY last_access"
+        ):
+            if total <= self.max_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", expired)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report hits per tier and misses for this instance.
+
+        Returns:
+            Dict[str, int]: "memory_hits", "disk_hits", "misses" and in-memory "entries"
+        """
+        with self._lock:
+            return {
+                "memory_hits": self.hits["memory"],
+                "disk_hits": self.hits["disk"],
+                "misses": self.misses,
+                "entries": len(self._memory),
+            }
+
+
+class CachedLLM(LLM):
+    """
+    crewai LLM that serves identical requests from an LLMResponseCache.
+
+    Every call records its latency, cache outcome and prompt/completion token counts
+    under the `agent` label.
+    """
+
+    def __init__(
+        self,
+        *args,
+        cache: Optional[LLMResponseCache] = None,
+        agent: str = "",
+        **kwargs,
+    ):
+        """
+        Args:
+            cache (Optional[LLMResponseCache]): Response cache, None disables caching.
+            agent (str): Name of the agent using this LLM, used as metrics label.
+                Remaining arguments are passed to crewai.LLM.
+        """
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.agent = agent
+
+    def call(self, messages: List[Dict[str, str]], callbacks: List[Any] = []) -> str:
+        start = time.perf_counter()
+        response, result = self._cached_call(messages, callbacks)
+        metrics.observe(
+            "llm_call_seconds",
+            time.perf_counter() - start,
+            agent=self.agent,
+            cache=result,
+        )
+
+        # Cached responses cost no tokens
+        if result != "hit":
+            metrics.inc(
+                "llm_prompt_tokens_total",
+                token_counter(model=self.model, messages=messages),
+                agent=self.agent,
+            )
+            metrics.inc(
+                "llm_completion_tokens_total",
+                token_counter(model=self.model, text=response or ""),
+                agent=self.agent,
+            )
+        return response
+
+    def _cached_call(self, messages: List[Dict[str, str]], callbacks: List[Any]):
+        """
+        Returns:
+            tuple: The response and whether it was a cache "hit", "miss" or "disabled"
+        """
+        if self.cache is None:
+            return super().call(messages, callbacks), "disabled"
+
+        key = self.cache.key(
+            self.model,
+            messages,
+            {
+                "temperature": self.temperature,
+                "top_p": self.top_p,
+                "stop": self.stop,
+                "max_tokens": self.max_tokens or self.max_completion_tokens,
+                "response_format": self.response_format,
+                "seed": self.seed,
+            },
+        )
+
+        response = self.cache.get(key)
+        metrics.inc(
+            "cache_requests_total",
+            cache="llm",
+            result="miss" if response is None else "hit",
+        )
+        if response is not None:
+            return response, "hit"
+
+        response = super().call(messages, callbacks)
+        if response:
+            self.cache.set(key, response)
+        return response, "miss"
@@ -0,0 +1,234 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+METRICS_JSONL_PATH = "logs/metrics.jsonl"
+METRICS_PROMETHEUS_PATH = "logs/metrics.prom"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """
+    Process-wide registry of counters and timing summaries.
+
+    Every observation updates in-memory aggregates, exported as a Prometheus text
+    snapshot, and, once a JSONL path is configured, is also appended as one JSON
+    line so individual events (a task, a tool call, a page) can be analysed later.
+    Worker processes append to the same JSONL file; the snapshot only covers the
+    process that writes it.
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._summaries: Dict[Tuple[str, Labels], list] = {}
+        self._lock = threading.Lock()
+        self._jsonl_path: Optional[str] = None
+
+    def configure(self, jsonl_path: Optional[str] = METRICS_JSONL_PATH):
+        """
+        Start (or stop, with None) appending events to a JSONL file.
+
+        Args:
+            jsonl_path (Optional[str]): File receiving one JSON object per event
+        """
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+        self._jsonl_path = jsonl_path
+
+    def _emit(self, kind: str, name: str, value: float, labels: Dict[str, str]):
+        if self._jsonl_path is None:
+            return
+        record = {"ts": round(time.time(), 6), "kind": kind, "name": name, "value": value, **labels}
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock, open(self._jsonl_path, "a") as file:
+            file.write(line)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): Metric name, e.g. "cache_requests_total"
+            value (float): Amount to add
+            labels: Label values, e.g. cache="text", result="hit"
+        """
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit("counter", name, value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record one observation (a duration, a size) in a summary.
+
+        Args:
+            name (str): Metric name, e.g. "task_seconds"
+            value (float): Observed value
+            labels: Label values, e.g. task="Document Classification"
+        """
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+        self._emit("observation", name, value, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Observe the wall time of a block, in seconds, whether it succeeds or fails.
+
+        Args:
+            name (str): Metric name, e.g. "tool_call_seconds"
+            labels: Label values
+        """
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, status=status, **labels)
+
+    def snapshot(self) -> Dict:
+        """
+        Return the current aggregates.
+
+        Returns:
+            Dict: "counters" and "summaries" (count, sum, max), each keyed by metric name
+            and label string
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {key: list(value) for key, value in self._summaries.items()}
+
+        result = {"counters": {}, "summaries": {}}
+        for (name, labels), value in counters.items():
+            result["counters"].setdefault(name, {})[_label_string(labels)] = value
+        for (name, labels), (count, total, maximum) in summaries.items():
+            result["summaries"].setdefault(name, {})[_label_string(labels)] = {
+                "count": count,
+                "sum": total,
+                "max": maximum,
+            }
+        return result
+
+    def to_prometheus(self) -> str:
+        """
+        Render the aggregates in the Prometheus text exposition format.
+
+        Returns:
+            str: Counters as counters, observations as summaries with _count and _sum
+            plus a _max gauge
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            summaries = sorted(self._summaries.items())
+
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            lines.append(f"{name}{_label_string(labels)} {value:g}")
+
+        # Each family's samples must be contiguous, so maxima get their own pass
+        for name in sorted({name for (name, _), _ in summaries}):
+            family = [(labels, value) for (key, labels), value in summaries if key == name]
+            lines.append(f"# TYPE {name} summary")
+            for labels, (count, total, _) in family:
+                lines.append(f"{name}_count{_label_string(labels)} {count}")
+                lines.append(f"{name}_sum{_label_string(labels)} {total:.6f}")
+            lines.append(f"# TYPE {name}_max gauge")
+            for labels, (_, _, maximum) in family:
+                lines.append(f"{name}_max{_label_string(labels)} {maximum:.6f}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str = METRICS_PROMETHEUS_PATH):
+        """
+        Write the Prometheus snapshot to a file, e.g. for the node exporter textfile collector.
+
+        Args:
+            path (str): Destination file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def reset(self):
+        """
+        Clear every aggregate.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+def resident_bytes() -> int:
+    """
+    Resident set size of the current process.
+
+    Returns:
+        int: Current RSS in bytes on Linux, the peak RSS elsewhere
+    """
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _label_string(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class TaskTimer:
+    """
+    crewai task_callback recording the wall time of each task of a sequential crew.
+
+    Tasks run one after another, so a task's duration is the time since the previous
+    task finished, or since start() for the first one.
+    """
+
+    def __init__(self, registry: Optional[Metrics] = None):
+        self.registry = registry or metrics
+        self.start()
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def __call__(self, task_output):
+        now = time.perf_counter()
+        task = getattr(task_output, "name", None) or getattr(task_output, "description", "")[:60]
+        self.registry.observe(
+            "task_seconds",
+            now - self._last,
+            task=task,
+            agent=getattr(task_output, "agent", ""),
+        )
+        self._last = now
+
+
+metrics = Metrics()
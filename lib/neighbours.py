@@ -0,0 +1,157 @@
+import json
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+from lib.chunking import content_id
+from lib.metrics import metrics
+
+NEIGHBOUR_COLLECTION_PREFIX = "classified-documents-"
+
+# HNSW graph parameters: queries visit O(log n) nodes, so latency stays flat as the archive grows
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
+# Reviewed documents carry a human-validated label set and count for more
+REVIEWED_WEIGHT = 2.0
+
+
+def neighbour_collection_name(model_name: str) -> str:
+    # Vectors of different embedding models are not comparable
+    return f"{NEIGHBOUR_COLLECTION_PREFIX}{content_id(model_name, length=16)}"
+
+
+class NeighbourIndex:
+    """
+    Archive of classified documents in a ChromaDB HNSW collection, queried for
+    label votes of the nearest documents.
+
+    One entry per document: its pooled embedding, its final label codes and whether a
+    reviewer validated them.
+    """
+
+    def __init__(self, collection):
+        """
+        Args:
+            collection (chromadb.Collection): Collection created with HNSW_METADATA
+        """
+        self.collection = collection
+
+    @classmethod
+    def open(cls, client, model_name: str) -> "NeighbourIndex":
+        return cls(
+            client.get_or_create_collection(
+                neighbour_collection_name(model_name), metadata=HNSW_METADATA
+            )
+        )
+
+    def add(
+        self,
+        document_id: str,
+        vector,
+        codes: Sequence[str],
+        reviewed: bool = False,
+        source: Optional[str] = None,
+    ):
+        """
+        Add or replace a classified document.
+
+        Args:
+            document_id (str): Id of the document, e.g. its result store key
+            vector: Pooled embedding of the document
+            codes (Sequence[str]): Final label codes, best first
+            reviewed (bool): Whether a reviewer validated the labels
+            source (Optional[str]): Where the document came from
+        """
+        self.collection.upsert(
+            ids=[document_id],
+            embeddings=[[float(value) for value in vector]],
+            metadatas=[
+                {
+                    # Metadata values must be scalars
+                    "labels": json.dumps(list(codes)),
+                    "reviewed": reviewed,
+                    "source": source or "",
+                }
+            ],
+        )
+
+    def mark_reviewed(self, document_id: str, codes: Sequence[str]):
+        """
+        Replace the labels of an archived document with reviewed ones.
+
+        Args:
+            document_id (str): Id of the document
+            codes (Sequence[str]): Reviewed label codes, best first
+        """
+        self.collection.update(
+            ids=[document_id],
+            metadatas=[{"labels": json.dumps(list(codes)), "reviewed": True}],
+        )
+
+    def vote(
+        self,
+        vector,
+        k: int = 10,
+        reviewed_only: bool = False,
+        exclude: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Let the k nearest classified documents vote for their labels.
+
+        Each neighbour gives its cosine similarity to each of its labels, discounted by
+        the label's rank (1, 1/2, 1/3...) and doubled for reviewed documents. Votes are
+        normalized so they sum to 1.
+
+        Args:
+            vector: Pooled embedding of the document to classify
+            k (int): Number of neighbours
+            reviewed_only (bool): Only consult reviewed documents
+            exclude (Optional[str]): Id of a document to ignore, e.g. the document itself
+
+        Returns:
+            List[Dict]: {"code", "votes", "neighbours"} best first, empty when the archive is empty
+        """
+        count = self.collection.count()
+        if count == 0:
+            return []
+
+        with metrics.timer("neighbour_query_seconds"):
+            response = self.collection.query(
+                query_embeddings=[[float(value) for value in vector]],
+                n_results=min(k + (exclude is not None), count),
+                where={"reviewed": True} if reviewed_only else None,
+                include=["metadatas", "distances"],
+            )
+
+        votes = defaultdict(float)
+        neighbours = defaultdict(int)
+        for document_id, metadata, distance in zip(
+            response["ids"][0], response["metadatas"][0], response["distances"][0]
+        ):
+            if document_id == exclude:
+                continue
+            # Cosine distance is 1 - similarity
+            weight = 1.0 - distance
+            if weight <= 0:
+                continue
+            if metadata.get("reviewed"):
+                weight *= REVIEWED_WEIGHT
+            for rank, code in enumerate(json.loads(metadata["labels"])):
+                votes[code] += weight / (rank + 1)
+                neighbours[code] += 1
+
+        total = sum(votes.values()) or 1.0
+        return sorted(
+            (
+                {"code": code, "votes": round(vote / total, 4), "neighbours": neighbours[code]}
+                for code, vote in votes.items()
+            ),
+            key=lambda entry: -entry["votes"],
+        )
+
+    def __len__(self) -> int:
+        return self.collection.count()
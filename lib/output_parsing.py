@@ -0,0 +1,198 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError, ValidationInfo, field_validator
+
+from lib.metrics import metrics
+
+LABEL_COUNT = 5
+CATEGORY_CODE = re.compile(r"\b\d{2}(?:\.\d{2})+\b")
+CODE_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+# Names of the tasks whose output must be a ClassificationResult
+VALIDATED_TASKS = {"Document Classification", "Human Review"}
+
+
+class Classification(BaseModel):
+    label: str = Field(description="Code of a category of the hierarchy")
+    confidence_score: float = Field(ge=0, le=1)
+    reasoning: str = Field(default="", alias="Reasoning")
+
+    model_config = {"populate_by_name": True}
+
+    @field_validator("label", mode="before")
+    @classmethod
+    def resolve_label(cls, value: Any, info: ValidationInfo) -> str:
+        """
+        Accept a code, a "code: path" line or a full path, and check that the code
+        belongs to the hierarchy passed as validation context.
+        """
+        categories = (info.context or {}).get("categories")
+        value = str(value).strip()
+        match = CATEGORY_CODE.search(value)
+        code = match.group(0) if match else None
+
+        if categories is None:
+            return code or value
+        if code is None:
+            code = info.context["paths"].get(value)
+        if code not in categories:
+            raise ValueError(f"{value!r} is not a category code of the hierarchy")
+        return code
+
+
+class ClassificationResult(BaseModel):
+    validated_classifications: List[Classification] = Field(
+        min_length=LABEL_COUNT, max_length=LABEL_COUNT
+    )
+    improvement_feedback: str = ""
+    # Calibrated entropy, margins and review flags, see lib.calibration
+    confidence: Optional[Dict[str, Any]] = None
+
+    @field_validator("validated_classifications")
+    @classmethod
+    def distinct_labels(cls, value: List[Classification]) -> List[Classification]:
+        codes = [classification.label for classification in value]
+        if len(set(codes)) != len(codes):
+            raise ValueError("labels must be distinct")
+        return value
+
+
+def extract_json(text: str) -> Optional[Dict]:
+    """
+    Find the first JSON object in a model output, ignoring surrounding prose and code fences.
+
+    Args:
+        text (str): Raw output of a task
+
+    Returns:
+        Optional[Dict]: The decoded object, None when the text contains no valid JSON object
+    """
+    text = CODE_FENCE.sub("", text or "")
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+def parse_result(text: str, categories: Optional[Dict[str, str]] = None) -> ClassificationResult:
+    """
+    Extract and validate the classification JSON of a task output.
+
+    The agents' response formats use "classifications" where the tasks ask for
+    "validated_classifications"; both are accepted.
+
+    Args:
+        text (str): Raw output of a task
+        categories (Optional[Dict[str, str]]): Hierarchy the labels must belong to
+
+    Returns:
+        ClassificationResult: The validated result, labels resolved to category codes
+
+    Raises:
+        ValueError: The output holds no JSON object or does not match the schema
+    """
+    data = extract_json(text)
+    if data is None:
+        raise ValueError("No JSON object found in the output")
+    if "validated_classifications" not in data and "classifications" in data:
+        data["validated_classifications"] = data.pop("classifications")
+    for classification in data.get("validated_classifications") or []:
+        if isinstance(classification, dict):
+            for alias in ("reasoning", "validation_notes"):
+                if alias in classification and "Reasoning" not in classification:
+                    classification["Reasoning"] = classification.pop(alias)
+
+    paths = {path: code for code, path in (categories or {}).items()}
+    return ClassificationResult.model_validate(
+        data, context={"categories": categories, "paths": paths}
+    )
+
+
+def describe_error(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return "\n".join(
+            f"- {'.'.join(str(part) for part in item['loc']) or 'output'}: {item['msg']}"
+            for item in error.errors()
+        )
+    return f"- {error}"
+
+
+def repair_messages(text: str, error: ValueError, expected_output: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": "You correct classification outputs. Answer with the corrected JSON object only.",
+        },
+        {
+            "role": "user",
+            "content": f"""The output below does not match the required format.
+
+Problems:
+{describe_error(error)}
+
+Required format:
+{expected_output}
+
+Every "label" must be a category code taken from the output or its hierarchy, there must
+be exactly {LABEL_COUNT} distinct labels and every "confidence_score" must be a number between 0 and 1.
+
+Output to correct:
+{text}""",
+        },
+    ]
+
+
+class OutputValidator:
+    """
+    crewai task callback validating the JSON of classification tasks.
+
+    A failing output is repaired by asking the task's own LLM to correct it, up to
+    `max_repairs` times, instead of rerunning the crew. The output is rewritten in
+    place with the normalized JSON, so later tasks and the crew result read the
+    repaired version.
+    """
+
+    def __init__(self, tasks: List[Any], categories: Dict[str, str], max_repairs: int = 2):
+        """
+        Args:
+            tasks (List[Task]): Tasks of the crew being run
+            categories (Dict[str, str]): Hierarchy the labels must belong to
+            max_repairs (int): Repair attempts per task output
+        """
+        self.tasks = {task.name: task for task in tasks if task.name in VALIDATED_TASKS}
+        self.categories = categories
+        self.max_repairs = max_repairs
+
+    def __call__(self, task_output):
+        task = self.tasks.get(getattr(task_output, "name", None))
+        if task is None:
+            return
+
+        text = task_output.raw
+        for attempt in range(self.max_repairs + 1):
+            try:
+                result = parse_result(text, self.categories)
+            except ValueError as error:
+                if attempt == self.max_repairs:
+                    metrics.inc("output_validation_total", task=task.name, result="invalid")
+                    return
+                text = task.agent.llm.call(repair_messages(text, error, task.expected_output))
+                continue
+
+            metrics.inc(
+                "output_validation_total",
+                task=task.name,
+                result="valid" if attempt == 0 else "repaired",
+            )
+            task_output.json_dict = result.model_dump(by_alias=True, exclude_none=True)
+            task_output.raw = json.dumps(task_output.json_dict, ensure_ascii=False)
+            return
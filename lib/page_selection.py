@@ -0,0 +1,118 @@
+import math
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+from lib.candidates import tokenize
+from lib.chunking import chunk_pages
+from lib.text_normalization import clean_pages
+
+# Pages read from a document before selecting passages, spread from the first to the last page
+SAMPLE_PAGES = 24
+# Tokens of document text sent to the crew, whatever the length of the document
+TOKEN_BUDGET = 2000
+# Rough characters per token for English text; keeps selection independent of the model
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def content_ratio(text: str) -> float:
+    """
+    Fraction of the whitespace-separated tokens of a passage that are words.
+    Tables of contents, figures and numeric tables score low.
+
+    Args:
+        text (str): Passage text
+
+    Returns:
+        float: Ratio between 0 and 1
+    """
+    tokens = text.split()
+    if not tokens:
+        return 0.0
+    words = sum(1 for token in tokens if re.fullmatch(r"[^\W\d_]{2,}[.,;:!?)\"']*", token))
+    return words / len(tokens)
+
+
+def score_passages(passages: List[str]) -> np.ndarray:
+    """
+    Score passages by TF-IDF centrality: the cosine similarity between each passage
+    and the centroid of all passages, weighted by how much of the passage is prose.
+
+    Args:
+        passages (List[str]): Passage texts
+
+    Returns:
+        np.ndarray: One score per passage, higher is more representative
+    """
+    counts = [Counter(tokenize(passage)) for passage in passages]
+    vocabulary = {word: i for i, word in enumerate(sorted(set().union(*counts)))}
+    if not vocabulary:
+        return np.zeros(len(passages), dtype=np.float32)
+
+    matrix = np.zeros((len(passages), len(vocabulary)), dtype=np.float32)
+    for row, passage_counts in enumerate(counts):
+        for word, count in passage_counts.items():
+            matrix[row, vocabulary[word]] = 1 + math.log(count)
+
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    matrix *= np.log((1 + len(passages)) / (1 + document_frequency)) + 1
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    centroid = matrix.mean(axis=0)
+    centroid /= max(np.linalg.norm(centroid), 1e-12)
+
+    prose = np.array([content_ratio(passage) for passage in passages], dtype=np.float32)
+    return (matrix @ centroid) * prose
+
+
+def select_passages(
+    pages: List[str], token_budget: int = TOKEN_BUDGET, passage_words: int = 120
+) -> List[str]:
+    """
+    Pack the most informative passages of a document into a token budget.
+
+    Pages are cleaned, split into passages of `passage_words` words, scored with
+    `score_passages` and added best first while they fit. The selection is returned in
+    document order, so the text still reads top to bottom. When not even the best
+    passage fits, it is kept, cut to the budget, rather than returning nothing.
+
+    Args:
+        pages (List[str]): Raw page texts
+        token_budget (int): Maximum estimated tokens of the selected text
+        passage_words (int): Number of words per passage
+
+    Returns:
+        List[str]: Selected passages, in document order
+    """
+    passages = chunk_pages(clean_pages(pages), window=passage_words, overlap=0)
+    if not passages:
+        return []
+
+    texts = [passage["text"] for passage in passages]
+    if estimate_tokens(" ".join(texts)) <= token_budget:
+        return texts
+
+    scores = score_passages(texts)
+    selected = []
+    used = 0
+    for index in np.argsort(-scores, kind="stable"):
+        tokens = estimate_tokens(texts[index])
+        if used + tokens <= token_budget:
+            selected.append(int(index))
+            used += tokens
+
+    if not selected:
+        best = texts[int(np.argmax(scores))]
+        cut = best[: token_budget * CHARS_PER_TOKEN]
+        if best[len(cut) : len(cut) + 1].strip() and " " in cut:
+            # Drop the word cut in half
+            cut = cut.rsplit(" ", 1)[0]
+        return [cut]
+
+    return [texts[index] for index in sorted(selected)]
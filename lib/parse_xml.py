@@ -1,6 +1,8 @@
 import xml.etree.ElementTree as ET
 from typing import Dict
 
+from lib.tos_tree import load_tree
+
 
 def parse_itemgroup(
     element: ET.Element, categories: Dict[str, str], current_path: str = ""
@@ -70,7 +72,10 @@ def get_complete_hierarchy(xml_content: str) -> Dict[str, str]:
 
 def get_categories(xml_file_path):
     """
-    Reads the XML file, parses it, and returns the deepest hierarchical category paths.
+    Returns the deepest hierarchical category paths of an XML file.
+
+    The file is compiled once with a streaming parse and cached (see lib.tos_tree), so
+    repeated calls in this or other processes skip parsing until the file changes.
 
     Args:
         xml_file_path (str): Path to the XML file.
@@ -78,9 +83,26 @@ def get_categories(xml_file_path):
     Returns:
         Dict[str, str]: Dictionary with category codes as keys and their full hierarchical paths as values.
     """
-    # Read the XML content
-    with open(xml_file_path, "r") as file:
-        xml_content = file.read()
+    try:
+        return load_tree(xml_file_path).leaves()
+    except ET.ParseError as e:
+        print(f"XML parsing error: {e}")
+        return {}
+
+
+def get_category_tree(xml_file_path: str) -> Dict[str, Dict]:
+    """
+    Returns every node of the hierarchy, internal nodes included.
 
-    # Get the hierarchy
-    return get_complete_hierarchy(xml_content)
+    Args:
+        xml_file_path (str): Path to the XML file.
+
+    Returns:
+        Dict[str, Dict]: Dictionary with category codes as keys and, as values, dictionaries
+        holding the node "name", full "path", "parent" code and "children" codes.
+    """
+    try:
+        return load_tree(xml_file_path).as_category_tree()
+    except ET.ParseError as e:
+        print(f"XML parsing error: {e}")
+        return {}
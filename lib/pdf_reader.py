@@ -1,9 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
 import pdfplumber
 
+from lib.metrics import metrics
+from lib.text_cache import TextCache
+
+# Bump when the extraction logic changes so cached text is not reused
+EXTRACTOR_VERSION = f"pdfplumber-{pdfplumber.__version__}-1"
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract a contiguous range of pages. Runs inside the parallel extraction workers.
+
+    Args:
+        file_path (str): Path to the PDF file
+        start (int): Index of the first page to read
+        stop (int): Index after the last page to read
+
+    Returns:
+        List[str]: Text of each page in the range
+    """
+    return list(PdfReader().iter_pages(file_path, start=start, stop=stop))
+
+
+def sample_indexes(total: int, count: int) -> List[int]:
+    """
+    Pick `count` page indexes spread evenly across a document, first and last page included.
+
+    Args:
+        total (int): Number of pages of the document
+        count (int): Number of pages to sample
+
+    Returns:
+        List[int]: Sorted page indexes, every page when count >= total
+    """
+    if count >= total:
+        return list(range(total))
+    if count <= 0:
+        return []
+    if count == 1:
+        return [0]
+    return sorted({round(i * (total - 1) / (count - 1)) for i in range(count)})
+
 
 class PdfReader:
-    def __init__(self):
-        pass
+    def __init__(self, cache: Optional[TextCache] = None):
+        """
+        Args:
+            cache (Optional[TextCache]): Persistent text cache; when set, the read_* methods
+                skip extraction for files and page ranges already seen
+        """
+        self.cache = cache
+
+    def _cached(self, file_path: str, page_spec: str, extract) -> List[str]:
+        """
+        Serve a read from the text cache when one is configured.
+
+        Args:
+            file_path (str): Path to the PDF file
+            page_spec (str): Description of the requested pages
+            extract (Callable[[], List[str]]): Performs the extraction on a miss
+
+        Returns:
+            List[str]: Text of each requested page
+        """
+        if self.cache is None:
+            return extract()
+        return self.cache.get_or_extract(file_path, page_spec, EXTRACTOR_VERSION, extract)
 
     def open_pdf(self, file_path: str) -> pdfplumber.PDF:
         """
@@ -32,29 +97,143 @@ class PdfReader:
         except Exception as e:
             raise Exception(f"An error occurred while closing the PDF file: {e}")
 
-    def read_all_pages(self, file_path: str) -> list:
+    def page_count(self, file_path: str) -> int:
         """
-        Read all pages of a PDF file using pdfplumber. Return the content as a list of strings.
+        Count the pages of a PDF file.
 
         Args:
-            pdf_file (str): Path to the PDF file
+            file_path (str): Path to the PDF file
 
         Returns:
-            list: Content of the PDF file
+            int: Number of pages
         """
+        pdf_file = self.open_pdf(file_path)
+        try:
+            return len(pdf_file.pages)
+        finally:
+            self.close_pdf(pdf_file)
 
-        pdf_file = pdfplumber.open(file_path)
-        content = []
+    def iter_pages(
+        self,
+        file_path: str,
+        start: int = 0,
+        stop: Optional[int] = None,
+        step: int = 1,
+        pages: Optional[Union[Iterable[int], Callable[[int], Iterable[int]]]] = None,
+    ) -> Iterator[str]:
+        """
+        Lazily yield page texts from a single open handle.
 
-        try:
-            pdf = self.open_pdf(file_path)
+        Pages are extracted one at a time and their parsed objects released right after,
+        so memory stays flat regardless of the page count. The file is closed when the
+        iterator is exhausted or discarded.
 
-            for page in pdf.pages:
-                content.append(page.extract_text())
-            return content
+        Args:
+            file_path (str): Path to the PDF file
+            start (int): Index of the first page to read
+            stop (Optional[int]): Index after the last page to read, defaults to the end
+            step (int): Read every step-th page of the range
+            pages (Optional[Union[Iterable[int], Callable[[int], Iterable[int]]]]): Explicit
+                page indexes, overrides start/stop/step. A callable receives the page count
+                and returns the indexes, so choosing pages does not open the file twice.
+                Indexes outside the document are skipped.
+
+        Yields:
+            str: Text of each selected page
+        """
+        pdf_file = self.open_pdf(file_path)
+
+        try:
+            total = len(pdf_file.pages)
+            if pages is None:
+                indexes = range(*slice(start, stop, step).indices(total))
+            else:
+                if callable(pages):
+                    pages = pages(total)
+                indexes = [index for index in pages if 0 <= index < total]
+
+            for index in indexes:
+                with metrics.timer("pdf_page_extract_seconds"):
+                    page = pdf_file.pages[index]
+                    text = page.extract_text()
+                    page.close()
+                yield text
         except Exception as e:
-            self.close_pdf(pdf_file)
             raise Exception(f"An error occurred while reading the PDF file: {e}")
+        finally:
+            self.close_pdf(pdf_file)
+
+    def sample_pages(self, file_path: str, count: int) -> List[str]:
+        """
+        Read `count` pages spread evenly across the document, first and last page included.
+
+        Args:
+            file_path (str): Path to the PDF file
+            count (int): Number of pages to sample
+
+        Returns:
+            list: Content of the sampled pages, in document order
+        """
+        return self._cached(
+            file_path,
+            f"sample:{count}",
+            lambda: list(self.iter_pages(file_path, pages=lambda total: sample_indexes(total, count))),
+        )
+
+    def read_pages_parallel(
+        self,
+        file_path: str,
+        start: int = 0,
+        stop: Optional[int] = None,
+        workers: Optional[int] = None,
+        pages_per_worker: int = 25,
+    ) -> List[str]:
+        """
+        Extract a page range in several processes, each opening the file once for its own sub-range.
+
+        Worth it for large PDFs only: every worker pays for opening and parsing the document.
+
+        Args:
+            file_path (str): Path to the PDF file
+            start (int): Index of the first page to read
+            stop (Optional[int]): Index after the last page to read, defaults to the end
+            workers (Optional[int]): Number of processes, defaults to the CPU count
+            pages_per_worker (int): Number of pages extracted per task
+
+        Returns:
+            list: Content of the pages, in document order
+        """
+        start, stop, _ = slice(start, stop).indices(self.page_count(file_path))
+        if stop - start <= pages_per_worker:
+            return list(self.iter_pages(file_path, start=start, stop=stop))
+
+        ranges = [
+            (chunk_start, min(chunk_start + pages_per_worker, stop))
+            for chunk_start in range(start, stop, pages_per_worker)
+        ]
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = pool.map(
+                _extract_page_range,
+                [file_path] * len(ranges),
+                [chunk_start for chunk_start, _ in ranges],
+                [chunk_stop for _, chunk_stop in ranges],
+            )
+            return [text for chunk in chunks for text in chunk]
+
+    def read_all_pages(self, file_path: str) -> list:
+        """
+        Read all pages of a PDF file using pdfplumber. Return the content as a list of strings.
+
+        Args:
+            pdf_file (str): Path to the PDF file
+
+        Returns:
+            list: Content of the PDF file
+        """
+        return self._cached(
+            file_path, "0:", lambda: list(self.iter_pages(file_path))
+        )
 
     def read_page(self, file_path: str, page_number: int) -> str:
         """
@@ -66,20 +245,14 @@ class PdfReader:
             page_number (int): Page number to read
 
         Returns:
-            str: Content of the PDF file
+            str: Content of the PDF file, empty for a PDF without pages
         """
-
-        pdf_file = pdfplumber.open(file_path)
-
-        try:
-            if page_number > len(pdf_file.pages):
-                page_number = len(pdf_file.pages) - 1
-
-            self.close_pdf(pdf_file)
-            return pdf_file.pages[page_number].extract_text()
-        except Exception as e:
-            self.close_pdf(pdf_file)
-            raise Exception(f"An error occurred while reading the PDF file: {e}")
+        pages = self._cached(
+            file_path,
+            f"page:{page_number}",
+            lambda: list(self.iter_pages(file_path, pages=lambda total: [min(page_number, total - 1)])),
+        )
+        return pages[0] if pages else ""
 
     def read_upto_page(self, file_path: str, page_number: int) -> list:
         """
@@ -93,28 +266,17 @@ class PdfReader:
         Returns:
             list: Content of the PDF file
         """
-
-        pdf_file = pdfplumber.open(file_path)
-
-        content = []
-
-        try:
-            if page_number > len(pdf_file.pages):
-                page_number = len(pdf_file.pages) - 1
-
-            for i in range(page_number):
-                content.append(pdf_file.pages[i].extract_text())
-
-            self.close_pdf(pdf_file)
-            return content
-        except Exception as e:
-            self.close_pdf(pdf_file)
-            raise Exception(f"An error occurred while reading the PDF file: {e}")
+        return self._cached(
+            file_path,
+            f"0:{page_number}",
+            lambda: list(self.iter_pages(file_path, stop=page_number)),
+        )
 
     def read_from_page(self, file_path: str, page_number: int) -> list:
         """
         Read all pages of a PDF file from a specific page number using pdfplumber.
         Return the content as a list of strings.
+        If page_number is too high, read the last page.
 
         Args:
             pdf_file (str): Path to the PDF file
@@ -123,20 +285,12 @@ class PdfReader:
         Returns:
             list: Content of the PDF file
         """
-
-        pdf_file = pdfplumber.open(file_path)
-
-        content = []
-
-        try:
-            if page_number > len(pdf_file.pages):
-                page_number = len(pdf_file.pages) - 1
-
-            for i in range(page_number, len(pdf_file.pages)):
-                content.append(pdf_file.pages[i].extract_text())
-
-            self.close_pdf(pdf_file)
-            return content
-        except Exception as e:
-            self.close_pdf(pdf_file)
-            raise Exception(f"An error occurred while reading the PDF file: {e}")
+        return self._cached(
+            file_path,
+            f"from:{page_number}",
+            lambda: list(
+                self.iter_pages(
+                    file_path, pages=lambda total: range(max(min(page_number, total - 1), 0), total)
+                )
+            ),
+        )
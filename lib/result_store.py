@@ -0,0 +1,285 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from lib.chunking import content_id
+
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "./cache/results.sqlite")
+
+SIMHASH_BITS = 64
+# The 64-bit fingerprint is split into 8 bands of 8 bits: two fingerprints within
+# 7 bits of each other share at least one band exactly, so bands serve as an index.
+SIMHASH_BANDS = 8
+BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+
+WORD = re.compile(r"\w+")
+
+# Shorter texts, e.g. of image-only PDFs, carry too little content for their hash to
+# identify a document: they are neither looked up nor stored
+MIN_TEXT_WORDS = 20
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    """
+    Split text into overlapping word n-grams.
+
+    Args:
+        text (str): Normalized document text
+        size (int): Number of words per shingle
+
+    Returns:
+        List[str]: Lowercased shingles, or the single words of texts shorter than `size`
+    """
+    words = WORD.findall(text.lower())
+    if len(words) < size:
+        return words
+    return [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str, size: int = 3) -> int:
+    """
+    Compute the 64-bit SimHash of a text over its word shingles. Texts differing in a
+    few words get fingerprints differing in a few bits.
+
+    Args:
+        text (str): Normalized document text
+        size (int): Number of words per shingle
+
+    Returns:
+        int: Unsigned 64-bit fingerprint
+    """
+    features = shingles(text, size)
+    if not features:
+        return 0
+
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+            for feature in features
+        ],
+        dtype=np.uint64,
+    )
+    # One row per shingle, one column per bit: +1 where the bit is set, -1 otherwise
+    bits = (hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64)) & np.uint64(1)
+    weights = bits.astype(np.int64).sum(axis=0) * 2 - len(features)
+
+    fingerprint = 0
+    for bit in np.flatnonzero(weights > 0):
+        fingerprint |= 1 << int(bit)
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class ResultStore:
+    """
+    Persistent SQLite store of classification results.
+
+    Results are keyed by the hash of the normalized document text, so the same content
+    extracted from another file or path is an exact match. Every entry also records the
+    SimHash of that text, indexed by bands, to find lightly edited versions of
+    documents already classified. Entries belong to the fingerprint of the hierarchy
+    and models that produced them: after either changes, earlier results no longer match.
+    """
+
+    def __init__(self, path: str = RESULT_STORE_PATH, fingerprint: str = ""):
+        """
+        Args:
+            path (str): Location of the SQLite database
+            fingerprint (str): Identifies the hierarchy and models results depend on
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    simhash INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    source TEXT,
+                    created REAL NOT NULL,
+                    fingerprint TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (key, mode)
+                );
+                CREATE TABLE IF NOT EXISTS bands (
+                    band INTEGER NOT NULL,
+                    value INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (band, value, key)
+                );
+                """
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(results)")}
+            if "fingerprint" not in columns:
+                # Results stored before entries were fingerprinted never match again
+                connection.execute("ALTER TABLE results ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def key(self, text: str) -> str:
+        return content_id(self.fingerprint, text, length=32)
+
+    @staticmethod
+    def cacheable(text: str) -> bool:
+        return len(WORD.findall(text)) >= MIN_TEXT_WORDS
+
+    @staticmethod
+    def _bands(fingerprint: int) -> List[tuple]:
+        mask = (1 << BAND_BITS) - 1
+        return [
+            (band, (fingerprint >> (band * BAND_BITS)) & mask)
+            for band in range(SIMHASH_BANDS)
+        ]
+
+    def lookup(self, text: str, mode: str, max_distance: int = 3) -> Optional[Dict]:
+        """
+        Find a stored result for the same or a near-identical text.
+
+        Near matches are only guaranteed to be found up to 7 differing bits (one less
+        than the number of bands); larger distances are found when a band still matches.
+
+        Args:
+            text (str): Normalized document text
+            mode (str): Pipeline mode the result must come from
+            max_distance (int): Maximum Hamming distance between SimHash fingerprints
+
+        Returns:
+            Optional[Dict]: "match" ("exact" or "near"), "key", "distance", "result" and
+            "source" of the closest stored result, None when nothing is close enough or
+            the text is too short to be looked up
+        """
+        if not self.cacheable(text):
+            return None
+
+        key = self.key(text)
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT result, source FROM results WHERE key = ? AND mode = ?", (key, mode)
+            ).fetchone()
+            if row is not None:
+                return {"match": "exact", "key": key, "distance": 0, "result": row[0], "source": row[1]}
+
+            fingerprint = simhash(text)
+            candidates = set()
+            for band, value in self._bands(fingerprint):
+                candidates.update(
+                    candidate
+                    for (candidate,) in connection.execute(
+                        "SELECT key FROM bands WHERE band = ? AND value = ?", (band, value)
+                    )
+                )
+
+            best = None
+            for candidate in candidates:
+                row = connection.execute(
+                    "SELECT simhash, result, source FROM results "
+                    "WHERE key = ? AND mode = ? AND fingerprint = ?",
+                    (candidate, mode, self.fingerprint),
+                ).fetchone()
+                if row is None:
+                    continue
+                distance = hamming_distance(fingerprint, _unsigned(row[0]))
+                if distance <= max_distance and (best is None or distance < best["distance"]):
+                    best = {
+                        "match": "near",
+                        "key": candidate,
+                        "distance": distance,
+                        "result": row[1],
+                        "source": row[2],
+                    }
+            return best
+
+    def store(self, text: str, mode: str, result: str, source: Optional[str] = None) -> str:
+        """
+        Record the classification result of a document. Texts too short to be looked
+        up are not stored.
+
+        Args:
+            text (str): Normalized document text
+            mode (str): Pipeline mode that produced the result
+            result (str): Classification result
+            source (Optional[str]): Where the document came from, e.g. its file path
+
+        Returns:
+            str: Key of the document, whether it was stored or not
+        """
+        key = self.key(text)
+        if not self.cacheable(text):
+            return key
+
+        self.insert(key, mode, simhash(text), result, source)
+        return key
+
+    def insert(
+        self, key: str, mode: str, fingerprint: int, result: str, source: Optional[str] = None
+    ):
+        """
+        Record a result under a key and SimHash computed earlier, e.g. a reviewer's
+        correction of a result that was never stored.
+
+        Args:
+            key (str): Key of the document
+            mode (str): Pipeline mode of the result
+            fingerprint (int): SimHash of the normalized document text
+            result (str): Classification result
+            source (Optional[str]): Where the document came from, e.g. its file path
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results "
+                "(key, mode, simhash, result, source, created, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, mode, _signed(fingerprint), result, source, time.time(), self.fingerprint),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO bands VALUES (?, ?, ?)",
+                [(band, value, key) for band, value in self._bands(fingerprint)],
+            )
+
+    def update(self, key: str, mode: str, result: str) -> bool:
+        """
+        Replace the result of a stored document, e.g. with a reviewer's correction.
+
+        Args:
+            key (str): Key of the stored entry
+            mode (str): Pipeline mode of the entry
+            result (str): New classification result
+
+        Returns:
+            bool: Whether the entry existed
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE results SET result = ?, created = ? WHERE key = ? AND mode = ?",
+                (result, time.time(), key, mode),
+            )
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as connection:
+            entries, documents = connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT key) FROM results"
+            ).fetchone()
+        return {"entries": entries, "documents": documents}
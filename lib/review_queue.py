@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from lib.metrics import metrics
+
+REVIEW_QUEUE_PATH = os.getenv("REVIEW_QUEUE_PATH", "./cache/review_queue.sqlite")
+
+# Claims of a review before it is marked failed and left to a person
+MAX_ATTEMPTS = 3
+
+
+class ReviewQueue:
+    """
+    Persistent SQLite queue of flagged classifications awaiting review.
+
+    Reviewers, human or agent, claim one review at a time under a lease; a review whose
+    lease expired, e.g. because its reviewer crashed, can be claimed again. Reviews
+    already attempted are claimed after fresh ones, and a review claimed
+    `max_attempts` times without success, released or left to expire, is marked failed
+    instead of being retried forever. Several processes can share the queue.
+    """
+
+    def __init__(self, path: str = REVIEW_QUEUE_PATH, max_attempts: int = MAX_ATTEMPTS):
+        """
+        Args:
+            path (str): Location of the SQLite database
+            max_attempts (int): Claims of a review before it is marked failed
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS reviews (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    source TEXT,
+                    result TEXT NOT NULL,
+                    flags TEXT NOT NULL,
+                    hierarchy TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    created REAL NOT NULL,
+                    claimed_by TEXT,
+                    lease_until REAL,
+                    correction TEXT,
+                    reviewed_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    simhash TEXT,
+                    UNIQUE (key, mode)
+                );
+                CREATE INDEX IF NOT EXISTS reviews_status ON reviews (status, created);
+                """
+            )
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(reviews)")}
+            if "attempts" not in columns:
+                # Queues created before reviews were retried a bounded number of times
+                connection.execute("ALTER TABLE reviews ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+                connection.execute("ALTER TABLE reviews ADD COLUMN error TEXT")
+            if "simhash" not in columns:
+                # Queues created before unstored results kept what storing them needs
+                connection.execute("ALTER TABLE reviews ADD COLUMN simhash TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def enqueue(
+        self,
+        key: str,
+        mode: str,
+        result: str,
+        flags: List[str],
+        hierarchy: str,
+        source: Optional[str] = None,
+        fingerprint: Optional[int] = None,
+    ) -> int:
+        """
+        Queue a flagged classification. A document already queued in the same mode is
+        replaced by its latest result, unless it was already reviewed; a failed review
+        gets a new chance with the new result.
+
+        Args:
+            key (str): Result store key of the document
+            mode (str): Pipeline mode that produced the result
+            result (str): Classification result to review
+            flags (List[str]): Reasons the result was flagged
+            hierarchy (str): Candidate categories, one "code: path" per line
+            source (Optional[str]): Where the document came from
+            fingerprint (Optional[int]): SimHash of the document text, to store the
+                reviewed result of a document whose result was not stored; None when
+                the text is too short to be stored
+
+        Returns:
+            int: Id of the review
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                """
+                INSERT INTO reviews (key, mode, source, result, flags, hierarchy, created, simhash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key, mode) DO UPDATE SET
+                    source = excluded.source,
+                    simhash = excluded.simhash,
+                    result = excluded.result,
+                    flags = excluded.flags,
+                    hierarchy = excluded.hierarchy,
+                    status = CASE status WHEN 'failed' THEN 'pending' ELSE status END,
+                    attempts = CASE status WHEN 'failed' THEN 0 ELSE attempts END
+                WHERE status != 'done'
+                RETURNING id
+                """,
+                (
+                    key,
+                    mode,
+                    source,
+                    result,
+                    json.dumps(flags),
+                    hierarchy,
+                    time.time(),
+                    # In hex, as the unsigned 64-bit SimHash overflows SQLite integers
+                    format(fingerprint, "016x") if fingerprint is not None else None,
+                ),
+            ).fetchone()
+            if row is None:
+                row = connection.execute(
+                    "SELECT id FROM reviews WHERE key = ? AND mode = ?", (key, mode)
+                ).fetchone()
+        metrics.inc("review_queue_enqueued_total", mode=mode)
+        return row["id"]
+
+    def claim(self, reviewer: str, lease: float = 600) -> Optional[Dict]:
+        """
+        Take the oldest pending review, or one whose lease expired, preferring the
+        least attempted ones.
+
+        Args:
+            reviewer (str): Name of the reviewer
+            lease (float): Seconds the reviewer has to complete the review
+
+        Returns:
+            Optional[Dict]: The review, None when the queue is empty
+        """
+        now = time.time()
+        with self._connect() as connection:
+            self._fail_expired(connection, now)
+            row = connection.execute(
+                """
+                UPDATE reviews
+                SET status = 'claimed', claimed_by = ?, lease_until = ?, attempts = attempts + 1
+                WHERE id = (
+                    SELECT id FROM reviews
+                    WHERE (status = 'pending' OR (status = 'claimed' AND lease_until < ?))
+                        AND attempts < ?
+                    ORDER BY attempts, created LIMIT 1
+                )
+                RETURNING *
+                """,
+                (reviewer, now + lease, now, self.max_attempts),
+            ).fetchone()
+        return self._review(row) if row is not None else None
+
+    def _fail_expired(self, connection: sqlite3.Connection, now: float):
+        # A reviewer that dies on the last attempt never releases its review
+        rows = connection.execute(
+            """
+            UPDATE reviews
+            SET status = 'failed', claimed_by = NULL, lease_until = NULL,
+                error = COALESCE(error, 'Lease expired')
+            WHERE status = 'claimed' AND lease_until < ? AND attempts >= ?
+            RETURNING mode
+            """,
+            (now, self.max_attempts),
+        ).fetchall()
+        for row in rows:
+            metrics.inc("review_queue_failed_total", mode=row["mode"])
+
+    def complete(self, review_id: int, correction: str) -> Dict:
+        """
+        Record the reviewed result.
+
+        Args:
+            review_id (int): Id of the review
+            correction (str): Validated or corrected classification result
+
+        Returns:
+            Dict: The completed review
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                """
+                UPDATE reviews SET status = 'done', correction = ?, reviewed_at = ?
+                WHERE id = ? RETURNING *
+                """,
+                (correction, time.time(), review_id),
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"No review {review_id}")
+        metrics.inc("review_queue_completed_total", mode=row["mode"])
+        return self._review(row)
+
+    def release(self, review_id: int, error: Optional[str] = None):
+        """
+        Give up a claimed review, e.g. after the reviewer failed. It goes back to the
+        queue behind the reviews attempted fewer times, or is marked failed once it
+        was attempted `max_attempts` times.
+
+        Args:
+            review_id (int): Id of the review
+            error (Optional[str]): Why the review failed
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                """
+                UPDATE reviews
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    claimed_by = NULL, lease_until = NULL, error = ?
+                WHERE id = ? AND status = 'claimed'
+                RETURNING status, mode
+                """,
+                (self.max_attempts, error, review_id),
+            ).fetchone()
+        if row is not None and row["status"] == "failed":
+            metrics.inc("review_queue_failed_total", mode=row["mode"])
+
+    def get(self, review_id: int) -> Optional[Dict]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM reviews WHERE id = ?", (review_id,)).fetchone()
+        return self._review(row) if row is not None else None
+
+    def pending(self, limit: int = 100) -> List[Dict]:
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT * FROM reviews WHERE status != 'done' ORDER BY created LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._review(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as connection:
+            self._fail_expired(connection, time.time())
+            counts = dict(connection.execute("SELECT status, COUNT(*) FROM reviews GROUP BY status"))
+        return {status: counts.get(status, 0) for status in ("pending", "claimed", "done", "failed")}
+
+    @staticmethod
+    def _review(row: sqlite3.Row) -> Dict:
+        review = dict(row)
+        review["flags"] = json.loads(review["flags"])
+        if review["simhash"] is not None:
+            review["simhash"] = int(review["simhash"], 16)
+        return review
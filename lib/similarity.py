@@ -0,0 +1,168 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Rows of a float16/int8 matrix converted to float32 at a time while scoring
+SCORE_BLOCK_ROWS = 8192
+
+
+class SimilarityEngine:
+    """
+    Exact cosine top-k scoring of document vectors against every category at once.
+
+    All category embeddings are held as one contiguous, L2-normalized float32 matrix,
+    so scoring a batch of documents is a single matrix multiplication. Engines loaded
+    from an EmbeddingStore keep its memory-mapped float16 or int8 rows instead.
+    """
+
+    def __init__(
+        self,
+        codes: Sequence[str],
+        labels: Sequence[str],
+        embeddings: Sequence[Sequence[float]],
+    ):
+        """
+        Args:
+            codes (Sequence[str]): Category codes, one per embedding row
+            labels (Sequence[str]): Human readable category paths, one per embedding row
+            embeddings (Sequence[Sequence[float]]): Category embeddings
+        """
+        if len(codes) != len(labels) or len(codes) != len(embeddings):
+            raise ValueError("codes, labels and embeddings must have the same length")
+
+        self.codes = list(codes)
+        self.labels = list(labels)
+        self.index = {code: row for row, code in enumerate(self.codes)}
+        self.matrix = normalize(np.asarray(embeddings, dtype=np.float32))
+        # Per-row scales of an int8 matrix, see from_store
+        self.scales = None
+
+    @classmethod
+    def from_collection(cls, collection) -> "SimilarityEngine":
+        """
+        Load every embedding stored in a ChromaDB collection.
+
+        Args:
+            collection (chromadb.Collection): Collection such as the category index
+
+        Returns:
+            SimilarityEngine: Engine holding the collection's embeddings
+        """
+        data = collection.get(include=["embeddings", "documents"])
+        return cls(data["ids"], data["documents"], data["embeddings"])
+
+    @classmethod
+    def from_store(cls, store, labels: Dict[str, str]) -> "SimilarityEngine":
+        """
+        Score directly against the memory-mapped rows of an EmbeddingStore, without copying them.
+
+        Float16 and int8 rows are converted to float32 block by block while scoring, so
+        the full matrix is never materialized in float32.
+
+        Args:
+            store (EmbeddingStore): Store of unit-length category embeddings
+            labels (Dict[str, str]): Category codes mapped to their paths
+
+        Returns:
+            SimilarityEngine: Engine sharing the store's pages
+        """
+        engine = cls.__new__(cls)
+        engine.codes = list(store.ids)
+        engine.labels = [labels.get(code, "") for code in engine.codes]
+        engine.index = dict(store.index)
+        engine.matrix = store.vectors
+        engine.scales = store.scales
+        return engine
+
+    def _rows(self, rows) -> np.ndarray:
+        block = np.asarray(self.matrix[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+        return block
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def scores(self, vectors) -> np.ndarray:
+        """
+        Compute cosine similarities between documents and every category.
+
+        Args:
+            vectors: One document vector or a (n_documents, dim) array of them
+
+        Returns:
+            np.ndarray: (n_documents, n_categories) similarity matrix
+        """
+        queries = normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if self.matrix.dtype == np.float32 and self.scales is None:
+            return queries @ self.matrix.T
+
+        scores = np.empty((queries.shape[0], len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_BLOCK_ROWS):
+            stop = start + SCORE_BLOCK_ROWS
+            scores[:, start:stop] = queries @ self._rows(slice(start, stop)).T
+        return scores
+
+    def subset_scores(self, vector, codes: Sequence[str]) -> np.ndarray:
+        """
+        Compute cosine similarities between one document and a subset of categories.
+
+        Args:
+            vector: Document vector
+            codes (Sequence[str]): Category codes to score
+
+        Returns:
+            np.ndarray: One similarity per code, in the order given
+        """
+        query = normalize(np.atleast_2d(np.asarray(vector, dtype=np.float32)))[0]
+        rows = [self.index[code] for code in codes]
+        return self._rows(rows) @ query
+
+    def top_k(self, vectors, k: int = 5) -> List[List[Dict]]:
+        """
+        Return the k best categories for each document, highest score first.
+
+        Args:
+            vectors: One document vector or a (n_documents, dim) array of them
+            k (int): Number of categories to return per document
+
+        Returns:
+            List[List[Dict]]: Per document, a ranked list of {"code", "label", "score"}
+        """
+        scores = self.scores(vectors)
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(scores.shape[0])]
+
+        # argpartition finds the k best in linear time, then only those k are sorted
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        ranked = np.take_along_axis(candidates, order, axis=1)
+
+        return [
+            [
+                {
+                    "code": self.codes[index],
+                    "label": self.labels[index],
+                    "score": round(float(scores[row, index]), 4),
+                }
+                for index in ranked[row]
+            ]
+            for row in range(scores.shape[0])
+        ]
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize the rows of a matrix, leaving all-zero rows untouched.
+
+    Args:
+        matrix (np.ndarray): 2D array of vectors
+
+    Returns:
+        np.ndarray: C-contiguous float32 array of unit-length rows
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
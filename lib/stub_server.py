@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the Ollama embedding API and an OpenAI-compatible chat API.
+
+Embeddings are deterministic hashed bag-of-words vectors, so identical texts get
+identical vectors and texts sharing words are close in cosine similarity. Chat
+completions answer in the crew's expected format with the first five category
+codes found in the prompt.
+
+    python -m lib.stub_server --port 11435 --latency 0.05 --chat-latency 0.5
+
+The first `--failures` embedding requests are answered with 503, to exercise retries.
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from lib.output_parsing import CATEGORY_CODE
+
+
+def stub_embedding(text: str, dimensions: int = 256) -> List[float]:
+    """
+    Hash the words of a text into a unit-length vector.
+
+    Args:
+        text (str): Text to embed
+        dimensions (int): Size of the vector
+
+    Returns:
+        List[float]: Embedding of the text
+    """
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+# Distinct codes of the bundled hierarchy, used when the prompt mentions fewer than five
+FALLBACK_CODES = [f"00.00.00.0{i}" for i in range(5)]
+
+
+def stub_completion(messages: List[Dict[str, str]]) -> str:
+    """
+    Build a final answer classifying the prompt into the first five category codes it mentions.
+
+    Args:
+        messages (List[Dict[str, str]]): Chat messages of the request
+
+    Returns:
+        str: Answer in the "Final Answer:" format the crew agents parse
+    """
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    codes = list(dict.fromkeys(CATEGORY_CODE.findall(prompt)))[:5]
+    codes += [code for code in FALLBACK_CODES if code not in codes][: 5 - len(codes)]
+
+    answer = {
+        "validated_classifications": [
+            {
+                "label": code,
+                "confidence_score": round(0.9 - 0.05 * rank, 2),
+                "Reasoning": "Stub reasoning",
+            }
+            for rank, code in enumerate(codes)
+        ],
+        "improvement_feedback": "None",
+    }
+    return f"Thought: I now know the final answer\nFinal Answer: {json.dumps(answer)}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    chat_latency = 0.0
+    dimensions = 256
+    failures = 0
+    requests = 0
+    # Requests are handled in concurrent threads; guards the counters above
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        handler = type(self)
+        with handler.lock:
+            handler.requests += 1
+            request_id = handler.requests
+            fail = self.path in ("/api/embed", "/v1/embeddings") and handler.failures > 0
+            if fail:
+                handler.failures -= 1
+
+        if fail:
+            self._reply(503, {"error": "Stub failure"})
+        elif self.path == "/api/embed":
+            time.sleep(self.latency)
+            self._reply(
+                200,
+                {
+                    "model": body.get("model"),
+                    "embeddings": [
+                        stub_embedding(text, self.dimensions)
+                        for text in self._texts(body)
+                    ],
+                },
+            )
+        elif self.path == "/v1/embeddings":
+            time.sleep(self.latency)
+            self._reply(
+                200,
+                {
+                    "object": "list",
+                    "model": body.get("model"),
+                    "data": [
+                        {
+                            "object": "embedding",
+                            "index": index,
+                            "embedding": stub_embedding(text, self.dimensions),
+                        }
+                        for index, text in enumerate(self._texts(body))
+                    ],
+                },
+            )
+        elif self.path == "/v1/chat/completions":
+            time.sleep(self.chat_latency)
+            messages = body.get("messages", [])
+            content = stub_completion(messages)
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+            self._reply(
+                200,
+                {
+                    "id": f"stub-{request_id}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(content.split()),
+                        "total_tokens": prompt_tokens + len(content.split()),
+                    },
+                },
+            )
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def _texts(self, body: dict) -> List[str]:
+        texts = body.get("input", [])
+        return [texts] if isinstance(texts, str) else texts
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        try:
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and went away
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.0,
+    dimensions: int = 256,
+    chat_latency: float = 0.0,
+    failures: int = 0,
+) -> ThreadingHTTPServer:
+    """
+    Start the stub server in a background thread.
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port to listen on, 0 picks a free one
+        latency (float): Seconds added to every embedding request
+        dimensions (int): Size of the returned embeddings
+        chat_latency (float): Seconds added to every chat completion
+        failures (int): Embedding requests answered with 503 before the server recovers
+
+    Returns:
+        ThreadingHTTPServer: Running server; its URL is http://host:server.server_port
+    """
+    handler = type(
+        "ConfiguredStubHandler",
+        (StubHandler,),
+        {
+            "latency": latency,
+            "dimensions": dimensions,
+            "chat_latency": chat_latency,
+            "failures": failures,
+            "lock": threading.Lock(),
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--chat-latency", type=float, default=0.0)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--failures", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_stub_server(
+        args.host, args.port, args.latency, args.dimensions, args.chat_latency, args.failures
+    )
+    print(f"Stub server listening on http://{args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Callable, Dict, List
+
+from lib.metrics import metrics
+
+TEXT_CACHE_PATH = "./cache/text_cache.sqlite"
+
+
+def file_digest(file_path: str) -> str:
+    """
+    Hash the content of a file.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: SHA-256 hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """
+    Persistent SQLite cache of extracted page texts.
+
+    Entries are keyed by the file's content digest, the requested page range and the
+    extractor version, so renamed or copied files still hit and a new extractor never
+    serves stale text. When the stored text exceeds `max_bytes`, the least recently
+    used entries are evicted. Hit and miss counters are kept both for this instance and
+    across every process sharing the database.
+    """
+
+    def __init__(self, path: str = TEXT_CACHE_PATH, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            path (str): Location of the SQLite database
+            max_bytes (int): Maximum total size of cached text before eviction
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access);
+                CREATE TABLE IF NOT EXISTS digests (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    digest TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def digest(self, file_path: str) -> str:
+        """
+        Return the content digest of a file, re-hashing only when its size or mtime changed.
+
+        Args:
+            file_path (str): Path to the file
+
+        Returns:
+            str: SHA-256 hex digest of the file content
+        """
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT mtime_ns, size, digest FROM digests WHERE path = ?", (path,)
+            ).fetchone()
+            if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+                return row[2]
+
+            digest = file_digest(path)
+            connection.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size, digest),
+            )
+            return digest
+
+    def get_or_extract(
+        self,
+        file_path: str,
+        page_spec: str,
+        extractor_version: str,
+        extract: Callable[[], List[str]],
+    ) -> List[str]:
+        """
+        Return the cached pages for a file and page range, extracting and storing them on a miss.
+
+        Args:
+            file_path (str): Path to the PDF file
+            page_spec (str): Description of the requested pages, e.g. "0:10:1"
+            extractor_version (str): Version of the extraction code and library
+            extract (Callable[[], List[str]]): Performs the extraction on a miss
+
+        Returns:
+            List[str]: Text of each requested page
+        """
+        key = f"{self.digest(file_path)}:{page_spec}:{extractor_version}"
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT content FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+                self._count(connection, "hits")
+                self.hits += 1
+                metrics.inc("cache_requests_total", cache="text", result="hit")
+                return json.loads(row[0])
+
+        metrics.inc("cache_requests_total", cache="text", result="miss")
+        pages = extract()
+        content = json.dumps(pages, ensure_ascii=False)
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                (key, content, len(content), time.time()),
+            )
+            self._count(connection, "misses")
+            self.misses += 1
+            self._evict(connection)
+
+        return pages
+
+    def _count(self, connection: sqlite3.Connection, name: str, amount: int = 1):
+        connection.execute(
+            "INSERT INTO stats VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, amount, amount),
+        )
+
+    def _evict(self, connection: sqlite3.Connection):
+        """
+        Delete the least recently used entries until the cache fits in max_bytes.
+        """
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        freed = 0
+        expired = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM pages ORDER BY last_access"
+        ):
+            if total - freed <= self.max_bytes:
+                break
+            expired.append((key,))
+            freed += size
+
+        connection.executemany("DELETE FROM pages WHERE key = ?", expired)
+        self._count(connection, "evictions", len(expired))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Report cache hits and misses.
+
+        Returns:
+            Dict[str, Dict[str, int]]: "session" counts for this instance and "total"
+            counts across every process using the database, plus entry count and size.
+        """
+        with self._connect() as connection:
+            total = dict(connection.execute("SELECT name, value FROM stats"))
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()
+
+        return {
+            "session": {"hits": self.hits, "misses": self.misses},
+            "total": {
+                "hits": total.get("hits", 0),
+                "misses": total.get("misses", 0),
+                "evictions": total.get("evictions", 0),
+                "entries": entries,
+                "bytes": size,
+            },
+        }
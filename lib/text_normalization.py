@@ -0,0 +1,93 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+from lib.chunking import content_id
+
+# Characters that survive extraction but carry no meaning for classification
+CONTROL_CHARACTERS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b-\u200f\ufeff]")
+PAGE_NUMBER_LINE = re.compile(r"^\s*(page\s*)?\d+(\s*(/|of)\s*\d+)?\s*$", re.IGNORECASE)
+
+
+def normalize_page(text: str) -> List[str]:
+    """
+    Normalize the encoding and whitespace of one page and split it into lines.
+
+    Args:
+        text (str): Raw page text (None is treated as empty)
+
+    Returns:
+        List[str]: Non-empty, whitespace-collapsed lines
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    text = CONTROL_CHARACTERS.sub("", text)
+    # Join words hyphenated across line breaks
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+
+    lines = []
+    for line in text.splitlines():
+        line = re.sub(r"\s+", " ", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+
+def clean_pages(pages: List[str], repeat_ratio: float = 0.5) -> List[str]:
+    """
+    Normalize pages and remove noise lines: page numbers, and headers or footers
+    repeated on at least `repeat_ratio` of the pages.
+
+    Args:
+        pages (List[str]): Raw page texts
+        repeat_ratio (float): Fraction of pages a line must appear on to count as boilerplate
+
+    Returns:
+        List[str]: Cleaned text of each page
+    """
+    page_lines = [normalize_page(page) for page in pages]
+
+    boilerplate = set()
+    if len(page_lines) >= 3:
+        counts = Counter(line for lines in page_lines for line in set(lines))
+        boilerplate = {
+            line
+            for line, count in counts.items()
+            if count >= max(2, repeat_ratio * len(page_lines))
+        }
+
+    return [
+        "\n".join(
+            line
+            for line in lines
+            if line not in boilerplate and not PAGE_NUMBER_LINE.match(line)
+        )
+        for lines in page_lines
+    ]
+
+
+def prepare_document(pages: List[str], source: Optional[str] = None) -> Dict:
+    """
+    Deterministic replacement for the LLM ingestion and preprocessing stages.
+
+    Args:
+        pages (List[str]): Raw page texts
+        source (Optional[str]): Where the document came from, e.g. its file path
+
+    Returns:
+        Dict: "document_id" (content hash), cleaned "text" and "metadata"
+    """
+    cleaned = clean_pages(pages)
+    text = "\n\n".join(page for page in cleaned if page)
+
+    return {
+        "document_id": content_id(text),
+        "text": text,
+        "metadata": {
+            "source": source,
+            "pages": len(pages),
+            "empty_pages": sum(1 for page in cleaned if not page),
+            "words": len(text.split()),
+            "characters": len(text),
+        },
+    }
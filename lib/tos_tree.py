@@ -0,0 +1,301 @@
+import hashlib
+import os
+import pickle
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+from lib.text_cache import file_digest
+
+TOS_CACHE_DIR = "./cache/tos"
+# Bump when TosNode or the compilation logic changes so cached artifacts are rebuilt
+TOS_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class TosNode:
+    code: str
+    name: str
+    path: str
+    parent: Optional[str]
+    children: Tuple[str, ...]
+    depth: int
+
+
+class TosTree:
+    """
+    Immutable, compiled TOS hierarchy.
+
+    Lookups by code are dictionary lookups; subtree and parent-chain queries only walk
+    the nodes involved, and names resolve to codes through a reverse index.
+    """
+
+    def __init__(self, nodes: Dict[str, TosNode]):
+        """
+        Args:
+            nodes (Dict[str, TosNode]): Every node of the hierarchy keyed by code, in document order
+        """
+        self.nodes = MappingProxyType(dict(nodes))
+        self.roots = tuple(code for code, node in nodes.items() if node.parent is None)
+
+        by_name: Dict[str, List[str]] = {}
+        for code, node in nodes.items():
+            by_name.setdefault(node.name.casefold(), []).append(code)
+        self._by_name = MappingProxyType(
+            {name: tuple(codes) for name, codes in by_name.items()}
+        )
+
+    def __reduce__(self):
+        return (TosTree, (dict(self.nodes),))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.nodes
+
+    def __getitem__(self, code: str) -> TosNode:
+        return self.nodes[code]
+
+    def get(self, code: str) -> Optional[TosNode]:
+        return self.nodes.get(code)
+
+    def is_leaf(self, code: str) -> bool:
+        return not self.nodes[code].children
+
+    def leaves(self) -> Dict[str, str]:
+        """
+        Returns:
+            Dict[str, str]: Leaf codes mapped to their full paths, as get_categories returns them
+        """
+        return {code: node.path for code, node in self.nodes.items() if not node.children}
+
+    def parents(self, code: str) -> List[str]:
+        """
+        Return the ancestors of a node, from the top-level group down to its parent.
+
+        Args:
+            code (str): Category code
+
+        Returns:
+            List[str]: Codes of the ancestors
+        """
+        chain = []
+        parent = self.nodes[code].parent
+        while parent is not None:
+            chain.append(parent)
+            parent = self.nodes[parent].parent
+        return chain[::-1]
+
+    def subtree(self, code: str) -> List[str]:
+        """
+        Return a node and all its descendants in document order.
+
+        Args:
+            code (str): Category code, e.g. "00.01"
+
+        Returns:
+            List[str]: Codes of the subtree, starting with code itself
+        """
+        result = []
+        stack = [code]
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(reversed(self.nodes[current].children))
+        return result
+
+    def leaves_under(self, code: str) -> Dict[str, str]:
+        """
+        Return the leaves of a subtree.
+
+        Args:
+            code (str): Category code, e.g. "00.01"
+
+        Returns:
+            Dict[str, str]: Leaf codes under code mapped to their full paths
+        """
+        return {
+            current: self.nodes[current].path
+            for current in self.subtree(code)
+            if not self.nodes[current].children
+        }
+
+    def codes_for_name(self, name: str) -> Tuple[str, ...]:
+        """
+        Find the codes of the nodes with a given name. Names are not unique in the TOS
+        (e.g. "Municipal elections"), so every match is returned.
+
+        Args:
+            name (str): Node name, compared case-insensitively
+
+        Returns:
+            Tuple[str, ...]: Matching codes in document order
+        """
+        return self._by_name.get(name.casefold(), ())
+
+    def as_category_tree(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            Dict[str, Dict]: The hierarchy in the format of lib.parse_xml.get_category_tree
+        """
+        return {
+            code: {
+                "name": node.name,
+                "path": node.path,
+                "parent": node.parent,
+                "children": list(node.children),
+            }
+            for code, node in self.nodes.items()
+        }
+
+
+def compile_tree(xml_file_path: str) -> TosTree:
+    """
+    Build the hierarchy with a streaming parse, releasing each itemgroup once it is read.
+
+    Args:
+        xml_file_path (str): Path to the XML file
+
+    Returns:
+        TosTree: Compiled hierarchy
+    """
+    frames: List[Dict] = []
+    groups: Dict[str, Dict] = {}
+    roots: List[str] = []
+
+    for event, element in ET.iterparse(xml_file_path, events=("start", "end")):
+        if event == "start":
+            if element.tag == "itemgroup":
+                # Groups without a name still add an empty level to the path
+                parent_path = frames[-1]["path"] if frames else ""
+                frames.append(
+                    {
+                        "code": "",
+                        "name": "",
+                        "path": _join_path(parent_path, ""),
+                        "children": [],
+                    }
+                )
+            continue
+
+        if not frames:
+            continue
+        frame = frames[-1]
+
+        if element.tag == "iigroup":
+            frame["code"] = element.text or ""
+        elif element.tag == "iigroupname":
+            frame["name"] = element.text or ""
+            parent_path = frames[-2]["path"] if len(frames) > 1 else ""
+            frame["path"] = _join_path(parent_path, frame["name"])
+        elif element.tag == "itemgroup":
+            frames.pop()
+            element.clear()
+            if not frame["code"]:
+                continue
+
+            groups[frame["code"]] = frame
+            # Groups without a code hand their children to the closest coded ancestor
+            parent = next((f for f in reversed(frames) if f["code"]), None)
+            if parent is None:
+                roots.append(frame["code"])
+            else:
+                parent["children"].append(frame["code"])
+                frame["parent"] = parent["code"]
+
+    # Groups end after their children, so rebuild document order from the roots down
+    nodes: Dict[str, TosNode] = {}
+    stack = [(code, 0) for code in reversed(roots)]
+    while stack:
+        code, depth = stack.pop()
+        group = groups[code]
+        nodes[code] = TosNode(
+            code=code,
+            name=group["name"],
+            path=group["path"],
+            parent=group.get("parent"),
+            children=tuple(group["children"]),
+            depth=depth,
+        )
+        stack.extend((child, depth + 1) for child in reversed(group["children"]))
+
+    return TosTree(nodes)
+
+
+def _join_path(parent_path: str, name: str) -> str:
+    return f"{parent_path} > {name}" if parent_path else name
+
+
+# Trees already loaded by this process, keyed by absolute path
+_loaded: Dict[str, Tuple[int, int, TosTree]] = {}
+
+
+def load_tree(xml_file_path: str, cache_dir: str = TOS_CACHE_DIR) -> TosTree:
+    """
+    Return the compiled hierarchy of an XML file, compiling it only when the file changed.
+
+    The compiled tree is kept in memory for the process and pickled to cache_dir for
+    other processes. A changed mtime or size triggers a content hash check, so touching
+    the file without editing it does not force a rebuild.
+
+    Args:
+        xml_file_path (str): Path to the XML file
+        cache_dir (str): Directory of the compiled artifacts
+
+    Returns:
+        TosTree: Compiled hierarchy
+    """
+    path = os.path.abspath(xml_file_path)
+    stat = os.stat(path)
+
+    loaded = _loaded.get(path)
+    if loaded is not None and loaded[:2] == (stat.st_mtime_ns, stat.st_size):
+        return loaded[2]
+
+    artifact_path = os.path.join(
+        cache_dir, hashlib.sha256(path.encode("utf-8")).hexdigest()[:16] + ".pickle"
+    )
+    artifact = None
+    if os.path.exists(artifact_path):
+        try:
+            with open(artifact_path, "rb") as file:
+                artifact = pickle.load(file)
+        except Exception as e:
+            print(f"Ignoring unreadable hierarchy cache {artifact_path}: {e}")
+
+    if artifact is not None and artifact.get("version") == TOS_FORMAT_VERSION:
+        unchanged = (artifact["mtime_ns"], artifact["size"]) == (stat.st_mtime_ns, stat.st_size)
+        if not unchanged and artifact["digest"] == file_digest(path):
+            unchanged = True
+            artifact.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _write_artifact(artifact_path, artifact)
+        if unchanged:
+            _loaded[path] = (stat.st_mtime_ns, stat.st_size, artifact["tree"])
+            return artifact["tree"]
+
+    tree = compile_tree(path)
+    _write_artifact(
+        artifact_path,
+        {
+            "version": TOS_FORMAT_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": file_digest(path),
+            "tree": tree,
+        },
+    )
+    _loaded[path] = (stat.st_mtime_ns, stat.st_size, tree)
+    return tree
+
+
+def _write_artifact(artifact_path: str, artifact: Dict):
+    """
+    Write the artifact atomically so concurrent readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+    temporary = f"{artifact_path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump(artifact, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, artifact_path)
@@ -1,7 +1,153 @@
 #!/usr/bin/env python
+import argparse
+import json
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import lru_cache
+from typing import Dict, List, Optional
+
 from lib.pdf_reader import PdfReader
+from lib.text_cache import TextCache
 from lib.parse_xml import get_categories
-from crew import classifier_crew
+from lib.candidates import format_hierarchy, retrieve_candidates
+from lib.text_normalization import prepare_document
+from lib.page_selection import SAMPLE_PAGES, TOKEN_BUDGET, estimate_tokens, select_passages
+from lib.metrics import metrics, TaskTimer
+from lib.result_store import ResultStore, simhash
+from lib.review_queue import ReviewQueue
+from lib.output_parsing import CATEGORY_CODE, OutputValidator, describe_error, parse_result
+from lib.calibration import ConfidenceCalibrator
+from lib.agent_memory import get_memory_policy, scoped_memory
+from lib.category_index import hierarchy_fingerprint
+from lib.category_search import (
+    document_vectors,
+    get_neighbour_index,
+    get_similarity_engine,
+    rank_categories,
+    vectorizer_model,
+)
+from agents import llm_model_name
+from crew import get_crew, PIPELINE_MODES
+
+# Number of categories injected into the prompts instead of the full hierarchy
+CANDIDATE_COUNT = 25
+
+# Near-duplicate thresholds, in differing SimHash bits out of 64: closer documents reuse
+# the stored result, documents up to SEED_DISTANCE put its labels first among the candidates
+REUSE_DISTANCE = 3
+SEED_DISTANCE = 7
+
+# Classified documents consulted for label votes, and how many voted labels seed the candidates
+NEIGHBOUR_COUNT = 10
+NEIGHBOUR_SEEDS = 5
+
+
+@lru_cache(maxsize=None)
+def get_result_store() -> ResultStore:
+    # Stored results are only reused with the hierarchy and models that produced them
+    fingerprint = hierarchy_fingerprint(
+        get_categories("./TOS/english_tos.xml"), f"{vectorizer_model}|{llm_model_name()}"
+    )
+    return ResultStore(fingerprint=fingerprint)
+
+
+@lru_cache(maxsize=None)
+def get_review_queue() -> ReviewQueue:
+    return ReviewQueue()
+
+
+def prior_codes(result: str, classifications: Dict[str, str]) -> List[str]:
+    """
+    List the categories named in a stored result, by code or by full path.
+
+    Args:
+        result (str): Stored classification result
+        classifications (Dict[str, str]): Full parsed hierarchy
+
+    Returns:
+        List[str]: Codes of the hierarchy found in the result, in order of appearance
+    """
+    codes = [code for code in CATEGORY_CODE.findall(result) if code in classifications]
+    codes += [code for code, path in classifications.items() if path in result]
+    return list(dict.fromkeys(codes))
+
+
+def read_document(
+    pdf_reader: PdfReader, pdf_file_path: str, token_budget: int = TOKEN_BUDGET
+) -> List[str]:
+    """
+    Read the text sent to the crew: pages sampled across the whole document, reduced
+    to the most informative passages that fit the token budget.
+
+    Args:
+        pdf_reader (PdfReader): Reader used for extraction
+        pdf_file_path (str): Path to the pdf file
+        token_budget (int): Maximum estimated tokens of document text
+
+    Returns:
+        List[str]: Selected passages, in document order
+    """
+    pages = pdf_reader.sample_pages(pdf_file_path, SAMPLE_PAGES)
+    passages = select_passages(pages, token_budget)
+    metrics.observe("document_tokens_selected", sum(estimate_tokens(passage) for passage in passages))
+    return passages
+
+
+def build_inputs(
+    pdf_content: list,
+    classifications: Dict[str, str],
+    mode: str = "full",
+    seed_codes: List[str] = (),
+    vector=None,
+) -> Dict[str, str]:
+    """
+    Build the crew inputs, narrowing the hierarchy to the categories relevant to the document.
+
+    Args:
+        pdf_content (list): Extracted page texts
+        classifications (Dict[str, str]): Full parsed hierarchy
+        mode (str): Pipeline mode, "full" or "fast"
+        seed_codes (List[str]): Categories placed first among the candidates, e.g. the
+            labels of a near-duplicate document
+        vector: Embedding of the document, computed from the text when not given
+
+    Returns:
+        Dict[str, str]: Inputs for the crew's "raw_input" and "hierarchy" placeholders,
+        plus the locally prepared "document" in fast mode
+    """
+    if mode == "fast":
+        document = prepare_document(pdf_content)
+        text = document["text"]
+    else:
+        text = "\n".join(page or "" for page in pdf_content)
+
+    candidates = retrieve_candidates(
+        text,
+        classifications,
+        n=CANDIDATE_COUNT,
+        rank=lambda text, k: (
+            get_similarity_engine().top_k(vector, k=k)[0]
+            if vector is not None
+            else rank_categories([text], k=k)[0]
+        ),
+    )
+    if seed_codes:
+        seeded = {code: classifications[code] for code in seed_codes if code in classifications}
+        candidates = dict(list({**seeded, **candidates}.items())[:CANDIDATE_COUNT])
+
+    inputs = {
+        "raw_input": pdf_content,
+        "hierarchy": format_hierarchy(candidates),
+    }
+    if mode == "fast":
+        inputs["document"] = f"{document['metadata']}\n\n{text}"
+    return inputs
 
 
 def train(pdf_file_path):
@@ -14,53 +160,438 @@ def train(pdf_file_path):
     Returns:
         Saves the trained crew to a pkl file.
     """
-    pdf_reader = PdfReader()
-    pdf_content = pdf_reader.read_upto_page(pdf_file_path, 10)
+    pdf_reader = PdfReader(cache=TextCache())
+    pdf_content = read_document(pdf_reader, pdf_file_path)
 
     # Parse xml
     classifications = get_categories("./TOS/english_tos.xml")
 
     # Prepare inputs
-    inputs_dict = {
-        "raw_input": pdf_content,
-        "hierarchy": classifications,
-    }
+    inputs_dict = build_inputs(pdf_content, classifications)
 
     try:
-        # Train the crew
-        classifier_crew.train(
+        # Train the crew; iterations must query the model, not replay its cached answer
+        get_crew("full", llm_cache=False).train(
             n_iterations=10, filename="trained_crew.pkl", inputs=inputs_dict
         )
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
 
 
-def run(pdf_file_path):
+def run(pdf_file_path, mode="full", token_budget=TOKEN_BUDGET, reuse=True):
     """
     Run the crew on a given input.
+
+    Args:
+        pdf_file_path (str): Path to the pdf file.
+        mode (str): "full" runs all five LLM stages, "fast" replaces ingestion and
+            preprocessing with local text normalization.
+        token_budget (int): Maximum estimated tokens of document text sent to the crew.
+        reuse (bool): Answer from the result store when the document was classified
+            before; False always runs the crew, e.g. to time it.
     """
     # Read pdf content
-    pdf_reader = PdfReader()
-    pdf_content = pdf_reader.read_upto_page(pdf_file_path, 10)
+    pdf_reader = PdfReader(cache=TextCache())
+    pdf_content = read_document(pdf_reader, pdf_file_path, token_budget)
 
     # Parse xml
     classifications = get_categories("./TOS/english_tos.xml")
 
-    # Prepare inputs
-    inputs_dict = {
-        "raw_input": pdf_content,
-        "hierarchy": classifications,
-    }
-
-    # Run the crew
-    final_output = classifier_crew.kickoff(
-        inputs=inputs_dict,
+    # Run the crew, unless the document was already classified
+    final_output = classify_content(
+        pdf_content, classifications, mode, source=pdf_file_path, reuse=reuse
     )
 
+    metrics.write_prometheus()
     return final_output
 
 
+def kickoff(
+    crew,
+    inputs_dict: Dict,
+    mode: str = "full",
+    classifications: Optional[Dict[str, str]] = None,
+    vector=None,
+    scope: Optional[str] = None,
+):
+    """
+    Run a private copy of a crew, recording the time of each task and of the whole run.
+
+    Args:
+        crew (Crew): Crew to copy and run
+        inputs_dict (Dict): Crew inputs
+        mode (str): Pipeline mode, used as metrics label
+        classifications (Optional[Dict[str, str]]): Hierarchy the labels of classification
+            tasks must belong to. When given, each classification task's JSON is validated
+            as soon as the task ends and repaired by its own agent if needed.
+        vector: Embedding of the document. When given, the classification's confidence
+            scores are calibrated against it and review flags added.
+        scope (Optional[str]): Agent memory scope of the document, e.g. its result store
+            key, so a later run on the same document recalls this one until the scope
+            is released. The memory is private to the run when not given (see
+            lib.agent_memory).
+
+    Returns:
+        CrewOutput: Output of the crew
+    """
+    crew = crew.copy()
+    callbacks = []
+    if classifications:
+        callbacks.append(OutputValidator(crew.tasks, classifications))
+    if vector is not None:
+        callbacks.append(ConfidenceCalibrator(vector, get_similarity_engine()))
+    callbacks.append(TaskTimer())
+
+    def task_callback(task_output):
+        for callback in callbacks:
+            callback(task_output)
+
+    crew.task_callback = task_callback
+
+    with scoped_memory(crew, scope), metrics.timer("crew_kickoff_seconds", mode=mode):
+        return crew.kickoff(inputs=inputs_dict)
+
+
+def crew_result(crew_output, task_name: Optional[str] = None) -> str:
+    """
+    Text of a crew's result: the raw output of its last task, or of the named task.
+
+    Never use str(crew_output): once a task callback set the task's json_dict, it
+    renders the Python repr of the dict, which is not JSON.
+
+    Args:
+        crew_output (CrewOutput): Output of a kickoff
+        task_name (Optional[str]): Name of the task whose output to return
+
+    Returns:
+        str: Raw output of the task, as rewritten by the task callbacks
+    """
+    outputs = [
+        task_output
+        for task_output in crew_output.tasks_output
+        if task_name is None or task_output.name == task_name
+    ]
+    return outputs[-1].raw if outputs else crew_output.raw
+
+
+def load_batch(input_path: str) -> List[Dict]:
+    """
+    List the documents of a batch from a directory of PDFs or a JSONL manifest.
+
+    Manifest lines are JSON objects with a "path" key (relative paths are resolved
+    against the manifest's directory), an optional "id" key and, for training, an
+    optional "labels" list of the document's expected category codes.
+
+    Args:
+        input_path (str): Directory containing PDFs, or path to a .jsonl manifest
+
+    Returns:
+        List[Dict]: One {"id", "path"} entry per document, plus "labels" when given
+
+    Raises:
+        ValueError: A manifest line has no path, or two documents have the same id
+    """
+    if os.path.isdir(input_path):
+        documents = [
+            {"id": os.path.splitext(name)[0], "path": os.path.join(input_path, name)}
+            for name in sorted(os.listdir(input_path))
+            if name.lower().endswith(".pdf")
+        ]
+        return _unique_ids(documents)
+
+    documents = []
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    with open(input_path, "r") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "path" not in record:
+                raise ValueError(
+                    f"Manifest line {line_number} has no 'path': {line.strip()}"
+                )
+            path = os.path.join(base_dir, record["path"])
+            document = {
+                "id": str(record.get("id", os.path.splitext(os.path.basename(path))[0])),
+                "path": path,
+            }
+            if "labels" in record:
+                document["labels"] = [str(code) for code in record["labels"]]
+            documents.append(document)
+    return _unique_ids(documents)
+
+
+def _unique_ids(documents: List[Dict]) -> List[Dict]:
+    # Results, checkpoints and timings are keyed by id
+    paths = {}
+    for document in documents:
+        if document["id"] in paths:
+            raise ValueError(
+                f"Duplicate document id {document['id']!r}: {paths[document['id']]} and {document['path']}"
+            )
+        paths[document["id"]] = document["path"]
+    return documents
+
+
+def extract_pdf(pdf_file_path: str, token_budget: int = TOKEN_BUDGET) -> list:
+    """
+    Extract the text used for classification. Runs inside the batch process pool.
+
+    Args:
+        pdf_file_path (str): Path to the pdf file.
+        token_budget (int): Maximum estimated tokens of document text
+
+    Returns:
+        list: Selected passages of the PDF file
+    """
+    return read_document(PdfReader(cache=TextCache()), pdf_file_path, token_budget)
+
+
+def classify_content(
+    pdf_content: list,
+    classifications: Dict[str, str],
+    mode: str = "full",
+    source: Optional[str] = None,
+    reuse: bool = True,
+) -> str:
+    """
+    Classify already extracted content, answering from the result store when the same
+    or a near-identical document was classified before.
+
+    Exact and close matches (up to REUSE_DISTANCE) return the stored result. Otherwise a
+    private copy of the crew runs, so kickoffs can run concurrently, with the labels of
+    a looser match (up to SEED_DISTANCE) and those voted by the nearest classified
+    documents seeding the candidate categories. A valid new result is stored and joins
+    the archive of classified documents; it goes to the review queue when its confidence
+    was flagged, and so does an output still invalid after repair, which is only stored
+    once reviewed.
+
+    Args:
+        pdf_content (list): Extracted page texts
+        classifications (Dict[str, str]): Parsed hierarchy
+        mode (str): Pipeline mode, "full" or "fast"
+        source (Optional[str]): Where the document came from, e.g. its file path
+        reuse (bool): Look the document up in the result store; False always runs the
+            crew, without seeding it with a stored result
+
+    Returns:
+        str: Classification result
+    """
+    text = prepare_document(pdf_content)["text"]
+    store = get_result_store()
+    match = store.lookup(text, mode, max_distance=SEED_DISTANCE) if reuse else None
+
+    if match is not None and match["distance"] <= REUSE_DISTANCE:
+        # A near match's result is not stored again under this text: only results the
+        # crew produced for a document are stored, so reuse never drifts across edits
+        metrics.inc("result_store_requests_total", mode=mode, result=match["match"])
+        return match["result"]
+
+    metrics.inc("result_store_requests_total", mode=mode, result="seed" if match else "miss")
+    seed_codes = prior_codes(match["result"], classifications) if match else []
+    # Image-only or empty PDFs have no text to embed: the crew runs without calibration,
+    # votes or archiving, as it did before documents were embedded
+    vector = None
+    if text.strip():
+        try:
+            vector = document_vectors([text])[0]
+        except Exception:
+            # Same as without text; candidates then fall back to lexical scoring
+            metrics.inc("document_embedding_failures_total", mode=mode)
+    if vector is not None:
+        # Labels of the nearest classified documents are the next best candidates
+        votes = get_neighbour_index().vote(vector, k=NEIGHBOUR_COUNT)
+        seed_codes += [vote["code"] for vote in votes[:NEIGHBOUR_SEEDS]]
+    inputs_dict = build_inputs(pdf_content, classifications, mode, seed_codes, vector)
+    key = store.key(text)
+    fingerprint = simhash(text) if store.cacheable(text) else None
+    # A rerun starts without the memory of an earlier run on the document, which would
+    # change every prompt and miss the LLM response cache
+    get_memory_policy().release(key)
+    result = crew_result(
+        kickoff(get_crew(mode), inputs_dict, mode, classifications, vector, scope=key)
+    )
+
+    try:
+        parsed = parse_result(result, classifications)
+    except ValueError as error:
+        # Outputs that stayed invalid after repair are neither stored, so the document runs
+        # again next time instead of being answered with them, nor used as votes; the
+        # queued fingerprint lets the review store the corrected result
+        flags = [f"Invalid output: {line[2:]}" for line in describe_error(error).splitlines()]
+        get_review_queue().enqueue(
+            key, mode, result, flags, inputs_dict["hierarchy"], source, fingerprint
+        )
+        return result
+
+    store.store(text, mode, result, source)
+    if vector is None:
+        get_memory_policy().release(key)
+        return result
+
+    codes = [classification.label for classification in parsed.validated_classifications]
+    get_neighbour_index().add(key, vector, codes, source=source)
+    if parsed.confidence and parsed.confidence.get("flagged"):
+        # The automated labels are returned now; the review happens separately
+        get_review_queue().enqueue(
+            key,
+            mode,
+            result,
+            parsed.confidence["flags"],
+            inputs_dict["hierarchy"],
+            source,
+            fingerprint,
+        )
+    else:
+        # Only a review recalls the memory of a stored classification
+        get_memory_policy().release(key)
+    return result
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    extract_workers: int = os.cpu_count() or 1,
+    concurrency: int = 4,
+    mode: str = "full",
+    token_budget: int = TOKEN_BUDGET,
+):
+    """
+    Classify every document of a batch and write one JSON record per document.
+
+    PDFs are extracted in a process pool while up to `concurrency` crew kickoffs run at
+    once. The hierarchy is parsed and the embedding index warmed up once per batch.
+    Records are written in completion order as soon as each document finishes.
+
+    Args:
+        input_path (str): Directory containing PDFs, or path to a .jsonl manifest
+        output_path (str): JSONL file receiving one result record per document
+        extract_workers (int): Number of processes extracting PDFs
+        concurrency (int): Maximum number of crew kickoffs in flight
+        mode (str): Pipeline mode, "full" or "fast"
+        token_budget (int): Maximum estimated tokens of document text per document
+
+    Returns:
+        Dict: Number of documents that succeeded and failed, text cache hits, misses and
+        evictions during the batch with its current size, and review queue statistics
+    """
+    documents = load_batch(input_path)
+    classifications = get_categories("./TOS/english_tos.xml")
+    get_similarity_engine()
+    get_crew(mode)
+
+    summary = {"ok": 0, "error": 0}
+    text_cache_start = TextCache().stats()["total"]
+
+    with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=concurrency) as crew_pool, \
+            open(output_path, "a") as output:
+        # future -> (stage, document, start time); each entry carries its own start time
+        pending = {}
+        for document in documents:
+            future = extract_pool.submit(extract_pdf, document["path"], token_budget)
+            pending[future] = ("extract", document, time.perf_counter())
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, document, started = pending.pop(future)
+
+                if future.exception() is None and stage == "extract":
+                    # Hand the extracted text to the crew pool as soon as it is ready
+                    crew_future = crew_pool.submit(
+                        classify_content,
+                        future.result(),
+                        classifications,
+                        mode,
+                        document["path"],
+                    )
+                    pending[crew_future] = ("classify", document, started)
+                    continue
+
+                record = {
+                    "id": document["id"],
+                    "path": document["path"],
+                    "seconds": round(time.perf_counter() - started, 3),
+                }
+                if future.exception() is not None:
+                    record["status"] = "error"
+                    record["stage"] = stage
+                    record["error"] = str(future.exception())
+                else:
+                    record["status"] = "ok"
+                    record["result"] = future.result()
+
+                summary[record["status"]] += 1
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+
+    # Workers share the cache database: the change of its lifetime counters covers the
+    # whole batch, every extraction process included
+    text_cache = TextCache().stats()["total"]
+    summary["text_cache"] = {
+        **text_cache,
+        **{name: text_cache[name] - text_cache_start[name] for name in ("hits", "misses", "evictions")},
+    }
+    summary["review_queue"] = get_review_queue().stats()
+    metrics.write_prometheus()
+    return summary
+
+
 if __name__ == "__main__":
-    pdf_file = "./documents/Crime_statistics_in_California.pdf"
-    result = run(pdf_file)
-    print(result)
+    parser = argparse.ArgumentParser(description="Classify PDF documents with the crew.")
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="./documents/Crime_statistics_in_California.pdf",
+        help="PDF file, directory of PDFs or JSONL manifest",
+    )
+    parser.add_argument(
+        "-o", "--output", default="results.jsonl", help="JSONL output for batch runs"
+    )
+    parser.add_argument(
+        "--extract-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes extracting PDFs in batch runs",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum concurrent crew kickoffs in batch runs",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=sorted(PIPELINE_MODES),
+        default="full",
+        help="'full' runs five LLM stages, 'fast' does ingestion and preprocessing locally",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=TOKEN_BUDGET,
+        help="Maximum estimated tokens of document text sent to the crew, selected from pages sampled across the document",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Append per-event metrics to this JSONL file (a Prometheus snapshot is always written to logs/metrics.prom)",
+    )
+    args = parser.parse_args()
+    metrics.configure(args.metrics)
+
+    if os.path.isdir(args.input) or args.input.endswith(".jsonl"):
+        print(
+            run_batch(
+                args.input,
+                args.output,
+                extract_workers=args.extract_workers,
+                concurrency=args.concurrency,
+                mode=args.mode,
+                token_budget=args.token_budget,
+            )
+        )
+    else:
+        result = run(args.input, mode=args.mode, token_budget=args.token_budget)
+        print(result)
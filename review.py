@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""
+Process the queue of flagged classifications, separately from classification.
+
+    python review.py list                         Reviews waiting, oldest first
+    python review.py show 12                      One review with its result and flags
+    python review.py correct 12 01.02.00.00 ...   Record a reviewer's 5 labels, best first
+    python review.py accept 12                    Keep the automated labels
+    python review.py agent --concurrency 2        Let the human_in_the_loop agent review the queue
+
+Completed reviews replace the stored result of the document and mark its labels as
+reviewed in the archive of classified documents.
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from crew import get_crew
+from lib.agent_memory import get_memory_policy
+from lib.category_search import get_neighbour_index
+from lib.metrics import metrics
+from lib.output_parsing import parse_result
+from lib.parse_xml import get_categories
+from main import crew_result, get_result_store, get_review_queue, kickoff
+
+
+def apply_review(review: Dict, correction: str, classifications: Dict[str, str]) -> Dict:
+    """
+    Complete a review and write the reviewed result back to the result store and archive.
+
+    Args:
+        review (Dict): Claimed review
+        correction (str): Reviewed classification result
+        classifications (Dict[str, str]): Parsed hierarchy
+
+    Returns:
+        Dict: The completed review
+
+    Raises:
+        ValueError: The correction is not a valid classification of the hierarchy
+    """
+    parsed = parse_result(correction, classifications)
+    correction = json.dumps(parsed.model_dump(by_alias=True, exclude_none=True), ensure_ascii=False)
+
+    completed = get_review_queue().complete(review["id"], correction)
+    store = get_result_store()
+    if not store.update(review["key"], review["mode"], correction) and review["simhash"] is not None:
+        # Outputs still invalid after repair were queued without being stored
+        store.insert(review["key"], review["mode"], review["simhash"], correction, review["source"])
+    get_neighbour_index().mark_reviewed(
+        review["key"], [classification.label for classification in parsed.validated_classifications]
+    )
+    return completed
+
+
+def corrected_result(review: Dict, codes: List[str]) -> str:
+    """
+    Build the result of a manual review: the reviewer's codes, best first, keeping the
+    reasoning of labels the classification already had.
+    """
+    try:
+        previous = {
+            classification.label: classification
+            for classification in parse_result(review["result"]).validated_classifications
+        }
+    except ValueError:
+        # Invalid outputs are queued for review too; they have no reasoning to keep
+        previous = {}
+    return json.dumps(
+        {
+            "validated_classifications": [
+                {
+                    "label": code,
+                    "confidence_score": 1.0,
+                    "Reasoning": previous[code].reasoning if code in previous else "Set by reviewer",
+                }
+                for code in codes
+            ],
+            "improvement_feedback": f"Reviewed by {os.getenv('USER', 'reviewer')}",
+        }
+    )
+
+
+def agent_review(review: Dict, classifications: Dict[str, str]) -> Dict:
+    """
+    Review one claimed result with the human_in_the_loop agent.
+    """
+    inputs = {"classification": review["result"], "hierarchy": review["hierarchy"]}
+    try:
+        # Same memory scope as the document's classification, while it is still kept
+        output = kickoff(get_crew("review"), inputs, "review", classifications, scope=review["key"])
+        completed = apply_review(review, crew_result(output), classifications)
+    except Exception as e:
+        get_review_queue().release(review["id"], str(e))
+        raise
+    get_memory_policy().release(review["key"])
+    return completed
+
+
+def run_agent(concurrency: int = 1, limit: int = 0) -> Dict[str, int]:
+    """
+    Let the agent review queued results until the queue is empty or `limit` reviews are done.
+
+    Args:
+        concurrency (int): Reviews in flight
+        limit (int): Maximum number of reviews, 0 for no limit
+
+    Returns:
+        Dict[str, int]: Number of reviews completed and failed
+    """
+    classifications = get_categories("./TOS/english_tos.xml")
+    queue = get_review_queue()
+    reviewer = f"agent@{socket.gethostname()}:{os.getpid()}"
+    summary = {"done": 0, "error": 0}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if limit and summary["done"] + summary["error"] >= limit:
+                    return
+            review = queue.claim(reviewer)
+            if review is None:
+                return
+            try:
+                agent_review(review, classifications)
+                outcome = "done"
+            except Exception as e:
+                print(f"Review {review['id']} failed: {e}")
+                outcome = "error"
+            with lock:
+                summary[outcome] += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+
+    metrics.write_prometheus()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    show = commands.add_parser("show")
+    show.add_argument("id", type=int)
+    correct = commands.add_parser("correct")
+    correct.add_argument("id", type=int)
+    correct.add_argument("codes", nargs="+", help="Category codes, best first")
+    accept = commands.add_parser("accept")
+    accept.add_argument("id", type=int)
+    agent = commands.add_parser("agent")
+    agent.add_argument("--concurrency", type=int, default=1)
+    agent.add_argument("--limit", type=int, default=0, help="Stop after this many reviews")
+    args = parser.parse_args()
+
+    queue = get_review_queue()
+    if args.command == "list":
+        for review in queue.pending():
+            print(f"{review['id']}\t{review['status']}\t{review['source'] or review['key']}\t{len(review['flags'])} flags")
+        print(queue.stats())
+    elif args.command == "show":
+        print(json.dumps(queue.get(args.id), indent=2, ensure_ascii=False))
+    elif args.command in ("correct", "accept"):
+        review = queue.get(args.id)
+        if review is None:
+            raise SystemExit(f"No review {args.id}")
+        classifications = get_categories("./TOS/english_tos.xml")
+        correction = (
+            corrected_result(review, args.codes)
+            if args.command == "correct"
+            else review["result"]
+        )
+        print(json.dumps(apply_review(review, correction, classifications)["correction"], ensure_ascii=False))
+    else:
+        print(run_agent(args.concurrency, args.limit))
@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+"""
+Long-running classification service.
+
+Keeps the hierarchy, category index, crews and model clients warm in one process and
+classifies documents submitted over HTTP:
+
+    POST /jobs               JSON {"path": "...", "mode": "fast"}, a file under --document-root
+                             (relative paths are relative to it),
+                             or multipart upload ("file" field, "mode" field or ?mode=)
+                             -> 202 {"id", "status"}, or 429 when the queue is full
+    GET  /jobs/{id}          Current status and, once finished, the result
+    GET  /jobs/{id}/events   Newline-delimited JSON stream of status changes until the job ends
+    GET  /health             Queue depth, worker usage, agent memory and process RSS
+    GET  /metrics            Prometheus text snapshot
+
+    python service.py --port 8080 --workers 4 --queue-size 64 --document-root ./documents
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from crew import get_crew, PIPELINE_MODES
+from lib.agent_memory import get_memory_policy
+from lib.category_search import get_similarity_engine
+from lib.metrics import metrics, resident_bytes
+from lib.parse_xml import get_categories
+from lib.pdf_reader import PdfReader
+from lib.text_cache import TextCache
+from lib.page_selection import TOKEN_BUDGET
+from main import classify_content, get_review_queue, read_document
+
+UPLOAD_DIR = "./uploads"
+# Only files under this directory can be submitted by path
+DOCUMENT_ROOT = "./documents"
+
+# Finished jobs whose status can still be queried; older ones are forgotten
+FINISHED_JOBS = 1000
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class Job:
+    def __init__(self, path: str, mode: str, source: str, upload: bool = False):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.mode = mode
+        self.source = source
+        # Uploaded files belong to the job and are deleted when it ends
+        self.upload = upload
+        self.status = "queued"
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.events: List[Dict] = []
+        self.changed = asyncio.Event()
+        self.set_status("queued")
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def set_status(self, status: str):
+        self.status = status
+        self.events.append(self.to_dict())
+        # Wake every stream waiting on this job, then re-arm for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "mode": self.mode,
+            "source": self.source,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class ClassificationService:
+    """
+    Bounded job queue in front of a fixed number of concurrent crew kickoffs.
+
+    Kickoffs are blocking, so each worker coroutine hands its job to a thread pool of
+    the same size. When `queue_size` jobs are waiting, new submissions are refused
+    with 429 instead of growing latency without bound.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        queue_size: int = 64,
+        modes: List[str] = ("fast", "full"),
+        token_budget: int = TOKEN_BUDGET,
+        document_root: str = DOCUMENT_ROOT,
+    ):
+        self.workers = workers
+        self.document_root = os.path.realpath(document_root)
+        self.token_budget = token_budget
+        self.modes = list(modes)
+        self.queue: Optional[asyncio.Queue] = None
+        self.queue_size = queue_size
+        self.jobs: Dict[str, Job] = {}
+        self.finished = deque()
+        self.running = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="classify")
+        self.reader = PdfReader(cache=TextCache())
+        self.classifications: Dict[str, str] = {}
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self, app: web.Application):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # Pay for parsing, the category index and crew construction once, before serving
+        self.classifications = await loop.run_in_executor(
+            self.executor, get_categories, "./TOS/english_tos.xml"
+        )
+        await loop.run_in_executor(self.executor, get_similarity_engine)
+        for mode in self.modes:
+            await loop.run_in_executor(self.executor, get_crew, mode)
+
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self, app: web.Application):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def classify(self, job: Job) -> str:
+        pdf_content = read_document(self.reader, job.path, self.token_budget)
+        return classify_content(pdf_content, self.classifications, job.mode, job.source)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            self.running += 1
+            job.started = time.time()
+            job.set_status("running")
+            try:
+                job.result = await loop.run_in_executor(self.executor, self.classify, job)
+                job.finished = time.time()
+                job.set_status("succeeded")
+            except Exception as e:
+                job.error = str(e)
+                job.finished = time.time()
+                job.set_status("failed")
+            finally:
+                if job.upload:
+                    remove_file(job.path)
+                self.running -= 1
+                self.queue.task_done()
+                self.finished.append(job.id)
+                while len(self.finished) > FINISHED_JOBS:
+                    self.jobs.pop(self.finished.popleft(), None)
+                metrics.observe(
+                    "service_job_seconds", job.finished - job.submitted, status=job.status, mode=job.mode
+                )
+
+    def _rejected(self) -> web.Response:
+        metrics.inc("service_rejected_total")
+        return web.json_response(
+            {"error": "Queue is full, retry later", "queue_size": self.queue_size},
+            status=429,
+            headers={"Retry-After": "5"},
+        )
+
+    def _check_mode(self, mode: str):
+        if mode not in self.modes:
+            raise web.HTTPBadRequest(text=f"Unknown mode {mode!r}, expected one of {self.modes}")
+
+    async def submit(self, request: web.Request) -> web.Response:
+        # Refuse before reading the body, so rejected uploads are never written
+        if self.queue.full():
+            return self._rejected()
+
+        upload = request.content_type.startswith("multipart/")
+        if upload:
+            path, source, mode = await self._save_upload(request)
+        else:
+            try:
+                body = await request.json()
+            except ValueError:
+                # json.JSONDecodeError, including an empty body
+                raise web.HTTPBadRequest(text="Request body is not valid JSON")
+            if not isinstance(body, dict) or not isinstance(body.get("path"), str):
+                raise web.HTTPBadRequest(text="Expected a 'path' or a multipart 'file' upload")
+            source = body["path"]
+            mode = body.get("mode", "fast")
+            self._check_mode(mode)
+            # Absolute paths are kept as they are by join
+            path = os.path.realpath(os.path.join(self.document_root, source))
+            if os.path.commonpath([path, self.document_root]) != self.document_root:
+                raise web.HTTPForbidden(text=f"Only files under {self.document_root} can be submitted by path")
+            if not os.path.isfile(path):
+                raise web.HTTPBadRequest(text=f"No such file: {source}")
+
+        job = Job(path, mode, source, upload=upload)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            if upload:
+                remove_file(path)
+            return self._rejected()
+
+        self.jobs[job.id] = job
+        metrics.inc("service_submitted_total", mode=mode)
+        return web.json_response(job.to_dict(), status=202)
+
+    async def _save_upload(self, request: web.Request):
+        """
+        Write the uploaded file to UPLOAD_DIR. The mode, from the query string or a
+        "mode" part sent before the file, is checked before anything is written; the
+        file is deleted when the request turns out to be invalid.
+        """
+        reader = await request.multipart()
+        mode = request.query.get("mode", "fast")
+        self._check_mode(mode)
+        path = source = None
+        try:
+            async for part in reader:
+                if part.name == "mode":
+                    mode = (await part.text()).strip()
+                    self._check_mode(mode)
+                elif part.name == "file" and path is None:
+                    os.makedirs(UPLOAD_DIR, exist_ok=True)
+                    source = os.path.basename(part.filename or "upload.pdf")
+                    path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}-{source}")
+                    with open(path, "wb") as file:
+                        while chunk := await part.read_chunk():
+                            file.write(chunk)
+        except BaseException:
+            if path is not None:
+                remove_file(path)
+            raise
+        if path is None:
+            raise web.HTTPBadRequest(text="Multipart request without a 'file' part")
+        return path, source, mode
+
+    def _job(self, request: web.Request) -> Job:
+        job = self.jobs.get(request.match_info["id"])
+        if job is None:
+            raise web.HTTPNotFound(text="Unknown job")
+        return job
+
+    async def status(self, request: web.Request) -> web.Response:
+        return web.json_response(self._job(request).to_dict())
+
+    async def events(self, request: web.Request) -> web.StreamResponse:
+        job = self._job(request)
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+
+        sent = 0
+        while True:
+            changed = job.changed
+            for event in job.events[sent:]:
+                await response.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+            sent = len(job.events)
+            if job.done:
+                break
+            await changed.wait()
+
+        await response.write_eof()
+        return response
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue_size,
+                "running": self.running,
+                "workers": self.workers,
+                "review_queue": get_review_queue().stats(),
+                "agent_memory": get_memory_policy().stats(),
+                "resident_bytes": resident_bytes(),
+            }
+        )
+
+    async def prometheus(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.to_prometheus(), content_type="text/plain")
+
+
+def create_app(
+    workers: int = 4,
+    queue_size: int = 64,
+    modes: List[str] = ("fast", "full"),
+    token_budget: int = TOKEN_BUDGET,
+    document_root: str = DOCUMENT_ROOT,
+) -> web.Application:
+    """
+    Build the aiohttp application.
+
+    Args:
+        workers (int): Number of concurrent crew kickoffs
+        queue_size (int): Maximum number of waiting jobs before submissions get 429
+        modes (List[str]): Pipeline modes to warm up and accept
+        token_budget (int): Maximum estimated tokens of document text per job
+        document_root (str): Directory of the files that can be submitted by path
+
+    Returns:
+        web.Application: Application ready for web.run_app
+    """
+    service = ClassificationService(workers, queue_size, modes, token_budget, document_root)
+    app = web.Application(client_max_size=256 * 1024 * 1024)
+    app["service"] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.add_routes(
+        [
+            web.post("/jobs", service.submit),
+            web.get("/jobs/{id}", service.status),
+            web.get("/jobs/{id}/events", service.events),
+            web.get("/health", service.health),
+            web.get("/metrics", service.prometheus),
+        ]
+    )
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent crew kickoffs")
+    parser.add_argument("--queue-size", type=int, default=64, help="Waiting jobs before returning 429")
+    parser.add_argument(
+        "--modes",
+        default="fast,full",
+        help=f"Comma-separated pipeline modes to serve, among {sorted(PIPELINE_MODES)}",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=TOKEN_BUDGET,
+        help="Maximum estimated tokens of document text per job",
+    )
+    parser.add_argument(
+        "--document-root",
+        default=DOCUMENT_ROOT,
+        help="Directory of the files that can be submitted by path; uploads are not restricted",
+    )
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(
+            args.workers, args.queue_size, args.modes.split(","), args.token_budget, args.document_root
+        ),
+        host=args.host,
+        port=args.port,
+    )
@@ -1,20 +1,24 @@
-from lib.parse_xml import get_categories
-from crewai import Task
-from tools.chromadb_vectorizer import document_vectorizer, categories_vectorizer
-from agents import (
-    text_ingestion_specialist,
-    text_preprocessing_specialist,
-    text_classification_specialist,
-    confidence_scoring_agent,
-    human_in_the_loop,
-)
+from functools import lru_cache
 
-# Define the hierarchy of classification labels
-hierarchy = get_categories("./TOS/english_tos.xml")
+# JSON produced by every labelled task, validated by lib.output_parsing after each task.
+# Braces are doubled because crewai formats descriptions with the crew inputs.
+CLASSIFICATION_JSON = """
+        {{
+            "validated_classifications": [
+                {{"label": "<code 1>", "confidence_score": 0.85, "Reasoning": "Reasoning"}},
+                {{"label": "<code 2>", "confidence_score": 0.75, "Reasoning": "Reasoning"}},
+                {{"label": "<code 3>", "confidence_score": 0.70, "Reasoning": "Reasoning"}},
+                {{"label": "<code 4>", "confidence_score": 0.68, "Reasoning": "Reasoning"}},
+                {{"label": "<code 5>", "confidence_score": 0.65, "Reasoning": "Reasoning"}}
+            ],
+            "improvement_feedback": "Suggestions for improving classification accuracy."
+        }}
+    Each "label" is the code of a category of the hierarchy, e.g. "00.00.00.01".
+"""
 
 # Define tasks with strict top-5 classification requirements
-ingest_documents = Task(
-    agent=text_ingestion_specialist,
+ingest_documents_config = dict(
+    agent="text_ingestion_specialist",
     name="Document Ingestion",
     description="""
     Prepare and standardize the document and all incoming text {raw_input} by:
@@ -25,8 +29,8 @@ ingest_documents = Task(
     expected_output="A structured and standardized document collection with metadata, verified for classification readiness.",
 )
 
-preprocess_text = Task(
-    agent=text_preprocessing_specialist,
+preprocess_text_config = dict(
+    agent="text_preprocessing_specialist",
     name="Text Preprocessing",
     description="""
     Prepare and vectorize document for semantic classification:
@@ -48,23 +52,26 @@ preprocess_text = Task(
     Ensure vectors are properly indexed for subsequent label matching.
     """,
     expected_output="Preprocessed document with ChromaDB vectors and semantic similarity scores",
-    context=[ingest_documents],
+    context=["ingest_documents"],
 )
 
-classify_documents = Task(
-    agent=text_classification_specialist,
+classify_documents_config = dict(
+    agent="text_classification_specialist",
     name="Document Classification",
     description="""
     Perform strict top-5 label classification by:
-    1. Analyzing the content of the document against the provided {hierarchy}.
-    2. Using the `document_vectorizer` tool to generate a vector representation of the document.
-    3. Using the `categories_vectorizer` tool to generate vector embeddings for each label in the hierarchy.
-    4. Computing similarity scores between the document vector and the category vectors.
-    5. STRICTLY selecting only the top 5 highest-scoring labels based on similarity.
-    6. Recording detailed justification for each selected label, including:
-        - Similarity score for each label.
+    1. Analyzing the content of the document against the candidate categories, one "code: path" per line:
+    {hierarchy}
+    2. Using the `category_similarity` tool on the document text. It returns the exact top 5
+       labels from the hierarchy with their cosine similarity scores. Do not compute or
+       change similarity scores yourself.
+    3. Keeping the 5 labels and scores returned by the tool, in the same order.
+       The `similar_documents` tool shows the labels of already classified documents
+       closest to this one; use them as supporting evidence.
+    4. Recording detailed justification for each selected label, including:
+        - Similarity score for each label, as returned by the tool.
         - Key evidence supporting each label selection.
-    7. Ensuring exactly 5 labels are chosen - no more, no less.
+    5. Ensuring exactly 5 labels are chosen - no more, no less.
 
     Output:
     - Top 5 labels in ranked order.
@@ -72,68 +79,38 @@ classify_documents = Task(
     - Key evidence supporting each label selection.
     
     Include a structured output in JSON format:
-        {{
-            "validated_classifications": [
-                {{"label": "Label1", "confidence_score": 0.85, "Reasoning": "Reasoning"}},
-                {{"label": "Label2", "confidence_score": 0.75, "Reasoning": "Reasoning"}},
-                {{"label": "Label3", "confidence_score": 0.70, "Reasoning": "Reasoning"}},
-                {{"label": "Label4", "confidence_score": 0.68, "Reasoning": "Reasoning"}},
-                {{"label": "Label5", "confidence_score": 0.65, "Reasoning": "Reasoning"}}
-            ],
-            "improvement_feedback": "Suggestions for improving classification accuracy."
-        }}
+"""
+    + CLASSIFICATION_JSON
+    + """
 
     Ensure that the output strictly follows the above JSON structure.
     """,
     expected_output="""Documents with exactly 5 ranked labels, scores, and supporting evidence.
     The output should be a JSON object with the following structure:
-        {{
-            "validated_classifications": [
-                {{"label": "Label1", "confidence_score": 0.85, "Reasoning": "Reasoning"}},
-                {{"label": "Label2", "confidence_score": 0.75, "Reasoning": "Reasoning"}},
-                {{"label": "Label3", "confidence_score": 0.70, "Reasoning": "Reasoning"}}
-            ],
-            "improvement_feedback": "Suggestions for improving classification accuracy."
-        }}
-    """,
-    context=[preprocess_text],
-    allowed_labels=hierarchy,
-    tools=[document_vectorizer, categories_vectorizer],
-)
-
-score_confidence = Task(
-    agent=confidence_scoring_agent,
-    name="Confidence Scoring",
-    description="""
-    Evaluate classification confidence for top-5 labels by:
-    1. Analyzing strength of evidence for each assigned label
-    2. Computing confidence scores (0-1) for each label
-    3. Flagging cases where:
-        - Gap between 2nd, 3rd, 4th or 5th best label is small (<0.1)
-        - Confidence score for any top-5 label is below 0.6
-        - Evidence for labels is contradictory
-    """,
-    expected_output="""Confidence scores for each top-5 label with specific flag conditions documented.
-        The output should is a JSON object with strcitly the following structure:
-        {{
-            "validated_classifications": [
-                {{"label": "Label1", "confidence_score": 0.85, "Reasoning": "Reasoning"}},
-                {{"label": "Label2", "confidence_score": 0.75, "Reasoning": "Reasoning"}},
-                {{"label": "Label3", "confidence_score": 0.70, "Reasoning": "Reasoning"}}
-            ],
-            "improvement_feedback": "Suggestions for improving classification accuracy"
-        }}
-    """,
-    context=[preprocess_text, classify_documents],
-    allowed_labels=hierarchy,
+"""
+    + CLASSIFICATION_JSON,
+    context=["preprocess_text"],
+    tools=[
+        "category_similarity",
+        "hierarchical_category_search",
+        "similar_documents",
+        "document_vectorizer",
+        "categories_vectorizer",
+    ],
 )
 
-human_review = Task(
-    agent=human_in_the_loop,
+# Runs on its own, outside the classification pipelines, for documents taken from the
+# review queue (see review.py)
+human_review_config = dict(
+    agent="human_in_the_loop",
     name="Human Review",
     description="""
-    Review flagged classifications by:
-    1. Examining documents with low confidence scores or flags
+    Review the flagged classification below:
+    {classification}
+
+    by:
+    1. Examining the labels with low confidence scores or small gaps, listed in the
+       "confidence" section of the classification
     2. Validating or adjusting the top-5 label selections
     3. Maintaining strict adherence to 5-label requirement
     4. Documenting rationale for any label changes
@@ -142,16 +119,80 @@ human_review = Task(
     No more text or other formats are allowed. We are very strict on this.
     Ensure output maintains exactly 5 labels per document strictly from {hierarchy}.
     """,
-    context=[classify_documents, score_confidence],
     expected_output=""" Your output should be in the following format and this is the only format accepted.
     No additional text or formatting is allowed. You do not get to decide the format.:
-        {{
-            "validated_classifications": [
-                {{"label": "Label1", "confidence_score": 0.85, "Reasoning": "Reasoning"}},
-                {{"label": "Label2", "confidence_score": 0.75, "Reasoning": "Reasoning"}},
-                {{"label": "Label3", "confidence_score": 0.70, "Reasoning": "Reasoning"}}
-            ],
-            "improvement_feedback": "Suggestions for improving classification accuracy"
-        }}
-    """,
+"""
+    + CLASSIFICATION_JSON,
 )
+
+# Fast pipeline: ingestion and preprocessing run as local code (lib.text_normalization),
+# so classification reads the prepared document directly instead of an upstream task.
+# Confidence scoring is computed in code after classification (lib.calibration) in both pipelines.
+classify_documents_fast_config = dict(
+    agent="text_classification_specialist",
+    name="Document Classification",
+    description="""
+    The document below has already been ingested and cleaned:
+    {document}
+    """
+    + classify_documents_config["description"],
+    expected_output=classify_documents_config["expected_output"],
+    tools=classify_documents_config["tools"],
+)
+
+TASK_CONFIGS = {
+    "ingest_documents": ingest_documents_config,
+    "preprocess_text": preprocess_text_config,
+    "classify_documents": classify_documents_config,
+    "human_review": human_review_config,
+    "classify_documents_fast": classify_documents_fast_config,
+}
+
+# Tasks restricted to the labels of the hierarchy
+LABELLED_TASKS = {
+    "classify_documents",
+    "classify_documents_fast",
+}
+
+
+@lru_cache(maxsize=None)
+def get_tasks(llm_cache: bool = True):
+    """
+    Build every task once per process, resolving agents, context and tools by name.
+    crewai, the agents and the tools are only imported here.
+
+    Args:
+        llm_cache (bool): Whether the tasks' agents may answer from the response cache
+
+    Returns:
+        Dict[str, Task]: Tasks keyed by name
+    """
+    from crewai import Task
+    from lib.parse_xml import get_categories
+    from agents import get_agents
+    import tools.chromadb_vectorizer as vectorizer_tools
+
+    # Define the hierarchy of classification labels
+    hierarchy = get_categories("./TOS/english_tos.xml")
+    agents = get_agents(llm_cache)
+
+    tasks = {}
+    # Configs are listed so that a task's context is always built before it
+    for name, config in TASK_CONFIGS.items():
+        config = dict(config)
+        config["agent"] = agents[config["agent"]]
+        if "context" in config:
+            config["context"] = [tasks[context] for context in config["context"]]
+        if "tools" in config:
+            config["tools"] = [getattr(vectorizer_tools, tool) for tool in config["tools"]]
+        if name in LABELLED_TASKS:
+            config["allowed_labels"] = hierarchy
+        tasks[name] = Task(**config)
+    return tasks
+
+
+def __getattr__(name):
+    # Keeps `from tasks import classify_documents` working
+    if name in TASK_CONFIGS:
+        return get_tasks()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from lib.agent_memory import DisabledMemory, MemoryPolicy, ScopedMemory, scoped_memory
+
+
+class Crew:
+    memory = False
+
+
+def test_scopes_are_isolated_and_ranked():
+    policy = MemoryPolicy()
+    policy.save("a", "crime statistics for the county", {"agent": "ingest"})
+    policy.save("a", "bread recipes")
+    policy.save("b", "crime statistics for another document")
+
+    results = policy.search("a", "county crime", limit=5)
+    assert [result["context"] for result in results] == ["crime statistics for the county", "bread recipes"]
+    assert results[0]["metadata"] == {"agent": "ingest"} and results[1]["score"] == 0
+    assert policy.search("missing", "crime") == []
+
+
+def test_entry_cap_evicts_least_recently_used_scope_first():
+    policy = MemoryPolicy(max_entries=3)
+    policy.save("a", "one")
+    policy.save("a", "two")
+    policy.save("b", "three")
+    policy.search("a", "query")
+    policy.save("b", "four")
+
+    assert policy.scope_size("a") == 1 and policy.scope_size("b") == 2
+    assert [result["context"] for result in policy.search("a", "two")] == ["two"]
+    assert policy.stats()["evicted"] == {"size": 1}
+
+
+def test_byte_cap():
+    policy = MemoryPolicy(max_bytes=10)
+    policy.save("a", "x" * 6)
+    policy.save("b", "é" * 3)
+    stats = policy.stats()
+    assert stats["entries"] == 1 and stats["bytes"] == 6
+    assert policy.scope_size("a") == 0
+
+
+def test_idle_scopes_expire():
+    policy = MemoryPolicy(max_age=0.05)
+    policy.save("a", "old")
+    time.sleep(0.1)
+    policy.save("b", "new")
+    assert policy.stats()["scopes"] == 1
+    assert policy.search("a", "old") == []
+    assert policy.stats()["evicted"] == {"age": 1}
+
+
+def test_release_and_scoped_view():
+    policy = MemoryPolicy()
+    memory = ScopedMemory(policy, "a")
+    assert memory and len(memory) == 0
+    memory.save("answer", agent="classifier")
+    assert memory.search("answer")[0]["metadata"] == {"agent": "classifier"}
+    memory.reset()
+    assert len(memory) == 0 and policy.stats()["evicted"] == {"release": 1}
+    assert not DisabledMemory()
+
+
+def test_scoped_memory_releases_unnamed_scopes(monkeypatch):
+    monkeypatch.setenv("AGENT_MEMORY", "1")
+    crew = Crew()
+    with scoped_memory(crew) as memory:
+        memory.save("private")
+        assert crew.memory and not crew._long_term_memory
+    assert len(memory) == 0
+
+    with scoped_memory(crew, "document") as memory:
+        memory.save("kept")
+    assert len(memory) == 1
+    memory.reset()
+
+
+@pytest.mark.parametrize("value", ["0", "false", "off"])
+def test_scoped_memory_can_be_disabled(monkeypatch, value):
+    monkeypatch.setenv("AGENT_MEMORY", value)
+    crew = Crew()
+    with scoped_memory(crew, "document") as memory:
+        assert memory is None
+    assert crew.memory is False
@@ -0,0 +1,46 @@
+import numpy as np
+
+from lib.calibration import Calibration, calibrate, fit_calibration, flag_reasons
+
+
+def test_probabilities_are_ranked_and_flagged():
+    report = calibrate([0.9, 0.5, 0.89, 0.2, 0.1])
+    assert report["order"][0].tolist() == [0, 2, 1, 3, 4]
+    assert np.all(np.diff(report["probabilities"][0][report["order"][0]]) <= 0)
+    assert 0 <= report["entropy"][0] <= 1
+    assert report["flagged"][0]
+
+
+def test_clear_result_is_not_flagged():
+    calibration = Calibration(min_gap=0.0, min_confidence=0.5)
+    report = calibrate([[0.95, 0.9, 0.85, 0.8, 0.75]], calibration)
+    assert not report["flagged"][0]
+    assert flag_reasons(report, 0, ["a", "b", "c", "d", "e"]) == []
+
+
+def test_flag_reasons_name_the_labels():
+    report = calibrate([0.9, 0.89, 0.88, 0.87, 0.2])
+    reasons = flag_reasons(report, 0, ["a", "b", "c", "d", "e"])
+    assert any("gap between a and b" in reason for reason in reasons)
+    assert any("confidence of e" in reason for reason in reasons)
+
+
+def test_fit_recovers_the_separating_threshold():
+    scores = np.linspace(0, 1, 200)
+    correct = scores > 0.5
+    fitted = fit_calibration(scores, correct)
+    probabilities = calibrate(scores[None, :], fitted)["probabilities"][0]
+    assert probabilities[scores < 0.4].max() < 0.5 < probabilities[scores > 0.6].min()
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "calibration.json")
+    assert Calibration.load(path) == Calibration()
+    Calibration(slope=3.0).save(path)
+    assert Calibration.load(path).slope == 3.0
+
+
+def test_extreme_scores_do_not_overflow():
+    with np.errstate(over="raise"):
+        report = calibrate([[1e4, -1e4, 0.5]], Calibration(slope=50.0))
+    assert np.all(np.isfinite(report["probabilities"]))
@@ -0,0 +1,50 @@
+from lib.candidates import format_hierarchy, lexical_scores, retrieve_candidates, tokenize
+from lib.metrics import metrics
+
+CATEGORIES = {
+    "1.1": "Finance > Banking",
+    "1.2": "Finance > Insurance",
+    "2.1": "Health > Hospitals",
+}
+
+
+def test_tokenize_drops_short_words_numbers_and_stopwords():
+    assert tokenize("The Bank and 42 ATMs of Zürich") == ["bank", "atms", "zürich"]
+
+
+def test_only_matching_categories_are_scored():
+    scores = lexical_scores("Hospitals and clinics", CATEGORIES)
+    assert set(scores) == {"2.1"}
+
+
+def test_leaf_words_outweigh_parent_words():
+    scores = lexical_scores("banking", CATEGORIES)
+    parent_only = lexical_scores("finance", CATEGORIES)
+    assert scores["1.1"] > parent_only["1.1"]
+    assert parent_only["1.1"] == parent_only["1.2"]
+
+
+def test_rare_words_outweigh_common_ones():
+    categories = {"a": "Finance > Banking", "b": "Finance > Loans", "c": "Finance > Funds"}
+    scores = lexical_scores("finance banking", categories)
+    assert max(scores, key=scores.get) == "a"
+
+
+def test_ranked_candidates_drop_unknown_codes():
+    rank = lambda text, n: [{"code": "2.1"}, {"code": "9.9"}, {"code": "1.1"}]
+    assert list(retrieve_candidates("text", CATEGORIES, 2, rank)) == ["2.1", "1.1"]
+
+
+def test_failed_ranking_falls_back_to_lexical_scores():
+    def rank(text, n):
+        raise ConnectionError("embedding server down")
+
+    before = metrics.snapshot()["counters"].get("candidate_embedding_failures_total", {}).get("", 0)
+    candidates = retrieve_candidates("insurance claims", CATEGORIES, 5, rank)
+    after = metrics.snapshot()["counters"]["candidate_embedding_failures_total"][""]
+    assert candidates == {"1.2": "Finance > Insurance"}
+    assert after == before + 1
+
+
+def test_format_hierarchy():
+    assert format_hierarchy({"1.1": "Finance > Banking"}) == "1.1: Finance > Banking"
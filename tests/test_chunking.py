@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from lib.chunking import chunk_pages, content_id, embed_in_batches, pool_embeddings
+
+
+def test_content_id_is_stable_and_separates_parts():
+    assert content_id("a", "b") == content_id("a", "b")
+    assert content_id("ab") != content_id("a", "b")
+    assert len(content_id("a", length=8)) == 8
+
+
+def test_chunks_overlap_and_span_pages():
+    pages = [" ".join(f"p0w{i}" for i in range(6)), " ".join(f"p1w{i}" for i in range(6))]
+    chunks = chunk_pages(pages, window=5, overlap=2)
+    assert [len(chunk["text"].split()) for chunk in chunks] == [5, 5, 5, 3]
+    assert chunks[0]["text"].split()[-2:] == chunks[1]["text"].split()[:2]
+    assert (chunks[1]["page_start"], chunks[1]["page_end"]) == (0, 1)
+    assert [chunk["index"] for chunk in chunks] == [0, 1, 2, 3]
+
+
+def test_empty_pages_have_no_chunks():
+    assert chunk_pages(["", None]) == []
+    with pytest.raises(ValueError):
+        chunk_pages(["text"], window=2, overlap=2)
+
+
+def test_embed_in_batches_keeps_order():
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        return [[float(text)] for text in texts]
+
+    assert embed_in_batches([str(i) for i in range(5)], embed, batch_size=2) == [
+        [0.0], [1.0], [2.0], [3.0], [4.0]
+    ]
+    assert calls == [2, 2, 1]
+
+
+def test_pooled_vector_is_unit_length():
+    pooled = pool_embeddings([[3.0, 0.0], [0.0, 10.0]], [1.0, 3.0])
+    assert np.isclose(np.linalg.norm(pooled), 1.0)
+    assert pooled[1] > pooled[0]
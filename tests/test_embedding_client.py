@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lib.embedding_client import EmbeddingClient, EmbeddingError
+from lib.stub_server import start_stub_server, stub_embedding
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server = start_stub_server(**options)
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_embeddings_match_the_server(stub):
+    _, url = stub(dimensions=32)
+    client = EmbeddingClient("stub", url)
+    try:
+        assert client(["first text", "second text"]) == [
+            stub_embedding("first text", 32),
+            stub_embedding("second text", 32),
+        ]
+        assert client("single") == [stub_embedding("single", 32)]
+        assert client([]) == []
+    finally:
+        client.close()
+
+
+def test_concurrent_requests_are_batched(stub):
+    server, url = stub(dimensions=8, latency=0.05)
+    client = EmbeddingClient("stub", url, max_batch_size=64, max_delay=0.05)
+    texts = [f"text {i}" for i in range(32)]
+    try:
+        with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+            results = list(pool.map(lambda text: client([text]), texts))
+    finally:
+        client.close()
+
+    assert results == [[stub_embedding(text, 8)] for text in texts]
+    assert server.RequestHandlerClass.requests < len(texts)
+
+
+def test_batches_are_split_at_max_batch_size(stub):
+    server, url = stub(dimensions=8)
+    client = EmbeddingClient("stub", url, max_batch_size=4)
+    try:
+        assert len(client([f"text {i}" for i in range(10)])) == 10
+    finally:
+        client.close()
+    assert server.RequestHandlerClass.requests == 3
+
+
+def test_server_errors_are_retried(stub):
+    server, url = stub(dimensions=8, failures=2)
+    client = EmbeddingClient("stub", url, max_retries=3, backoff=0.01)
+    try:
+        assert client(["text"]) == [stub_embedding("text", 8)]
+    finally:
+        client.close()
+    assert server.RequestHandlerClass.requests == 3
+
+
+def test_retries_are_bounded(stub):
+    _, url = stub(failures=10)
+    client = EmbeddingClient("stub", url, max_retries=1, backoff=0.01)
+    try:
+        with pytest.raises(EmbeddingError, match="503"):
+            client(["text"])
+    finally:
+        client.close()
+
+
+def test_slow_server_times_out(stub):
+    _, url = stub(latency=0.5)
+    client = EmbeddingClient("stub", url, timeout=0.05, max_retries=1, backoff=0.01)
+    start = time.perf_counter()
+    try:
+        with pytest.raises(EmbeddingError):
+            client(["text"])
+    finally:
+        client.close()
+    assert time.perf_counter() - start < 0.5
+
+
+def test_close_stops_the_loop_and_restarts_on_use(stub):
+    _, url = stub(dimensions=8)
+    client = EmbeddingClient("stub", url)
+    client(["text"])
+    thread = client._thread
+    client.close()
+    assert not thread.is_alive()
+    assert client(["again"]) == [stub_embedding("again", 8)]
+    client.close()
@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+import pytest
+
+from lib.embedding_store import EmbeddingStore, quantize
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_vectors_keep_their_direction(dtype):
+    vectors = np.random.default_rng(0).normal(size=(4, 16))
+    quantized, scales = quantize(vectors, dtype)
+    restored = quantized.astype(np.float32) * (scales[:, None] if scales is not None else 1)
+    expected = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(restored, expected, atol=0.02)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_add_get_and_replace(tmp_path, dtype):
+    store = EmbeddingStore(str(tmp_path / "store"), dtype=dtype)
+    store.add(["a", "b"], [[1.0, 0.0], [0.0, 2.0]])
+    assert np.allclose(store.get("b"), [0.0, 1.0], atol=0.01)
+    assert store.get("missing") is None
+
+    store.add(["a"], [[0.0, 1.0]])
+    assert len(store) == 2
+    assert np.allclose(store.get("a"), [0.0, 1.0], atol=0.01)
+
+
+def test_other_instances_see_new_rows(tmp_path):
+    directory = str(tmp_path / "store")
+    reader = EmbeddingStore(directory)
+    EmbeddingStore(directory).add(["a"], [[1.0, 0.0]])
+    assert np.allclose(reader.get("a"), [1.0, 0.0], atol=0.01)
+
+
+def test_dimensions_are_checked(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store"))
+    store.add(["a"], [[1.0, 0.0]])
+    with pytest.raises(ValueError):
+        store.add(["b"], [[1.0, 0.0, 0.0]])
+
+
+def test_build_replaces_the_store(tmp_path):
+    directory = str(tmp_path / "store")
+    EmbeddingStore(directory).add(["old"], [[1.0, 0.0]])
+    store = EmbeddingStore.build(directory, ["a", "b"], [[1.0, 0.0], [0.0, 1.0]], dtype="int8")
+    assert store.dtype == "int8"
+    assert store.get("old") is None and len(store) == 2
+
+
+def test_add_uses_the_type_of_an_existing_store(tmp_path):
+    directory = str(tmp_path / "store")
+    writer = EmbeddingStore(directory, dtype="float16")
+    EmbeddingStore(directory, dtype="int8").add(["a"], [[1.0, 0.0]])
+    writer.add(["b"], [[0.0, 1.0]])
+    assert writer.dtype == "int8" and writer.dimensions == 2
+    assert np.allclose(EmbeddingStore(directory).get("b"), [0.0, 1.0], atol=0.01)
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_compaction_keeps_the_latest_rows(tmp_path, dtype):
+    directory = str(tmp_path / "store")
+    reader = EmbeddingStore(directory)
+    store = EmbeddingStore(directory, dtype=dtype, max_rows=8)
+    store.add(["a"], [[1.0, 0.0]])
+    store.add(["a"], [[0.0, 1.0]])
+    for i in range(7):
+        store.add([f"id{i}"], [[1.0, float(i)]])
+
+    assert len(store.ids) == 6
+    assert store.get("a") is None and store.get("id0") is None
+    assert np.allclose(store.get("id6"), np.array([1.0, 6.0]) / np.hypot(1, 6), atol=0.01)
+    assert np.allclose(reader.get("id6"), store.get("id6"))
+    assert reader.ids == store.ids
+
+
+def test_concurrent_adds_and_gets(tmp_path):
+    directory = str(tmp_path / "store")
+    store = EmbeddingStore(directory)
+    other = EmbeddingStore(directory)
+    expected = {f"id{i}": np.array([1.0, float(i)]) / np.hypot(1, i) for i in range(200)}
+    errors = []
+
+    def write(start):
+        for i in range(start, 200, 4):
+            store.add([f"id{i}"], [[1.0, float(i)]])
+
+    def read(reader):
+        try:
+            for _ in range(300):
+                for id_ in ("id0", "id57", "id123", "id199"):
+                    vector = reader.get(id_)
+                    if vector is not None:
+                        assert np.allclose(vector, expected[id_], atol=0.01), id_
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=write, args=(start,)) for start in range(4)]
+    threads += [threading.Thread(target=read, args=(reader,)) for reader in (store, store, other)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    for reader in (store, other):
+        assert all(np.allclose(reader.get(id_), vector, atol=0.01) for id_, vector in expected.items())
+        assert sorted(reader.ids) == sorted(expected)
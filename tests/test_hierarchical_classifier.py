@@ -0,0 +1,49 @@
+from lib.hierarchical_classifier import HierarchicalClassifier
+from lib.similarity import SimilarityEngine
+
+NODES = {
+    "01": ("Crime", None, [1.0, 0.0, 0.0]),
+    "01.01": ("Crime > Theft", "01", [1.0, 0.2, 0.0]),
+    "01.02": ("Crime > Violence", "01", [0.7, 0.0, 0.7]),
+    "02": ("Finance", None, [0.0, 1.0, 0.0]),
+    "02.01": ("Finance > Taxes", "02", [0.0, 1.0, 0.1]),
+    "03": ("Other", None, [0.0, 0.0, 1.0]),
+}
+
+
+def classifier():
+    tree = {
+        code: {
+            "name": path.split(" > ")[-1],
+            "path": path,
+            "parent": parent,
+            "children": [child for child, (_, p, _) in NODES.items() if p == code],
+        }
+        for code, (path, parent, _) in NODES.items()
+    }
+    engine = SimilarityEngine(
+        list(NODES), [path for path, _, _ in NODES.values()], [vector for _, _, vector in NODES.values()]
+    )
+    return HierarchicalClassifier(tree, engine)
+
+
+def test_beam_only_expands_the_best_groups():
+    result = classifier().classify([1.0, 0.1, 0.0], k=5, beam_width=1)
+    assert result["nodes_compared"] == 5
+    codes = [classification["code"] for classification in result["classifications"]]
+    # Root leaves are kept; the children of 02 are never scored
+    assert codes == ["01.01", "01.02", "03"]
+    assert result["classifications"][0]["label"] == "Crime > Theft"
+    assert [step["code"] for step in result["classifications"][0]["path"]] == ["01"]
+    assert result["classifications"][2]["path"] == []
+
+
+def test_wider_beams_reach_more_leaves():
+    result = classifier().classify([0.1, 1.0, 0.0], k=2, beam_width=2)
+    assert result["nodes_compared"] == 6
+    assert [classification["code"] for classification in result["classifications"]] == ["02.01", "01.01"]
+
+
+def test_classify_batch():
+    results = classifier().classify_batch([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], k=1, beam_width=1)
+    assert [result["classifications"][0]["code"] for result in results] == ["01.01", "02.01"]
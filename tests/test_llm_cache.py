@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from crewai import LLM
+
+from lib.llm_cache import CachedLLM, LLMResponseCache, llm_cache_enabled
+
+MESSAGES = [{"role": "user", "content": "Classify this document"}]
+
+
+def test_hits_after_first_response(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    key = cache.key("model", MESSAGES, {"temperature": 0})
+    assert cache.key("model", MESSAGES, {"temperature": 1}) != key
+
+    assert cache.get(key) is None
+    cache.set(key, "response")
+    assert cache.get(key) == "response"
+    assert LLMResponseCache(str(tmp_path / "llm.sqlite")).get(key) == "response"
+    assert cache.stats() == {"memory_hits": 1, "disk_hits": 0, "misses": 1, "entries": 1}
+
+
+def test_expired_responses_are_not_served(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), ttl=0.05)
+    cache.set("key", "response")
+    time.sleep(0.1)
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_memory_tier_is_bounded(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"), max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("a") == "a"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_least_recently_used_responses_are_evicted_from_disk(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    cache = LLMResponseCache(path, max_bytes=20)
+    for key in ("a", "b", "c"):
+        cache.set(key, key * 10)
+
+    reopened = LLMResponseCache(path)
+    assert reopened.get("a") is None
+    assert reopened.get("c") == "c" * 10
+
+
+@pytest.mark.parametrize("value, enabled", [("1", True), ("0", False), ("false", False), ("off", False)])
+def test_llm_cache_can_be_disabled(monkeypatch, value, enabled):
+    monkeypatch.setenv("LLM_CACHE", value)
+    assert llm_cache_enabled() is enabled
+
+
+def test_cached_llm_calls_the_model_once(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(LLM, "call", lambda self, messages, callbacks=[]: calls.append(1) or "response")
+
+    llm = CachedLLM(model="ollama/test", cache=LLMResponseCache(str(tmp_path / "llm.sqlite")))
+    assert llm._cached_call(MESSAGES, []) == ("response", "miss")
+    assert llm._cached_call(MESSAGES, []) == ("response", "hit")
+    assert len(calls) == 1
+
+    uncached = CachedLLM(model="ollama/test", cache=None)
+    assert uncached._cached_call(MESSAGES, []) == ("response", "disabled")
+    assert uncached._cached_call(MESSAGES, []) == ("response", "disabled")
+    assert len(calls) == 3
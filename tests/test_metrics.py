@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from lib.metrics import Metrics
+
+
+def test_counters_are_rendered_once_per_family():
+    registry = Metrics()
+    registry.inc("cache_requests_total", cache="text", result="hit")
+    registry.inc("cache_requests_total", 2, cache="text", result="miss")
+    registry.inc("pages_total")
+    assert registry.to_prometheus().splitlines() == [
+        "# TYPE cache_requests_total counter",
+        'cache_requests_total{cache="text",result="hit"} 1',
+        'cache_requests_total{cache="text",result="miss"} 2',
+        "# TYPE pages_total counter",
+        "pages_total 1",
+    ]
+
+
+def test_summaries_keep_each_family_contiguous():
+    registry = Metrics()
+    registry.observe("task_seconds", 1.5, task="b")
+    registry.observe("task_seconds", 0.5, task="a")
+    registry.observe("task_seconds", 2.5, task="b")
+    assert registry.to_prometheus().splitlines() == [
+        "# TYPE task_seconds summary",
+        'task_seconds_count{task="a"} 1',
+        'task_seconds_sum{task="a"} 0.500000',
+        'task_seconds_count{task="b"} 2',
+        'task_seconds_sum{task="b"} 4.000000',
+        "# TYPE task_seconds_max gauge",
+        'task_seconds_max{task="a"} 0.500000',
+        'task_seconds_max{task="b"} 2.500000',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Metrics()
+    registry.inc("errors_total", error='bad "quote"\\\n')
+    assert 'errors_total{error="bad \\"quote\\"\\\\\\n"} 1' in registry.to_prometheus()
+
+
+def test_timer_records_failures():
+    registry = Metrics()
+    with pytest.raises(RuntimeError), registry.timer("tool_call_seconds", tool="search"):
+        raise RuntimeError
+    summaries = registry.snapshot()["summaries"]["tool_call_seconds"]
+    assert summaries['{status="error",tool="search"}']["count"] == 1
+
+
+def test_events_are_appended_to_jsonl(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    registry = Metrics()
+    registry.configure(path)
+    registry.inc("pages_total", 3, source="a.pdf")
+    with open(path) as file:
+        event = json.loads(file.readline())
+    assert (event["kind"], event["name"], event["value"], event["source"]) == ("counter", "pages_total", 3, "a.pdf")
+
+
+def test_reset_and_write(tmp_path):
+    registry = Metrics()
+    registry.inc("pages_total")
+    registry.reset()
+    path = str(tmp_path / "metrics.prom")
+    registry.write_prometheus(path)
+    with open(path) as file:
+        assert file.read() == "\n"
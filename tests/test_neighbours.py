@@ -0,0 +1,56 @@
+import uuid
+
+import chromadb
+import pytest
+
+from lib.neighbours import HNSW_METADATA, REVIEWED_WEIGHT, NeighbourIndex
+
+
+@pytest.fixture
+def index():
+    # Ephemeral clients share their state within a process: one collection per test
+    collection = chromadb.EphemeralClient().create_collection(
+        f"neighbours-{uuid.uuid4().hex}", metadata=HNSW_METADATA
+    )
+    return NeighbourIndex(collection)
+
+
+def test_empty_archive_has_no_votes(index):
+    assert index.vote([1.0, 0.0]) == []
+
+
+def test_votes_are_discounted_by_label_rank(index):
+    index.add("a", [1.0, 0.0], ["x", "y", "z"], source="a.pdf")
+    votes = index.vote([1.0, 0.0])
+    assert [vote["code"] for vote in votes] == ["x", "y", "z"]
+    assert [vote["votes"] for vote in votes] == [round(6 / 11, 4), round(3 / 11, 4), round(2 / 11, 4)]
+    assert votes[0]["neighbours"] == 1
+
+
+def test_reviewed_neighbours_count_for_more(index):
+    index.add("near", [1.0, 0.0], ["x", "y"])
+    index.add("far", [0.6, 0.8], ["y"], reviewed=True)
+
+    # x: 1.0, y: 1.0 / 2 + 0.6 * REVIEWED_WEIGHT
+    y = 0.5 + 0.6 * REVIEWED_WEIGHT
+    votes = index.vote([1.0, 0.0])
+    assert [vote["code"] for vote in votes] == ["y", "x"]
+    assert [vote["votes"] for vote in votes] == [round(y / (1 + y), 4), round(1 / (1 + y), 4)]
+    assert votes[0]["neighbours"] == 2
+
+    assert [vote["code"] for vote in index.vote([1.0, 0.0], reviewed_only=True)] == ["y"]
+    assert [vote["code"] for vote in index.vote([1.0, 0.0], exclude="far")] == ["x", "y"]
+
+
+def test_mark_reviewed_replaces_labels(index):
+    index.add("a", [1.0, 0.0], ["x", "y"], source="a.pdf")
+    index.mark_reviewed("a", ["z", "x"])
+
+    metadata = index.collection.get(ids=["a"], include=["metadatas"])["metadatas"][0]
+    assert metadata == {"labels": '["z", "x"]', "reviewed": True, "source": "a.pdf"}
+    votes = index.vote([1.0, 0.0])
+    assert [vote["code"] for vote in votes] == ["z", "x"]
+
+    # Documents that were never archived, e.g. without text to embed, are left alone
+    index.mark_reviewed("missing", ["x"])
+    assert len(index) == 1
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from lib.output_parsing import extract_json, parse_result
+
+CATEGORIES = {f"01.0{i}": f"Group > Category {i}" for i in range(6)}
+
+
+def result(labels, **extra):
+    return {
+        "validated_classifications": [
+            {"label": label, "confidence_score": 0.5, "Reasoning": "because"} for label in labels
+        ],
+        **extra,
+    }
+
+
+def test_extract_json_ignores_prose_and_fences():
+    text = 'Thought: done\nFinal Answer: ```json\n{"a": {"b": 1}}\n``` trailing {'
+    assert extract_json(text) == {"a": {"b": 1}}
+    assert extract_json("no json here") is None
+    assert extract_json("{'single': 'quotes'}") is None
+
+
+def test_labels_resolve_to_codes():
+    labels = ["01.00", "01.01: Group > Category 1", "Group > Category 2", "01.03", "01.04"]
+    parsed = parse_result(json.dumps(result(labels)), CATEGORIES)
+    assert [c.label for c in parsed.validated_classifications] == [
+        "01.00", "01.01", "01.02", "01.03", "01.04"
+    ]
+
+
+def test_aliases_are_accepted():
+    data = result(["01.00", "01.01", "01.02", "01.03", "01.04"])
+    data["classifications"] = data.pop("validated_classifications")
+    for classification in data["classifications"]:
+        classification["reasoning"] = classification.pop("Reasoning")
+    parsed = parse_result(json.dumps(data), CATEGORIES)
+    assert parsed.validated_classifications[0].reasoning == "because"
+
+
+@pytest.mark.parametrize(
+    "labels",
+    [
+        ["01.00", "01.01", "01.02", "01.03"],
+        ["01.00", "01.00", "01.02", "01.03", "01.04"],
+        ["01.00", "01.01", "01.02", "01.03", "99.99"],
+    ],
+)
+def test_invalid_results_are_rejected(labels):
+    with pytest.raises(ValueError):
+        parse_result(json.dumps(result(labels)), CATEGORIES)
+
+
+def test_scores_must_be_probabilities():
+    data = result(["01.00", "01.01", "01.02", "01.03", "01.04"])
+    data["validated_classifications"][0]["confidence_score"] = 1.5
+    with pytest.raises(ValueError):
+        parse_result(json.dumps(data), CATEGORIES)
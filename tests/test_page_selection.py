@@ -0,0 +1,52 @@
+import numpy as np
+
+from lib.page_selection import (
+    content_ratio,
+    estimate_tokens,
+    score_passages,
+    select_passages,
+)
+
+# Twelve words per page, so each page is one passage of `passage_words=12`
+PROSE = [
+    "Police reported violent crime in the county fell while property crime rose",
+    "Crime statistics show police arrests for property crime increased across every county",
+    "The county police department published crime statistics for burglary and theft reports",
+]
+TABLE = "12 4.5 33 1,200 7 88 19 0.3 41 56 73 2"
+UNRELATED = "Recipes for sourdough bread need flour water salt and a patient baker"
+
+
+def test_content_ratio():
+    assert content_ratio(PROSE[0]) == 1.0
+    assert content_ratio(TABLE) == 0.0
+    assert content_ratio("") == 0.0
+
+
+def test_prose_on_the_document_topic_scores_highest():
+    scores = score_passages(PROSE + [TABLE, UNRELATED])
+    assert scores[3] == 0.0
+    assert min(scores[:3]) > scores[4]
+    assert np.array_equal(score_passages(["", ""]), np.zeros(2))
+
+
+def test_short_documents_are_kept_whole():
+    assert select_passages(PROSE[:2], token_budget=1000, passage_words=12) == PROSE[:2]
+    assert select_passages(["", None]) == []
+
+
+def test_selection_fits_the_budget_in_document_order():
+    pages = [TABLE, PROSE[0], UNRELATED, PROSE[1], TABLE.replace("12", "13"), PROSE[2]]
+    budget = 3 * max(estimate_tokens(page) for page in PROSE)
+    selected = select_passages(pages, token_budget=budget, passage_words=12)
+
+    assert sum(estimate_tokens(passage) for passage in selected) <= budget
+    assert selected == PROSE
+
+
+def test_best_passage_is_cut_to_a_small_budget():
+    pages = [TABLE, PROSE[0], UNRELATED, PROSE[1]]
+    selected = select_passages(pages, token_budget=5, passage_words=12)
+
+    assert len(selected) == 1 and estimate_tokens(selected[0]) <= 5
+    assert any(page.startswith(selected[0] + " ") for page in PROSE)
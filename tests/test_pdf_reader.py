@@ -0,0 +1,44 @@
+import pytest
+
+from bench.synthetic_pdfs import write_pdf
+from lib.pdf_reader import PdfReader, sample_indexes
+
+
+class CountingReader(PdfReader):
+    opened = 0
+
+    def open_pdf(self, file_path):
+        self.opened += 1
+        return super().open_pdf(file_path)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = str(tmp_path / "document.pdf")
+    write_pdf(path, [f"page{i} text" for i in range(10)])
+    return path
+
+
+def test_sample_indexes():
+    assert sample_indexes(10, 3) == [0, 4, 9]
+    assert sample_indexes(3, 5) == [0, 1, 2]
+    assert sample_indexes(10, 1) == [0]
+    assert sample_indexes(0, 3) == []
+
+
+def test_reads_open_the_file_once(pdf):
+    reader = CountingReader()
+    assert [text.split()[0] for text in reader.sample_pages(pdf, 3)] == ["page0", "page4", "page9"]
+    assert reader.read_page(pdf, 99).startswith("page9")
+    assert [text.split()[0] for text in reader.read_from_page(pdf, 8)] == ["page8", "page9"]
+    assert reader.read_from_page(pdf, 99)[0].startswith("page9")
+    assert reader.opened == 4
+
+
+def test_pdf_without_pages(tmp_path):
+    path = str(tmp_path / "empty.pdf")
+    write_pdf(path, [])
+    reader = PdfReader()
+    assert reader.sample_pages(path, 3) == []
+    assert reader.read_page(path, 0) == ""
+    assert reader.read_from_page(path, 0) == []
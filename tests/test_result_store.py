@@ -0,0 +1,61 @@
+from lib.result_store import ResultStore, hamming_distance, shingles, simhash
+
+TEXT = " ".join(f"word{i}" for i in range(80))
+
+
+def test_shingles():
+    assert shingles("One two three four") == ["one two three", "two three four"]
+    assert shingles("one two") == ["one", "two"]
+
+
+def test_simhash_is_stable_and_close_for_edits():
+    assert simhash(TEXT) == simhash(TEXT)
+    assert simhash("") == 0
+    edited = TEXT.replace("word40", "changed")
+    unrelated = " ".join(f"other{i}" for i in range(80))
+    assert hamming_distance(simhash(TEXT), simhash(edited)) < hamming_distance(
+        simhash(TEXT), simhash(unrelated)
+    )
+
+
+def test_exact_and_near_matches(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"), fingerprint="a")
+    key = store.store(TEXT, "fast", "result", "a.pdf")
+
+    exact = store.lookup(TEXT, "fast")
+    assert (exact["match"], exact["key"], exact["result"]) == ("exact", key, "result")
+    assert store.lookup(TEXT, "full") is None
+
+    near = store.lookup(TEXT.replace("word40", "changed"), "fast", max_distance=64)
+    assert near["match"] == "near" and near["key"] == key
+    assert store.stats() == {"entries": 1, "documents": 1}
+
+
+def test_short_texts_are_not_stored(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    store.store("", "fast", "result")
+    assert store.lookup("\x0c", "fast") is None
+    assert store.stats()["entries"] == 0
+
+
+def test_other_fingerprints_do_not_match(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    ResultStore(path, fingerprint="a").store(TEXT, "fast", "result")
+    other = ResultStore(path, fingerprint="b")
+    assert other.lookup(TEXT, "fast", max_distance=64) is None
+
+
+def test_update(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    key = store.store(TEXT, "fast", "result")
+    assert store.update(key, "fast", "reviewed")
+    assert store.lookup(TEXT, "fast")["result"] == "reviewed"
+    assert not store.update("missing", "fast", "reviewed")
+
+
+def test_insert_under_a_known_key(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    store.insert(store.key(TEXT), "fast", simhash(TEXT), "reviewed", "a.pdf")
+    match = store.lookup(TEXT, "fast")
+    assert (match["match"], match["result"], match["source"]) == ("exact", "reviewed", "a.pdf")
+    assert store.lookup(TEXT.replace("word40", "changed"), "fast", max_distance=64)["match"] == "near"
@@ -0,0 +1,67 @@
+import pytest
+
+from lib.review_queue import ReviewQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ReviewQueue(str(tmp_path / "reviews.sqlite"), max_attempts=2)
+
+
+def test_claim_complete(queue):
+    review_id = queue.enqueue("key", "fast", "result", ["flag"], "hierarchy", "a.pdf")
+    review = queue.claim("reviewer")
+    assert review["id"] == review_id and review["flags"] == ["flag"]
+    assert queue.claim("other") is None
+
+    completed = queue.complete(review_id, "corrected")
+    assert (completed["status"], completed["correction"]) == ("done", "corrected")
+    assert queue.stats()["done"] == 1
+
+
+def test_simhash_round_trips(queue):
+    fingerprint = (1 << 64) - 1
+    review_id = queue.enqueue("key", "fast", "result", [], "", fingerprint=fingerprint)
+    assert queue.get(review_id)["simhash"] == fingerprint
+    assert queue.get(queue.enqueue("other", "fast", "result", [], ""))["simhash"] is None
+
+
+def test_enqueue_replaces_pending_but_not_done(queue):
+    review_id = queue.enqueue("key", "fast", "first", [], "")
+    assert queue.enqueue("key", "fast", "second", [], "") == review_id
+    assert queue.get(review_id)["result"] == "second"
+
+    queue.complete(review_id, "reviewed")
+    queue.enqueue("key", "fast", "third", [], "")
+    assert queue.get(review_id)["result"] == "second"
+
+
+def test_expired_leases_are_claimed_again(queue):
+    queue.enqueue("key", "fast", "result", [], "")
+    assert queue.claim("crashed", lease=-1) is not None
+    assert queue.claim("next")["claimed_by"] == "next"
+
+
+def test_expired_last_attempts_fail(queue):
+    review_id = queue.enqueue("key", "fast", "result", [], "")
+    queue.claim("crashed", lease=-1)
+    queue.claim("crashed again", lease=-1)
+    assert queue.stats()["failed"] == 1
+    assert queue.claim("next") is None
+    review = queue.get(review_id)
+    assert (review["status"], review["claimed_by"]) == ("failed", None)
+
+
+def test_failed_reviews_go_last_then_fail(queue):
+    first = queue.enqueue("first", "fast", "result", [], "")
+    second = queue.enqueue("second", "fast", "result", [], "")
+
+    queue.release(queue.claim("agent")["id"], "boom")
+    assert queue.claim("agent")["id"] == second
+    queue.complete(second, "reviewed")
+
+    queue.release(queue.claim("agent")["id"], "boom again")
+    assert queue.claim("agent") is None
+    assert queue.get(first)["status"] == "failed"
+    assert queue.get(first)["error"] == "boom again"
+    assert queue.stats()["failed"] == 1
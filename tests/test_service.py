@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+
+import service
+from service import ClassificationService, create_app
+
+
+@pytest.fixture
+def documents(tmp_path, monkeypatch):
+    # No hierarchy, category index or crews to warm up
+    monkeypatch.setattr(service, "get_categories", lambda path: {})
+    monkeypatch.setattr(service, "get_similarity_engine", lambda: None)
+    monkeypatch.setattr(service, "get_crew", lambda mode: None)
+    monkeypatch.setattr(service, "UPLOAD_DIR", str(tmp_path / "uploads"))
+
+    root = tmp_path / "documents"
+    root.mkdir()
+    (root / "report.pdf").write_bytes(b"%PDF")
+    (tmp_path / "outside.pdf").write_bytes(b"%PDF")
+    return root
+
+
+def run(scenario, document_root, **kwargs):
+    async def main():
+        app = create_app(document_root=str(document_root), **kwargs)
+        async with TestClient(TestServer(app)) as client:
+            await scenario(client)
+
+    asyncio.run(main())
+
+
+def uploads(documents):
+    directory = documents.parent / "uploads"
+    return os.listdir(directory) if directory.exists() else []
+
+
+async def wait_for(client, job_id, status):
+    for _ in range(200):
+        response = await client.get(f"/jobs/{job_id}")
+        if (await response.json())["status"] == status:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never became {status}")
+
+
+def test_events_stream_until_the_job_ends(documents, monkeypatch):
+    monkeypatch.setattr(ClassificationService, "classify", lambda self, job: f"labels of {job.source}")
+
+    async def scenario(client):
+        response = await client.post("/jobs", json={"path": "report.pdf"})
+        assert response.status == 202
+        job = await response.json()
+
+        events = await client.get(f"/jobs/{job['id']}/events")
+        lines = [json.loads(line) for line in (await events.text()).splitlines()]
+        assert [event["status"] for event in lines] == ["queued", "running", "succeeded"]
+        assert lines[-1]["result"] == "labels of report.pdf"
+
+    run(scenario, documents)
+
+
+def test_full_queue_is_refused(documents, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(ClassificationService, "classify", lambda self, job: release.wait(5) and "done")
+
+    async def scenario(client):
+        running = await (await client.post("/jobs", json={"path": "report.pdf"})).json()
+        await wait_for(client, running["id"], "running")
+        assert (await client.post("/jobs", json={"path": "report.pdf"})).status == 202
+
+        refused = await client.post("/jobs", json={"path": "report.pdf"})
+        assert refused.status == 429 and refused.headers["Retry-After"] == "5"
+
+        form = FormData()
+        form.add_field("file", b"%PDF", filename="upload.pdf")
+        assert (await client.post("/jobs", data=form)).status == 429
+        assert uploads(documents) == []
+        release.set()
+
+    run(scenario, documents, workers=1, queue_size=1)
+
+
+def test_paths_outside_the_document_root_are_forbidden(documents):
+    async def scenario(client):
+        assert (await client.post("/jobs", json={"path": str(documents.parent / "outside.pdf")})).status == 403
+        assert (await client.post("/jobs", json={"path": "../outside.pdf"})).status == 403
+        assert (await client.post("/jobs", json={"path": "missing.pdf"})).status == 400
+
+    run(scenario, documents)
+
+
+def test_bad_requests(documents):
+    async def scenario(client):
+        assert (await client.post("/jobs", data="{not json", headers={"Content-Type": "application/json"})).status == 400
+        assert (await client.post("/jobs", json=["report.pdf"])).status == 400
+        assert (await client.post("/jobs", json={"path": "report.pdf", "mode": "slow"})).status == 400
+        assert (await client.get("/jobs/unknown")).status == 404
+
+    run(scenario, documents)
+
+
+def test_uploads_are_removed(documents, monkeypatch):
+    seen = []
+
+    def classify(self, job):
+        seen.append(os.path.exists(job.path))
+        return "done"
+
+    monkeypatch.setattr(ClassificationService, "classify", classify)
+
+    async def scenario(client):
+        form = FormData()
+        form.add_field("file", b"%PDF", filename="upload.pdf")
+        response = await client.post("/jobs", data=form)
+        assert response.status == 202
+        job = await response.json()
+        assert job["source"] == "upload.pdf"
+        await wait_for(client, job["id"], "succeeded")
+        assert seen == [True] and uploads(documents) == []
+
+        # A mode rejected after the file was written
+        form = FormData()
+        form.add_field("file", b"%PDF", filename="upload.pdf")
+        form.add_field("mode", "slow")
+        assert (await client.post("/jobs", data=form)).status == 400
+        assert uploads(documents) == []
+
+    run(scenario, documents)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from lib import similarity
+from lib.embedding_store import EmbeddingStore
+from lib.similarity import SimilarityEngine, normalize
+
+CODES = ["a", "b", "c", "d"]
+EMBEDDINGS = [[1.0, 0.0], [0.8, 0.6], [0.0, 1.0], [-1.0, 0.0]]
+
+
+@pytest.fixture
+def engine():
+    return SimilarityEngine(CODES, [f"Label {code}" for code in CODES], EMBEDDINGS)
+
+
+def test_top_k_is_ranked_best_first(engine):
+    ranked = engine.top_k([[1.0, 0.1], [0.0, 2.0]], k=3)
+    assert [result["code"] for result in ranked[0]] == ["a", "b", "c"]
+    assert [result["code"] for result in ranked[1]] == ["c", "b", "a"]
+    assert ranked[0][0] == {"code": "a", "label": "Label a", "score": round(1 / np.hypot(1, 0.1), 4)}
+
+
+def test_top_k_matches_a_full_sort(engine):
+    vectors = np.random.default_rng(0).normal(size=(20, 2))
+    full = np.argsort(-engine.scores(vectors), axis=1, kind="stable")
+    for row, ranked in enumerate(engine.top_k(vectors, k=4)):
+        assert [result["code"] for result in ranked] == [CODES[index] for index in full[row]]
+
+
+def test_top_k_bounds(engine):
+    assert len(engine.top_k([1.0, 0.0], k=10)[0]) == 4
+    assert engine.top_k([1.0, 0.0], k=0) == [[]]
+
+
+def test_subset_scores_follow_the_given_order(engine):
+    assert np.allclose(engine.subset_scores([2.0, 0.0], ["d", "a", "b"]), [-1.0, 1.0, 0.8])
+    with pytest.raises(KeyError):
+        engine.subset_scores([1.0, 0.0], ["missing"])
+
+
+def test_zero_rows_are_left_alone():
+    assert np.array_equal(normalize(np.zeros((1, 3))), np.zeros((1, 3)))
+    with pytest.raises(ValueError):
+        SimilarityEngine(["a"], [], [[1.0]])
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_store_engine_scores_in_blocks(tmp_path, engine, dtype, monkeypatch):
+    monkeypatch.setattr(similarity, "SCORE_BLOCK_ROWS", 3)
+    store = EmbeddingStore.build(str(tmp_path / "store"), CODES, EMBEDDINGS, dtype=dtype)
+    mapped = SimilarityEngine.from_store(store, {code: f"Label {code}" for code in CODES})
+    vectors = [[1.0, 0.1], [0.3, -2.0]]
+    assert np.allclose(mapped.scores(vectors), engine.scores(vectors), atol=0.01)
+    assert [r["code"] for r in mapped.top_k(vectors[0])[0]] == [r["code"] for r in engine.top_k(vectors[0])[0]]
+    assert np.allclose(mapped.subset_scores([0.0, 1.0], ["c", "a"]), [1.0, 0.0], atol=0.01)
@@ -0,0 +1,52 @@
+import os
+
+from lib.text_cache import TextCache
+
+
+def test_hits_after_first_extraction(tmp_path):
+    document = tmp_path / "a.pdf"
+    document.write_bytes(b"content")
+    cache = TextCache(str(tmp_path / "cache.sqlite"))
+    calls = []
+
+    def extract():
+        calls.append(1)
+        return ["page one", "page two"]
+
+    assert cache.get_or_extract(str(document), "0:2:1", "v1", extract) == ["page one", "page two"]
+    assert cache.get_or_extract(str(document), "0:2:1", "v1", extract) == ["page one", "page two"]
+    assert len(calls) == 1
+    assert cache.stats()["session"] == {"hits": 1, "misses": 1}
+
+
+def test_copies_hit_and_new_versions_miss(tmp_path):
+    cache = TextCache(str(tmp_path / "cache.sqlite"))
+    first, copy = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"content")
+    copy.write_bytes(b"content")
+
+    cache.get_or_extract(str(first), "all", "v1", lambda: ["text"])
+    assert cache.get_or_extract(str(copy), "all", "v1", lambda: ["other"]) == ["text"]
+    assert cache.get_or_extract(str(copy), "all", "v2", lambda: ["other"]) == ["other"]
+
+
+def test_edited_files_are_rehashed(tmp_path):
+    cache = TextCache(str(tmp_path / "cache.sqlite"))
+    document = tmp_path / "a.pdf"
+    document.write_bytes(b"content")
+    before = cache.digest(str(document))
+    document.write_bytes(b"edited content")
+    os.utime(document, ns=(0, 0))
+    assert cache.digest(str(document)) != before
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TextCache(str(tmp_path / "cache.sqlite"), max_bytes=40)
+    document = tmp_path / "a.pdf"
+    document.write_bytes(b"content")
+    for page in range(4):
+        cache.get_or_extract(str(document), str(page), "v1", lambda: ["x" * 10])
+
+    stats = cache.stats()
+    assert stats["total"]["evictions"] > 0
+    assert cache.get_or_extract(str(document), "0", "v1", lambda: ["evicted"]) == ["evicted"]
@@ -0,0 +1,33 @@
+from lib.text_normalization import clean_pages, normalize_page, prepare_document
+
+
+def test_control_characters_are_removed():
+    assert normalize_page("zero\u200bwidth\x07 \ufeffmark") == ["zerowidth mark"]
+
+
+def test_whitespace_is_collapsed_and_empty_lines_dropped():
+    assert normalize_page("  two\t\tspaces  \n\n  \nnext   line ") == ["two spaces", "next line"]
+
+
+def test_compatibility_characters_are_folded():
+    assert normalize_page("\ufb01nance \u21161") == ["finance No1"]
+
+
+def test_hyphenated_words_are_joined():
+    assert normalize_page("classi-\nfication") == ["classification"]
+
+
+def test_none_is_an_empty_page():
+    assert normalize_page(None) == []
+
+
+def test_page_numbers_and_repeated_headers_are_removed():
+    pages = [f"Annual Report\nBody of page {i}\nPage {i} of 3" for i in range(1, 4)]
+    assert clean_pages(pages) == ["Body of page 1", "Body of page 2", "Body of page 3"]
+
+
+def test_document_identity_ignores_noise():
+    clean = prepare_document(["Terms of service"])
+    noisy = prepare_document(["  Terms\u200b of   service \n 1 "])
+    assert clean["text"] == noisy["text"] == "Terms of service"
+    assert clean["document_id"] == noisy["document_id"]
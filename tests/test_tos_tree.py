@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from lib.parse_xml import get_complete_hierarchy
+from lib.tos_tree import compile_tree, load_tree
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<tos><tosdata><itemgroups>
+  <itemgroup><iigroup>00</iigroup><iigroupname>Administration</iigroupname><itemgroups>
+    <itemgroup><iigroup>00.00</iigroup><iigroupname>Elections</iigroupname><itemgroups>
+      <itemgroup><iigroup>00.00.00</iigroup><iigroupname>Municipal elections</iigroupname></itemgroup>
+      <itemgroup><iigroup>00.00.01</iigroup><iigroupname>EU elections</iigroupname></itemgroup>
+    </itemgroups></itemgroup>
+    <itemgroup><iigroup>00.01</iigroup><iigroupname>Municipal elections</iigroupname></itemgroup>
+  </itemgroups></itemgroup>
+  <itemgroup><iigroup>01</iigroup><iigroupname>Finance</iigroupname></itemgroup>
+</itemgroups></tosdata></tos>
+"""
+
+
+@pytest.fixture
+def xml_file(tmp_path):
+    path = tmp_path / "tos.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+
+def test_compiled_tree_structure(xml_file):
+    tree = compile_tree(xml_file)
+    assert list(tree.nodes) == ["00", "00.00", "00.00.00", "00.00.01", "00.01", "01"]
+    assert tree["00.00.01"].path == "Administration > Elections > EU elections"
+    assert tree["00.00.01"].depth == 2
+    assert tree.parents("00.00.01") == ["00", "00.00"]
+    assert tree.subtree("00.00") == ["00.00", "00.00.00", "00.00.01"]
+    assert tree.codes_for_name("municipal ELECTIONS") == ("00.00.00", "00.01")
+    assert tree.is_leaf("01") and not tree.is_leaf("00")
+
+
+def test_leaves_match_the_reference_parser(xml_file):
+    with open(xml_file, encoding="utf-8") as file:
+        assert compile_tree(xml_file).leaves() == get_complete_hierarchy(file.read())
+
+
+def test_load_tree_reuses_the_compiled_artifact(xml_file, tmp_path):
+    cache_dir = str(tmp_path / "tos")
+    tree = load_tree(xml_file, cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    assert load_tree(xml_file, cache_dir) is tree
+
+    with open(xml_file, "a", encoding="utf-8") as file:
+        file.write("<!-- edited -->")
+    assert load_tree(xml_file, cache_dir).leaves() == tree.leaves()
@@ -0,0 +1,133 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import training
+from training import TrainingCheckpoint, chunk_records, merge_evaluations, training_feedback
+
+CATEGORIES = {f"01.0{i}": f"Group > Category {i}" for i in range(7)}
+
+
+def output(labels, **extra):
+    return json.dumps(
+        {
+            "validated_classifications": [
+                {"label": label, "confidence_score": 0.5, "Reasoning": "because"} for label in labels
+            ],
+            **extra,
+        }
+    )
+
+
+def record(document_id, iteration, agent="classifier"):
+    return {
+        "id": document_id,
+        "iteration": iteration,
+        "agent": agent,
+        "correct": False,
+        "initial_output": "initial",
+        "human_feedback": "feedback",
+        "improved_output": "improved",
+    }
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    checkpoint = TrainingCheckpoint(str(tmp_path / "run"))
+    checkpoint.add_unit(record("a", 0))
+    with open(tmp_path / "run" / "units.jsonl", "a", encoding="utf-8") as file:
+        file.write(json.dumps(record("a", 1))[:20])
+
+    assert [(unit["id"], unit["iteration"]) for unit in checkpoint.units()] == [("a", 0)]
+    assert TrainingCheckpoint(str(tmp_path / "other")).units() == []
+
+
+def test_resume_skips_completed_units(tmp_path, monkeypatch):
+    TrainingCheckpoint(str(tmp_path / "run")).add_unit(record("a", 0))
+    calls = []
+
+    def train_unit(document, iteration, *args):
+        calls.append((document["id"], iteration))
+        return record(document["id"], iteration)
+
+    monkeypatch.setattr(training, "TRAINING_DIR", str(tmp_path))
+    monkeypatch.setattr(training.metrics, "write_prometheus", lambda: None)
+    monkeypatch.setattr(training, "train_unit", train_unit)
+    monkeypatch.setattr(training, "load_batch", lambda path: [{"id": "a"}, {"id": "b"}])
+    monkeypatch.setattr(training, "get_categories", lambda path: CATEGORIES)
+    monkeypatch.setattr(
+        training, "get_crew", lambda mode, llm_cache: SimpleNamespace(agents=[SimpleNamespace(role="classifier")])
+    )
+    monkeypatch.setattr(
+        training,
+        "evaluate_chunk",
+        lambda agent, records: {"suggestions": ["Be precise"], "quality": 8.0, "final_summary": "ok"},
+    )
+
+    summary = training.train_corpus(
+        "corpus.jsonl", iterations=2, concurrency=1, filename=str(tmp_path / "trained.pkl"), run="run"
+    )
+    assert sorted(calls) == [("a", 1), ("b", 0), ("b", 1)]
+    assert (summary["units"], summary["resumed"], summary["error"]) == (3, 1, 0)
+    assert summary["agents"] == ["classifier"]
+
+    calls.clear()
+    summary = training.train_corpus(
+        "corpus.jsonl", iterations=2, concurrency=1, filename=str(tmp_path / "trained.pkl"), run="run"
+    )
+    assert calls == [] and summary["resumed"] == 4
+    assert len(TrainingCheckpoint(str(tmp_path / "run")).evaluations()) == 1
+
+
+def test_chunk_keys_are_stable():
+    records = [record(document_id, iteration) for document_id in "abc" for iteration in range(2)]
+    records.append(record("a", 0, agent="reviewer"))
+
+    chunks = chunk_records(records, size=4)
+    assert chunk_records(reversed(records), size=4).keys() == chunks.keys()
+    assert sorted(len(chunk) for chunk in chunks.values()) == [1, 2, 4]
+
+    first = next(chunk for chunk in chunks.values() if len(chunk) == 4)
+    assert [(unit["id"], unit["iteration"]) for unit in first] == [("a", 0), ("a", 1), ("b", 0), ("b", 1)]
+
+
+def test_merge_evaluations():
+    merged = merge_evaluations(
+        [
+            {"suggestions": ["Cite the page.", "Rank by  evidence"], "quality": 6.0, "units": 1, "final_summary": "one"},
+            {"suggestions": ["rank by evidence"], "quality": 9.0, "units": 2, "final_summary": "two"},
+        ]
+    )
+    assert merged["suggestions"] == ["Rank by  evidence", "Cite the page."]
+    assert merged["quality"] == pytest.approx(8.0)
+    assert merged["final_summary"] == "one\ntwo"
+
+
+def test_feedback_on_correct_labels():
+    labels = ["01.00", "01.01", "01.02", "01.03", "01.04"]
+    assert training_feedback(output(labels), ["01.00", "01.01"], CATEGORIES) == (
+        "The classification is correct.",
+        True,
+    )
+    # The expected labels may come in any order within the first ranks
+    assert training_feedback(output(labels), ["01.01", "01.00"], CATEGORIES)[1]
+
+
+def test_feedback_on_wrong_labels():
+    labels = ["01.00", "01.01", "01.02", "01.03", "01.04"]
+    feedback, correct = training_feedback(output(labels), ["01.05", "01.01"], CATEGORIES)
+    assert not correct
+    assert "01.05 (Group > Category 5) is missing" in feedback
+    assert "01.00 (Group > Category 0) must rank below" in feedback
+
+    feedback, correct = training_feedback("no json", ["01.00"], CATEGORIES)
+    assert not correct and feedback.startswith("The output is not a valid classification")
+
+
+def test_feedback_without_expected_labels_uses_flags():
+    labels = ["01.00", "01.01", "01.02", "01.03", "01.04"]
+    assert training_feedback(output(labels), [], CATEGORIES)[1]
+    feedback, correct = training_feedback(
+        output(labels, confidence={"flagged": True, "flags": ["01.00: low probability"]}), [], CATEGORIES
+    )
+    assert not correct and "- 01.00: low probability" in feedback
@@ -1,17 +1,12 @@
-from chromadb import Client
-import chromadb.utils.embedding_functions as embedding_functions
+import json
 from crewai_tools import tool
-from lib.parse_xml import get_categories
-
-# Initialize ChromaDB client
-client = Client()
-collection = client.get_or_create_collection("document_embeddings")
-vectorizer_model = "nomic-embed-text:latest"
-
-# Initialize Ollama embedding function
-ollama_ef = embedding_functions.OllamaEmbeddingFunction(
-    model_name=vectorizer_model,
-    url="http://localhost:11434/v1",
+from lib.metrics import metrics
+from lib.category_search import (
+    classify_hierarchical,
+    get_category_index,
+    rank_categories,
+    similar_document_labels,
+    vectorize_document,
 )
 
 
@@ -26,10 +21,9 @@ def document_vectorizer(text: str) -> str:
     Returns:
     str: A message indicating the successful vectorization and storage of the embedding.
     """
-    # Store the embedding in ChromaDB collection
-    embeddings = ollama_ef(text)
-    collection.add(documents=[text], ids=[text], embeddings=[embeddings])
-    return "Document vectorized and added to ChromaDB."
+    with metrics.timer("tool_call_seconds", tool="document_vectorizer"):
+        result = vectorize_document([text])
+    return f"Document {result['document_id']} vectorized as {result['chunks']} chunks and added to ChromaDB."
 
 
 @tool
@@ -40,21 +34,56 @@ def categories_vectorizer():
     Returns:
         str: A message indicating the successful vectorization and storage of the category embeddings.
     """
-    # Get the categories from the XML file (or predefined dictionary)
-    categories = get_categories("../TOS/english_tos.xml")
+    with metrics.timer("tool_call_seconds", tool="categories_vectorizer"):
+        # Reuse the persistent index; categories are only embedded when the XML or model changed
+        category_collection = get_category_index()
+
+    return f"{category_collection.count()} category embeddings available in ChromaDB collection '{category_collection.name}'."
+
+
+@tool
+def category_similarity(text: str) -> str:
+    """
+    Compute exact cosine similarity between the document and every category in the hierarchy.
+
+    Args:
+    text (str): The document text to classify.
+
+    Returns:
+    str: JSON list of the top 5 categories, each with its code, label and similarity score, best first.
+    """
+    with metrics.timer("tool_call_seconds", tool="category_similarity"):
+        ranked = rank_categories([text], k=5)[0]
+    return json.dumps(ranked, ensure_ascii=False)
+
+
+@tool
+def hierarchical_category_search(text: str) -> str:
+    """
+    Find the best categories by descending the hierarchy level by level, from top-level groups down to leaves.
 
-    # Extract the descriptions for vectorization
-    category_descriptions = list(
-        categories.values()
-    )  # Extract the category text descriptions
+    Args:
+    text (str): The document text to classify.
 
-    # Get embeddings for the category descriptions
-    embeddings = ollama_ef(category_descriptions)
+    Returns:
+    str: JSON with the top 5 leaf categories (code, label, score) and, for each, the path of scored parent groups that led to it.
+    """
+    with metrics.timer("tool_call_seconds", tool="hierarchical_category_search"):
+        result = classify_hierarchical([text], k=5)[0]
+    return json.dumps(result, ensure_ascii=False)
 
-    collection.add(
-        documents=category_descriptions,
-        ids=list(categories.keys()),
-        embeddings=embeddings,
-    )
 
-    return "Categories vectorized and added to ChromaDB."
+@tool
+def similar_documents(text: str) -> str:
+    """
+    Find the documents most similar to this one among those already classified, and the labels they vote for.
+
+    Args:
+    text (str): The document text to classify.
+
+    Returns:
+    str: JSON list of up to 10 labels (code, label, share of the votes, number of neighbours carrying it), best first. Empty when no document was classified yet.
+    """
+    with metrics.timer("tool_call_seconds", tool="similar_documents"):
+        votes = similar_document_labels([text], k=10)[0][:10]
+    return json.dumps(votes, ensure_ascii=False)
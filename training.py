@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+"""
+Train the classification agent on a corpus, in parallel and resumably.
+
+    python training.py ./corpus.jsonl --iterations 3 --concurrency 4
+    python training.py ./corpus.jsonl --iterations 5     Resume, adding two iterations per document
+
+Each (document, iteration) unit runs a private copy of the crew, compares the
+classification with the document's expected labels from the manifest ("labels"),
+turns the difference into feedback and asks the agent for an improved output.
+Finished units are appended to a checkpoint under ./cache/training/<run>/, so an
+interrupted run resumes where it stopped. Units are then evaluated in chunks and the
+suggestions merged into the trained file, as `crew.train` does for a single document.
+"""
+import argparse
+import json
+import os
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from crew import PIPELINE_MODES, get_crew
+from lib.category_search import document_vectors
+from lib.chunking import content_id
+from lib.metrics import metrics
+from lib.output_parsing import describe_error, parse_result
+from lib.page_selection import TOKEN_BUDGET
+from lib.parse_xml import get_categories
+from lib.pdf_reader import PdfReader
+from lib.text_cache import TextCache
+from lib.text_normalization import prepare_document
+from main import build_inputs, crew_result, kickoff, load_batch, read_document
+
+TRAINING_DIR = "./cache/training"
+TRAINED_FILE = "trained_crew.pkl"
+TRAINED_TASK = "Document Classification"
+
+# Units evaluated together; the evaluation prompt holds every unit of a chunk
+EVALUATION_CHUNK = 20
+# Suggestions kept per agent, the ones given by the most chunks first. They are all
+# added to the agent's prompts.
+MAX_SUGGESTIONS = 10
+
+
+class TrainingCheckpoint:
+    """
+    Append-only JSONL files recording the finished units and chunk evaluations of a run.
+    A line cut short by a crash is ignored and its unit runs again.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Args:
+            directory (str): Directory of the run, created on first use
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _read(self, name: str) -> List[Dict]:
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return []
+        records = []
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def _append(self, name: str, record: Dict):
+        with self._lock, open(os.path.join(self.directory, name), "a", encoding="utf-8") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def units(self) -> List[Dict]:
+        return self._read("units.jsonl")
+
+    def add_unit(self, record: Dict):
+        self._append("units.jsonl", record)
+
+    def evaluations(self) -> Dict[str, Dict]:
+        return {record["chunk"]: record for record in self._read("evaluations.jsonl")}
+
+    def add_evaluation(self, record: Dict):
+        self._append("evaluations.jsonl", record)
+
+
+def training_feedback(
+    output: str,
+    expected: List[str],
+    classifications: Dict[str, str],
+) -> Tuple[str, bool]:
+    """
+    Write the feedback a reviewer would give on a classification, from the expected labels.
+
+    Without expected labels, the confidence flags of the output are used instead.
+
+    Args:
+        output (str): Output of the classification task
+        expected (List[str]): Expected category codes, best first; may be fewer than 5
+        classifications (Dict[str, str]): Parsed hierarchy
+
+    Returns:
+        Tuple[str, bool]: The feedback, and whether the output needs no change
+    """
+    try:
+        result = parse_result(output, classifications)
+    except ValueError as error:
+        return f"The output is not a valid classification:\n{describe_error(error)}", False
+
+    codes = [classification.label for classification in result.validated_classifications]
+    if not expected:
+        flags = (result.confidence or {}).get("flags", [])
+        if not flags:
+            return "The classification is correct.", True
+        return "Check these labels, their confidence is uncertain:\n" + "\n".join(
+            f"- {flag}" for flag in flags
+        ), False
+
+    missing = [code for code in expected if code not in codes]
+    # Expected labels must come first; the remaining ranks are free
+    misplaced = [code for code in codes[: len(expected)] if code not in expected]
+    if not missing and not misplaced:
+        return "The classification is correct.", True
+
+    lines = [
+        f"- {code} ({classifications.get(code, 'unknown category')}) is missing and must be included."
+        for code in missing
+    ]
+    lines += [
+        f"- {code} ({classifications.get(code, 'unknown category')}) must rank below the expected labels."
+        for code in misplaced
+    ]
+    return "The classification is wrong:\n" + "\n".join(lines), False
+
+
+def improve_output(
+    task,
+    output: str,
+    feedback: str,
+    classifications: Dict[str, str],
+    inputs: Dict,
+) -> str:
+    """
+    Ask the task's agent to correct its output according to the feedback.
+
+    Args:
+        task (Task): Classification task whose agent answers
+        output (str): Initial output
+        feedback (str): Feedback on the output
+        classifications (Dict[str, str]): Parsed hierarchy
+        inputs (Dict): Crew inputs of the run. The task of the shared crew was never
+            interpolated, so its expected output is formatted with them as crewai does
+            at kickoff, which also unescapes its doubled braces
+
+    Returns:
+        str: The improved output, normalized when it is a valid classification
+    """
+    improved = task.agent.llm.call(
+        [
+            {
+                "role": "system",
+                "content": f"You are the {task.agent.role}. Answer with the corrected JSON object only.",
+            },
+            {
+                "role": "user",
+                "content": f"""Your classification below was reviewed.
+
+Feedback:
+{feedback}
+
+Required format:
+{task.expected_output.format(**inputs)}
+
+Classification to improve:
+{output}""",
+            },
+        ]
+    )
+    try:
+        result = parse_result(improved, classifications)
+    except ValueError:
+        return improved
+    return json.dumps(result.model_dump(by_alias=True, exclude_none=True), ensure_ascii=False)
+
+
+def train_unit(
+    document: Dict,
+    iteration: int,
+    classifications: Dict[str, str],
+    mode: str = "full",
+    token_budget: int = TOKEN_BUDGET,
+) -> Dict:
+    """
+    Run one training iteration on one document.
+
+    Extraction and embeddings come from the text cache and the document store, so
+    only the first iteration of a document computes them.
+
+    Args:
+        document (Dict): Batch entry, with the expected "labels" when known
+        iteration (int): Iteration number
+        classifications (Dict[str, str]): Parsed hierarchy
+        mode (str): Pipeline mode, "full" or "fast"
+        token_budget (int): Maximum estimated tokens of document text
+
+    Returns:
+        Dict: Training record with the initial output, feedback and improved output
+    """
+    pdf_content = read_document(PdfReader(cache=TextCache()), document["path"], token_budget)
+    text = prepare_document(pdf_content)["text"]
+    # Image-only or empty PDFs have no text to embed: the crew runs without calibration,
+    # as it does when the embedding server fails
+    vector = None
+    if text.strip():
+        try:
+            vector = document_vectors([text])[0]
+        except Exception:
+            metrics.inc("document_embedding_failures_total", mode=f"train-{mode}")
+    inputs_dict = build_inputs(pdf_content, classifications, mode, vector=vector)
+    # Iterations of a document must query the model, not replay its cached answer
+    crew = get_crew(mode, llm_cache=False)
+    task = next(task for task in crew.tasks if task.name == TRAINED_TASK)
+
+    output = kickoff(crew, inputs_dict, f"train-{mode}", classifications, vector)
+    initial = crew_result(output, TRAINED_TASK)
+    feedback, correct = training_feedback(initial, document.get("labels", []), classifications)
+    improved = initial if correct else improve_output(
+        task, initial, feedback, classifications, inputs_dict
+    )
+    metrics.inc("training_units_total", mode=mode, correct=str(correct).lower())
+
+    return {
+        "id": document["id"],
+        "iteration": iteration,
+        "agent": task.agent.role,
+        "correct": correct,
+        "initial_output": initial,
+        "human_feedback": feedback,
+        "improved_output": improved,
+    }
+
+
+def chunk_records(records: Iterable[Dict], size: int = EVALUATION_CHUNK) -> Dict[str, List[Dict]]:
+    """
+    Split the training records of each agent into evaluation chunks.
+
+    Records are sorted by document and iteration, and each chunk is keyed by its agent
+    and units, so a resumed run finds the chunks it already evaluated.
+
+    Returns:
+        Dict[str, List[Dict]]: Records of each chunk, by chunk key
+    """
+    by_agent = defaultdict(list)
+    for record in records:
+        by_agent[record["agent"]].append(record)
+
+    chunks = {}
+    for agent, agent_records in by_agent.items():
+        agent_records.sort(key=lambda record: (record["id"], record["iteration"]))
+        for start in range(0, len(agent_records), size):
+            chunk = agent_records[start : start + size]
+            units = [[record["id"], record["iteration"]] for record in chunk]
+            chunks[content_id(json.dumps([agent, units]), length=16)] = chunk
+    return chunks
+
+
+def evaluate_chunk(agent, records: List[Dict]) -> Dict:
+    """
+    Turn a chunk of training records into suggestions with crewai's training evaluator.
+
+    Returns:
+        Dict: {"suggestions", "quality", "final_summary"}
+    """
+    from crewai.utilities.evaluators.task_evaluator import TaskEvaluator
+
+    training_data = {
+        agent.role: {
+            index: {
+                "initial_output": record["initial_output"],
+                "human_feedback": record["human_feedback"],
+                "improved_output": record["improved_output"],
+            }
+            for index, record in enumerate(records)
+        }
+    }
+    with metrics.timer("training_evaluation_seconds"):
+        result = TaskEvaluator(agent).evaluate_training_data(
+            training_data=training_data, agent_id=agent.role
+        )
+    return result.model_dump()
+
+
+def merge_evaluations(evaluations: List[Dict]) -> Dict:
+    """
+    Merge the evaluations of an agent's chunks into one trained entry.
+
+    Suggestions given by the most chunks come first and at most MAX_SUGGESTIONS are
+    kept; quality is averaged over the units.
+
+    Returns:
+        Dict: {"suggestions", "quality", "final_summary"}, the format crewai's agents read
+    """
+    counts = Counter()
+    first_seen = {}
+    for evaluation in evaluations:
+        for suggestion in evaluation["suggestions"]:
+            key = " ".join(suggestion.lower().split())
+            counts[key] += 1
+            first_seen.setdefault(key, suggestion)
+
+    units = sum(evaluation["units"] for evaluation in evaluations) or 1
+    return {
+        "suggestions": [first_seen[key] for key, _ in counts.most_common(MAX_SUGGESTIONS)],
+        "quality": sum(evaluation["quality"] * evaluation["units"] for evaluation in evaluations) / units,
+        "final_summary": "\n".join(evaluation["final_summary"] for evaluation in evaluations),
+    }
+
+
+def train_corpus(
+    input_path: str,
+    iterations: int = 3,
+    concurrency: int = 4,
+    mode: str = "full",
+    token_budget: int = TOKEN_BUDGET,
+    filename: str = TRAINED_FILE,
+    run: Optional[str] = None,
+) -> Dict:
+    """
+    Train on every document of a corpus, resuming a previous run of the same corpus.
+
+    Args:
+        input_path (str): Directory containing PDFs, or path to a .jsonl manifest
+        iterations (int): Iterations per document
+        concurrency (int): Units and evaluations in flight
+        mode (str): Pipeline mode, "full" or "fast"
+        token_budget (int): Maximum estimated tokens of document text per document
+        filename (str): Trained file receiving the merged suggestions of each agent
+        run (Optional[str]): Name of the checkpoint, derived from the corpus and mode by default
+
+    Returns:
+        Dict: Units run, resumed and failed, units needing no change, failed chunk
+        evaluations and the agents trained
+    """
+    from crewai.utilities.training_handler import CrewTrainingHandler
+
+    run = run or content_id(f"{os.path.abspath(input_path)}:{mode}", length=16)
+    checkpoint = TrainingCheckpoint(os.path.join(TRAINING_DIR, run))
+    documents = load_batch(input_path)
+    classifications = get_categories("./TOS/english_tos.xml")
+    crew = get_crew(mode, llm_cache=False)
+
+    done = {(record["id"], record["iteration"]) for record in checkpoint.units()}
+    units = [
+        (document, iteration)
+        for document in documents
+        for iteration in range(iterations)
+        if (document["id"], iteration) not in done
+    ]
+    summary = {"run": run, "units": 0, "resumed": len(done), "error": 0, "evaluation_error": 0}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(train_unit, document, iteration, classifications, mode, token_budget): (
+                document,
+                iteration,
+            )
+            for document, iteration in units
+        }
+        for future in as_completed(futures):
+            document, iteration = futures[future]
+            if future.exception() is not None:
+                print(f"Training {document['id']} iteration {iteration} failed: {future.exception()}")
+                summary["error"] += 1
+                continue
+            checkpoint.add_unit(future.result())
+            summary["units"] += 1
+
+    records = checkpoint.units()
+    summary["correct"] = sum(record["correct"] for record in records)
+
+    # Evaluate the chunks not evaluated by an earlier attempt
+    agents = {agent.role: agent for agent in crew.agents}
+    evaluations = checkpoint.evaluations()
+    chunks = chunk_records(record for record in records if record["agent"] in agents)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(evaluate_chunk, agents[chunk[0]["agent"]], chunk): key
+            for key, chunk in chunks.items()
+            if key not in evaluations
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            if future.exception() is not None:
+                # Left out of this merge; the next run evaluates the chunk again
+                print(f"Evaluating chunk {key} failed: {future.exception()}")
+                summary["evaluation_error"] += 1
+                continue
+            evaluation = {
+                "chunk": key,
+                "agent": chunks[key][0]["agent"],
+                "units": len(chunks[key]),
+                **future.result(),
+            }
+            checkpoint.add_evaluation(evaluation)
+            evaluations[key] = evaluation
+
+    by_agent = defaultdict(list)
+    for key in chunks:
+        if key in evaluations:
+            by_agent[evaluations[key]["agent"]].append(evaluations[key])
+    handler = CrewTrainingHandler(filename)
+    for role, agent_evaluations in by_agent.items():
+        handler.save_trained_data(agent_id=role, trained_data=merge_evaluations(agent_evaluations))
+    summary["agents"] = sorted(by_agent)
+
+    metrics.write_prometheus()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("input", help="Directory of PDFs or JSONL manifest with expected \"labels\"")
+    parser.add_argument("--iterations", type=int, default=3, help="Iterations per document")
+    parser.add_argument("--concurrency", type=int, default=4, help="Units in flight")
+    parser.add_argument("--mode", choices=sorted(PIPELINE_MODES), default="full")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("-o", "--output", default=TRAINED_FILE, help="Trained file to update")
+    parser.add_argument("--run", default=None, help="Checkpoint name, derived from the corpus by default")
+    args = parser.parse_args()
+
+    print(
+        train_corpus(
+            args.input,
+            iterations=args.iterations,
+            concurrency=args.concurrency,
+            mode=args.mode,
+            token_budget=args.token_budget,
+            filename=args.output,
+            run=args.run,
+        )
+    )